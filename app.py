@@ -1,33 +1,166 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, g, Response, make_response
+from flask import before_render_template, template_rendered
 import sqlite3
 import os
-from datetime import datetime, timedelta
-from functools import wraps # Added for decorator
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import json
+import atexit
+import click
+import logging
+import threading
+import time
+import zlib
+from datetime import datetime
+from functools import partial, wraps # Added for decorator
+from db import ConnectionPool, PooledConnection, SCHEMA_VERSION, parse_pragmas, schema_version, migrate, attendance_storage, attendance_write_sql, migrate_to_integer_timestamps, ATTENDANCE_READ_SQL, current_attendance_storage
+from archive import AttendanceArchive
+from instrumentation import Metrics, InstrumentedConnection, RequestProfiler
+from presence import PresenceIndex, STATUS_IN, current_version
+from directory import EmployeeDirectory, search_employees
+from events import EventBroadcaster, format_event
+from employee_import import import_employees_csv, ImportFileError
+from writebehind import JournalLocked, WriteBehindQueue
+from reports import attendance_summary, employee_sessions, parse_report_date, PERIODS, GROUPINGS
 
 app = Flask(__name__)
 app.secret_key = 'your_super_secret_key_here' # **IMPORTANT: Change this to a strong, random key in production!**
 
-# Define the database path
-# Keeping the absolute path from our previous discussion for stability.
-# If you want to revert to a path relative to your project, change this to:
-# DB_FOLDER = 'database'
-# DB_PATH = os.path.join(DB_FOLDER, 'attendance.db')
-DB_PATH = r'C:\\temp_flask_db\\attendance.db' 
+# The database file: ATTENDANCE_DB_PATH, or attendance.db in the app's instance folder.
+# On Windows the default stays where earlier versions always put it. Its folder is
+# created by init_db(), not at import: importing this module touches no files.
+if os.name == 'nt':
+    DEFAULT_DB_PATH = r'C:\\temp_flask_db\\attendance.db'
+else:
+    DEFAULT_DB_PATH = os.path.join(app.instance_path, 'attendance.db')
+DB_PATH = os.environ.get('ATTENDANCE_DB_PATH', DEFAULT_DB_PATH)
 
-# Ensure the database folder exists
-# For absolute path, check if its directory exists
-if not os.path.exists(os.path.dirname(DB_PATH)):
-    os.makedirs(os.path.dirname(DB_PATH))
+# Files kept next to the database unless their own variable is set: the attendance
+# archive, the write-behind journal and profiles. create_app() re-derives them when it
+# points the app at another database.
+def beside_database(env_name, name):
+    return os.environ.get(env_name) or os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), name)
+
+# Opt-in instrumentation (INSTRUMENTATION=1): latency histograms per SQL statement
+# fingerprint, endpoint and template, served in the Prometheus text format at /metrics
+# (admin session, or "Authorization: Bearer $METRICS_TOKEN" for a scraper).
+# PROFILE_SAMPLE_RATE (e.g. 0.01) also cProfiles that fraction of requests into
+# PROFILE_DIR. See instrumentation.py; both are off, and cost nothing, by default.
+request_metrics = Metrics() if os.environ.get('INSTRUMENTATION') == '1' else None
+request_profiler = None
+if float(os.environ.get('PROFILE_SAMPLE_RATE', 0)) > 0:
+    request_profiler = RequestProfiler(
+        beside_database('PROFILE_DIR', 'profiles'),
+        float(os.environ['PROFILE_SAMPLE_RATE']))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Shared pool of WAL-mode connections, opened lazily. DB_PRAGMAS (e.g.
+# "cache_size=-64000,mmap_size=0") overrides db.DEFAULT_PRAGMAS for each connection.
+db_pool = ConnectionPool(DB_PATH, max_size=int(os.environ.get('DB_POOL_SIZE', 8)),
+                         pragmas=parse_pragmas(os.environ.get('DB_PRAGMAS', '')),
+                         factory=partial(InstrumentedConnection, metrics=request_metrics)
+                         if request_metrics else PooledConnection)
+
+# Closed months (or years, ATTENDANCE_ARCHIVE_PERIOD=year) of attendance are moved
+# into one SQLite file each under ATTENDANCE_ARCHIVE_DIR by `flask compact-attendance`,
+# keeping the current month and ARCHIVE_KEEP_MONTHS before it in the hot table.
+# /records, /export_csv and the reports read the archives their dates touch.
+attendance_archive = AttendanceArchive(
+    beside_database('ATTENDANCE_ARCHIVE_DIR', 'archive'),
+    period=os.environ.get('ATTENDANCE_ARCHIVE_PERIOD', 'month'))
+ARCHIVE_KEEP_MONTHS = int(os.environ.get('ARCHIVE_KEEP_MONTHS', 1))
 
 # Helper function to get a database connection with row_factory set to sqlite3.Row
+# The connection is checked out of the pool once per request and stored on `g`,
+# so calling this several times in one view reuses the same connection.
+# It is returned to the pool by close_db_connection() when the app context ends.
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # This allows accessing columns by name (e.g., row['id'] or row.id)
-    return conn
+    if 'db_conn' not in g:
+        g.db_conn = db_pool.acquire()
+    return g.db_conn
+
+@app.teardown_appcontext
+def close_db_connection(exception=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        db_pool.release(conn)
+
+# Servers started through create_app() have already run startup(); with `flask run`
+# or a plain 'app:app' the first request runs it instead.
+@app.before_request
+def ensure_started():
+    if not _started:
+        startup()
+
+# Request timing for the instrumentation above. Registered ahead of require_login, so
+# redirects to the login page are timed too. A response is recorded once its body has
+# been sent (Response.call_on_close), so streamed ones like /export_csv count in full.
+# Under asgi.py, /get_attendance_status and /events never reach Flask and aren't timed.
+@app.before_request
+def start_request_instrumentation():
+    if request_metrics is None and request_profiler is None:
+        return
+    g.request_started = time.perf_counter()
+    if request_metrics:
+        request_metrics.begin_request()
+    if request_profiler:
+        g.request_profile = request_profiler.start()
 
-# Create tables if not exists
+@app.after_request
+def record_request_instrumentation(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        response.call_on_close(partial(finish_request_instrumentation, started, request.endpoint,
+                                       request.method, response.status_code, g.pop('request_profile', None)))
+    return response
+
+@app.teardown_request
+def abandon_request_instrumentation(exception=None):
+    # after_request never ran (the request failed while being finalised)
+    started = g.pop('request_started', None)
+    if started is not None:
+        finish_request_instrumentation(started, request.endpoint, request.method, 500,
+                                       g.pop('request_profile', None))
+
+def finish_request_instrumentation(started, endpoint, method, status, profile):
+    elapsed = time.perf_counter() - started
+    if request_metrics:
+        request_metrics.observe_request(endpoint, method, status, elapsed, *request_metrics.end_request())
+    if profile:
+        request_profiler.finish(profile, endpoint, elapsed)
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    if request_metrics:
+        g.setdefault('template_started', []).append(time.perf_counter())
+
+@template_rendered.connect_via(app)
+def record_template_timer(sender, template, context, **extra):
+    if request_metrics and g.get('template_started'):
+        request_metrics.observe_template(template.name, time.perf_counter() - g.template_started.pop())
+
+# Create tables if not exists, and bring the schema up to date. A database already at
+# db.SCHEMA_VERSION costs one PRAGMA read, so this is cheap for every worker to run.
 def init_db():
-    conn = get_db_connection()
+    os.makedirs(os.path.dirname(os.path.abspath(DB_PATH)), exist_ok=True)
+    conn = db_pool.acquire()
+    try:
+        if schema_version(conn) < SCHEMA_VERSION:
+            create_schema(conn)
+
+        # ATTENDANCE_STORAGE=integer keeps attendance times as epoch-second integers (see
+        # db.py). A new, empty table is converted straight away; existing data is moved
+        # over online with `flask migrate-timestamps`.
+        if (os.environ.get('ATTENDANCE_STORAGE') == 'integer' and attendance_storage(conn) == 'text'
+                and conn.execute("SELECT NOT EXISTS (SELECT 1 FROM attendance)").fetchone()[0]):
+            migrate_to_integer_timestamps(conn)
+    finally:
+        db_pool.release(conn)
+
+def create_schema(conn):
     cursor = conn.cursor()
 
     # Create employees table with employee_id_text for unique employee IDs
@@ -55,10 +188,324 @@ def init_db():
     """)
 
     conn.commit()
-    conn.close()
 
-# Initialize the database when the app starts
-init_db()
+    # Bring indexes and data up to the latest schema version (see db.MIGRATIONS)
+    applied = migrate(conn)
+    if 8 in applied and attendance_archive.partitions(conn):
+        # The new daily summary was only filled from the hot table
+        attendance_archive.rebuild_daily_summary(conn)
+
+# Today's IN/OUT state per employee, kept in memory so status lookups don't query
+# SQLite. Other worker processes' writes are picked up within PRESENCE_CHECK_INTERVAL
+# seconds (see presence.PresenceIndex); mark_in/mark_out always check first.
+presence_index = PresenceIndex(check_interval=float(os.environ.get('PRESENCE_CHECK_INTERVAL', 1.0)))
+
+def warm_presence_index():
+    conn = db_pool.acquire()
+    try:
+        presence_index.load(conn)
+    finally:
+        db_pool.release(conn)
+
+# Live updates for kiosks and the dashboard over Server-Sent Events (see /events).
+# Each client buffers at most SSE_MAX_PENDING events before it is disconnected and
+# has to reconnect, so a stalled browser can't make this process grow without limit.
+event_broadcaster = EventBroadcaster(max_pending=int(os.environ.get('SSE_MAX_PENDING', 256)),
+                                     max_subscribers=int(os.environ.get('SSE_MAX_SUBSCRIBERS', 1000)))
+SSE_HEARTBEAT_SECONDS = float(os.environ.get('SSE_HEARTBEAT_SECONDS', 15))
+# Whether the kiosk and dashboard pages open /events. An open page holds its connection
+# for as long as it is open, which under synchronous workers (gunicorn's default) ties
+# up a whole worker until the worker timeout kills it; pages then fetch statuses on
+# demand as before. asgi.py and the threaded `python app.py` server turn it on; set
+# LIVE_EVENTS=1 for threaded or async WSGI workers (gunicorn --threads, gevent).
+LIVE_EVENTS = os.environ.get('LIVE_EVENTS') == '1'
+
+# The dashboard counters as last sent to 'dashboard' subscribers. Rebuilt from SQLite
+# whenever the presence index reloads; local writes adjust it and publish the result
+# under the lock, so subscribers see the counters change in the order they changed.
+# A write's delta is published after its commit, so a rebuild can get in between and
+# already count it: each rebuild keeps the attendance and employees versions it read
+# (in the same statement as the counters), and a delta stamped with a version at or
+# below those is dropped.
+_live_counters = None
+_live_counters_versions = None
+_live_counters_lock = threading.Lock()
+
+def load_live_counters(conn, date):
+    # Call with _live_counters_lock held
+    global _live_counters, _live_counters_versions
+    stats = query_dashboard_stats(conn, date)
+    _live_counters = {name: stats[name] for name in DASHBOARD_COUNTERS}
+    _live_counters_versions = {'attendance': stats['attendance_version'], 'employees': stats['employees_version']}
+
+# ``version`` is the (table, version) a delta's own transaction left behind: 'attendance'
+# with presence.current_version(), or 'employees' with employees_version. None for
+# write-behind events, which reach SQLite only later.
+def publish_dashboard_counters(conn=None, date=None, delta=None, version=None):
+    global _live_counters
+    with _live_counters_lock:
+        if not event_broadcaster.has_subscribers('dashboard'):
+            _live_counters = None
+            return
+        if conn is not None:
+            load_live_counters(conn, date)
+        elif _live_counters is None:
+            return
+        elif version is not None and version[1] <= _live_counters_versions[version[0]]:
+            return  # Already counted by the last rebuild
+        else:
+            for name, change in delta.items():
+                _live_counters[name] += change
+            _live_counters['employees_not_marked_today'] = max(0, _live_counters['total_employees'] - (
+                _live_counters['employees_in_today'] + _live_counters['employees_out_today']))
+        event_broadcaster.publish('dashboard', {'type': 'counters', 'counters': _live_counters, 'delta': delta or {}})
+
+def dashboard_counters_snapshot(date):
+    with _live_counters_lock:
+        if _live_counters is None:
+            conn = db_pool.acquire()
+            try:
+                load_live_counters(conn, date)
+            finally:
+                db_pool.release(conn)
+        return dict(_live_counters)
+
+# Publish one employee's new status, and the counter changes, after a local write.
+# ``before`` is presence_index.flags(employee_id) from before the write, ``version``
+# the attendance version the write committed (None for write-behind).
+def publish_attendance_change(employee_id, before, location=None, version=None):
+    after = presence_index.flags(employee_id)
+    event_broadcaster.publish('presence', {'type': 'status', 'employee_id': employee_id,
+                                           'status': presence_index.status(employee_id)})
+    delta = {'employees_in_today': after[0] - before[0], 'employees_out_today': after[1] - before[1]}
+    if location is not None:  # A new row
+        delta['total_attendance_records'] = 1
+        if location in ('Onsite', 'Remote'):
+            delta[f'{location.lower()}_count'] = 1
+    publish_dashboard_counters(delta={name: change for name, change in delta.items() if change},
+                               version=None if version is None else ('attendance', version))
+
+# Reloads pick up writes from other processes (and batch writes): send the statuses
+# that changed, or everything after a date rollover, and fresh counters.
+def publish_presence_reload(conn, date, changes):
+    if changes is None:
+        if event_broadcaster.has_subscribers('presence'):
+            event_broadcaster.publish('presence', {'type': 'snapshot', 'date': date,
+                                                   'statuses': presence_index.statuses()[1]})
+    else:
+        for employee_id, status in changes.items():
+            event_broadcaster.publish('presence', {'type': 'status', 'employee_id': employee_id, 'status': status})
+    publish_dashboard_counters(conn, date)
+
+presence_index.on_reload = publish_presence_reload
+
+# Sync the presence index outside a request (no `g`); only takes a pooled
+# connection when a version check is actually due.
+def sync_presence_index():
+    acquired = []
+    def connect():
+        acquired.append(db_pool.acquire())
+        return acquired[0]
+    try:
+        presence_index.sync(connect)
+    finally:
+        for conn in acquired:
+            db_pool.release(conn)
+
+# Optional write-behind mode (ATTENDANCE_WRITE_BEHIND=1): mark_in/mark_out journal the
+# event to ATTENDANCE_JOURNAL and return at once; a background thread group-commits
+# queued events every WRITE_BEHIND_FLUSH_MS milliseconds or WRITE_BEHIND_BATCH events.
+# Validation then uses this process's view only, so each journal file has one writer:
+# a worker that finds ATTENDANCE_JOURNAL locked by another falls back to synchronous
+# writes (see startup()). Give each worker its own journal to write behind in all.
+write_behind = None
+write_behind_lock = threading.Lock()
+if os.environ.get('ATTENDANCE_WRITE_BEHIND') == '1':
+    write_behind = WriteBehindQueue(
+        beside_database('ATTENDANCE_JOURNAL', 'attendance.journal'),
+        db_pool,
+        flush_interval=float(os.environ.get('WRITE_BEHIND_FLUSH_MS', 50)) / 1000.0,
+        max_batch=int(os.environ.get('WRITE_BEHIND_BATCH', 500)),
+        on_flush=lambda batch: invalidate_dashboard_cache(),
+    )
+    presence_index.overlay = write_behind.pending_events
+
+# Employee list shared by index, records, admin_dashboard and add_employee. Changes made
+# by other worker processes show up within DIRECTORY_CHECK_INTERVAL seconds (see
+# directory.EmployeeDirectory); add_employee invalidates it for this process.
+employee_directory = EmployeeDirectory(check_interval=float(os.environ.get('DIRECTORY_CHECK_INTERVAL', 5.0)))
+
+def warm_employee_directory():
+    conn = db_pool.acquire()
+    try:
+        employee_directory.load(conn)
+    finally:
+        db_pool.release(conn)
+
+# One-time work before serving, run by create_app() or else the first request: the
+# schema check, the write-behind journal replay and loading the in-memory caches.
+_started = False
+_write_behind_started = False
+_startup_lock = threading.Lock()
+
+def startup():
+    global _started, _write_behind_started, write_behind
+    with _startup_lock:
+        if _started:
+            return
+        init_db()
+        if write_behind and not _write_behind_started:
+            try:
+                write_behind.start()  # Replays anything a previous run acknowledged but never wrote
+            except JournalLocked as e:
+                app.logger.warning("Write-behind disabled in process %d, writing synchronously: %s",
+                                   os.getpid(), e)
+                write_behind = None
+                presence_index.overlay = None
+            else:
+                atexit.register(write_behind.stop)
+                _write_behind_started = True
+        warm_presence_index()
+        warm_employee_directory()
+        invalidate_dashboard_cache()
+        _started = True
+
+# Application factory: the entry point for servers, e.g. gunicorn 'app:create_app()'
+# (asgi.py and `python app.py` use it too). Configuration comes from the environment
+# variables above; ``db_path`` and ``pool_size`` override them (benchmarks, tests).
+# There is one app per process: calling this again with either one returns the same
+# app with fresh connections to that database and its caches reloaded from it.
+def create_app(db_path=None, pool_size=None):
+    global DB_PATH, db_pool, _started, _write_behind_started, _live_counters, _live_counters_versions
+    with _startup_lock:
+        if db_path is not None or pool_size is not None:
+            if _write_behind_started:
+                # Finish with the old database's journal; startup() restarts on the new one
+                write_behind.stop()
+                atexit.unregister(write_behind.stop)
+                _write_behind_started = False
+            db_pool.close_all()
+            DB_PATH = db_path or DB_PATH
+            db_pool = ConnectionPool(DB_PATH, max_size=pool_size or db_pool.max_size,
+                                     pragmas=db_pool.pragmas, factory=db_pool.factory)
+            attendance_archive.directory = beside_database('ATTENDANCE_ARCHIVE_DIR', 'archive')
+            if request_profiler:
+                request_profiler.directory = beside_database('PROFILE_DIR', 'profiles')
+            if write_behind:
+                write_behind.pool = db_pool
+                write_behind.journal_path = beside_database('ATTENDANCE_JOURNAL', 'attendance.journal')
+            # Read from the previous database and not reloaded by startup()
+            with _dashboard_cache_lock:
+                _dashboard_trend.clear()
+            with _live_counters_lock:
+                _live_counters = _live_counters_versions = None
+            _started = False
+    startup()
+    return app
+
+def get_employees():
+    return employee_directory.snapshot(get_db_connection)
+
+# Part of every page ETag: a hash of this module, the templates and the settings that
+# change what pages contain. A deploy or a configuration change then invalidates the
+# copies browsers hold, while every worker of one deploy still agrees on the ETags.
+_page_build_token = None
+
+def page_build_token():
+    global _page_build_token
+    if _page_build_token is None or app.debug:  # The debug server reloads templates
+        digest = hashlib.sha1()
+        with open(__file__, 'rb') as source:
+            digest.update(source.read())
+        for name in app.jinja_env.list_templates(extensions=['html']):
+            digest.update(app.jinja_loader.get_source(app.jinja_env, name)[0].encode('utf-8'))
+        digest.update(repr((KIOSK_SELECT_MAX_EMPLOYEES, LIVE_EVENTS)).encode('utf-8'))
+        _page_build_token = digest.hexdigest()[:12]
+    return _page_build_token
+
+# Render a template with an ETag, or answer 304 Not Modified if the browser already
+# has that version. Pages with pending flash messages are always rendered in full,
+# since the messages are part of the page but not of the ETag.
+def render_with_etag(etag, template, **context):
+    if '_flashes' in session:
+        return render_template(template, **context)
+    etag = f"{etag}-{page_build_token()}"
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = make_response(render_template(template, **context))
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Validate an attendance event against the presence index and hand it to the
+# write-behind queue. Returns an error message, or None once the event is journaled.
+def submit_write_behind(employee_id, action, date, time_of_day, location=None):
+    presence_index.sync(get_db_connection)
+    with write_behind_lock:
+        status = presence_index.status(employee_id)
+        if action == 'in' and status == STATUS_IN:
+            return "Employee has already marked in today and not yet marked out."
+        if action == 'out' and status != STATUS_IN:
+            return "No active 'mark in' record found for this employee today."
+        before = presence_index.flags(employee_id)
+        write_behind.submit(employee_id, action, date, time_of_day, location)
+        presence_index.record_pending(employee_id, action)
+    publish_attendance_change(employee_id, before, location if action == 'in' else None)
+    return None
+
+@app.cli.command('migrate-timestamps')
+@click.option('--batch-size', default=20000, show_default=True, help='Rows copied per transaction.')
+@click.option('--vacuum', is_flag=True, help='VACUUM afterwards to return the freed space to the OS.')
+def migrate_timestamps_command(batch_size, vacuum):
+    """Convert attendance to integer timestamp storage while the app keeps serving."""
+    init_db()
+    conn = db_pool.acquire()
+    try:
+        if attendance_storage(conn) == 'integer':
+            print("attendance already uses integer timestamps.")
+            return
+        copied = migrate_to_integer_timestamps(
+            conn, batch_size=batch_size, progress=lambda rows: print(f"  copied {rows} rows", end='\r'))
+        print(f"\nMigrated {copied} attendance rows to integer timestamps.")
+        if vacuum:
+            conn.execute("VACUUM")
+    finally:
+        db_pool.release(conn)
+
+@app.cli.command('compact-attendance')
+@click.option('--keep-months', default=ARCHIVE_KEEP_MONTHS, show_default=True,
+              help='Closed months kept in the hot table besides the current one.')
+@click.option('--vacuum', is_flag=True, help='VACUUM afterwards to return the freed space to the OS.')
+def compact_attendance_command(keep_months, vacuum):
+    """Move closed months of attendance into the archive files (safe to run while serving)."""
+    init_db()
+    today = datetime.now()
+    month = today.year * 12 + today.month - 1 - keep_months
+    before = f'{month // 12:04d}-{month % 12 + 1:02d}-01'
+    conn = db_pool.acquire()
+    try:
+        moved = attendance_archive.compact(
+            conn, before, progress=lambda name, rows: print(f"  {name}: moved {rows} rows"))
+        print(f"Archived {sum(rows for _, rows in moved)} attendance rows dated before "
+              f"{attendance_archive.partition_range(attendance_archive.partition_name(before))[0]} "
+              f"into {attendance_archive.directory}.")
+        if moved and vacuum:
+            conn.execute("VACUUM")
+    finally:
+        db_pool.release(conn)
+
+@app.cli.command('rebuild-daily-summary')
+def rebuild_daily_summary_command():
+    """Recompute daily_attendance_summary from all attendance, archives included."""
+    init_db()
+    conn = db_pool.acquire()
+    try:
+        attendance_archive.rebuild_daily_summary(conn, progress=lambda name: print(f"  rebuilt {name}"))
+        rows = conn.execute("SELECT COUNT(*) FROM daily_attendance_summary").fetchone()[0]
+        print(f"daily_attendance_summary now holds {rows} employee-days.")
+    finally:
+        db_pool.release(conn)
 
 # Decorator to restrict access to admin
 def admin_required(f):
@@ -73,8 +520,11 @@ def admin_required(f):
 # --- Before Request Hook for Authentication ---
 @app.before_request
 def require_login():
-    # List of routes that do NOT require admin login (index, mark_in, mark_out, get_attendance_status are for employees)
-    allowed_routes = ['login', 'static', 'mark_in', 'mark_out', 'index', 'get_attendance_status']
+    # List of routes that do NOT require admin login (index, mark_in, mark_out, mark_batch, get_attendance_status
+    # and the kiosk's employee search are for employees)
+    # (metrics checks for an admin session or METRICS_TOKEN itself)
+    allowed_routes = ['login', 'static', 'mark_in', 'mark_out', 'mark_batch', 'index', 'get_attendance_status',
+                      'live_events', 'metrics', 'api_search_employees']
     # Check if the requested endpoint is in the allowed routes or if admin is logged in
     if request.endpoint not in allowed_routes and not session.get('admin'):
         # If not logged in as admin and trying to access an admin-only route, redirect to login
@@ -85,290 +535,649 @@ def require_login():
 # New route to get attendance status for selected employee (for JS button control)
 @app.route('/get_attendance_status/<int:employee_id>')
 def get_attendance_status(employee_id):
-    conn = get_db_connection()
-    current_date = datetime.now().strftime('%Y-%m-%d')
- 
-    cursor = conn.cursor()
- 
-    # Check for an open IN record for today
-    cursor.execute(
-        "SELECT id FROM attendance WHERE employee_id = ? AND date = ? AND time_out IS NULL",
-        (employee_id, current_date)
-    )
-    open_in_record = cursor.fetchone()
- 
-    if open_in_record:
-        conn.close()
-        return jsonify({'status': 'IN'})
- 
-    # Check for a completed IN/OUT record for today
-    cursor.execute(
-        "SELECT id FROM attendance WHERE employee_id = ? AND date = ? AND time_out IS NOT NULL",
-        (employee_id, current_date)
-    )
-    completed_record = cursor.fetchone()
- 
-    if completed_record:
-        conn.close()
-        return jsonify({'status': 'OUT'})
-   
-    conn.close()
-    return jsonify({'status': 'NONE'}) # No record for today or not yet IN
+    # Answered from the in-memory presence index; SQLite is only consulted when a
+    # cross-process version check is due.
+    presence_index.sync(get_db_connection)
+    return jsonify({'status': presence_index.status(employee_id)}) # IN, OUT or NONE (not yet IN today)
  
+# Server-Sent Events stream of live changes, so pages keep their state current over
+# one long-lived connection instead of polling. ?topics= is a comma-separated list of
+#   presence   {"type": "status", "employee_id", "status"} as employees mark in/out
+#   dashboard  {"type": "counters", "counters", "delta"} with the dashboard counters (admin only)
+# A client first gets a "snapshot" of each topic, unless it reconnects with a
+# Last-Event-ID (or ?last_event_id=) whose missed events can still be replayed.
+@app.route('/events')
+def live_events():
+    topics = set(filter(None, request.args.get('topics', 'presence').split(',')))
+    if not topics <= {'presence', 'dashboard'}:
+        return jsonify({'error': 'topics must be presence and/or dashboard.'}), 400
+    if 'dashboard' in topics and not session.get('admin'):
+        return jsonify({'error': 'The dashboard topic requires an admin login.'}), 403
+    try:
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    subscription, resumed = event_broadcaster.subscribe(topics, last_event_id)
+    if subscription is None:
+        return Response("Too many live connections, try again shortly.\n", status=503,
+                        headers={'Retry-After': '10'}, mimetype='text/plain')
+
+    # Snapshots are taken after subscribing, so nothing published meanwhile is lost
+    initial = [b"retry: 3000\n\n"]
+    if not resumed:
+        sync_presence_index()
+        date, statuses = presence_index.statuses()
+        if 'presence' in topics:
+            initial.append(format_event(event_broadcaster.last_id, 'presence',
+                                        {'type': 'snapshot', 'date': date, 'statuses': statuses}))
+        if 'dashboard' in topics:
+            initial.append(format_event(event_broadcaster.last_id, 'dashboard',
+                                        {'type': 'counters', 'counters': dashboard_counters_snapshot(date),
+                                         'delta': {}}))
+
+    def stream():
+        try:
+            yield b''.join(initial)
+            while not subscription.closed:
+                frames = subscription.wait(SSE_HEARTBEAT_SECONDS)
+                if frames:
+                    yield b''.join(frames)
+                elif not subscription.closed:
+                    # Keeps proxies from timing out the connection; the sync picks
+                    # up other processes' writes even when nobody is marking here.
+                    sync_presence_index()
+                    yield b": keepalive\n\n"
+        finally:
+            event_broadcaster.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+# Directories larger than this are not sent to the kiosk as one <select>; the
+# page looks employees up with /api/employees/search as they type instead.
+KIOSK_SELECT_MAX_EMPLOYEES = int(os.environ.get('KIOSK_SELECT_MAX_EMPLOYEES', 1000))
+
 @app.route('/')
 def index():
-    conn = get_db_connection()
-    employees = conn.execute('SELECT id, name FROM employees ORDER BY name ASC').fetchall()
+    employees, directory_etag = get_employees()
+    if len(employees) > KIOSK_SELECT_MAX_EMPLOYEES:
+        employees = None
 
-    # Fetch today's marked-in employees and their status
-    today_date = datetime.now().strftime('%Y-%m-%d')
-    
-    # Get employees who marked in today and have NOT marked out
-    marked_in_today = conn.execute(f"""
-        SELECT E.id, E.name
-        FROM employees E
-        JOIN attendance A ON E.id = A.employee_id
-        WHERE A.date = '{today_date}' AND (A.time_out IS NULL OR A.time_out = '')
-    """).fetchall()
-    
-    marked_in_ids = {emp['id'] for emp in marked_in_today}
-
-    conn.close()
-    return render_template('index.html', employees=employees, marked_in_ids=marked_in_ids)
+    # The page depends on the directory and on whether an admin is logged in, not on
+    # who is marked in, so check-ins don't change the ETag
+    etag = f"{directory_etag}-{'admin' if session.get('admin') else 'kiosk'}"
+    return render_with_etag(etag, 'index.html', employees=employees, live_events=LIVE_EVENTS)
 
 
 @app.route('/mark_in', methods=['POST'])
 def mark_in():
-    employee_id = request.form['employee_id']
+    try:
+        employee_id = int(request.form['employee_id'])
+    except ValueError:
+        flash("Invalid employee selected.", "error")
+        return redirect(url_for('index'))
     location = request.form.get('location', 'Onsite') # Default to Onsite if not provided
     date = datetime.now().strftime('%Y-%m-%d')
     time_in = datetime.now().strftime('%H:%M:%S')
 
+    if write_behind:
+        error = submit_write_behind(employee_id, 'in', date, time_in, location)
+        if error:
+            flash(error, "error")
+        else:
+            flash("Employee marked in successfully!", "success")
+        return redirect(url_for('index'))
+
     conn = get_db_connection()
-    cursor = conn.cursor()
 
-    # Check if employee has already marked in today
-    cursor.execute(f"""
-        SELECT * FROM attendance
-        WHERE employee_id = ? AND date = ? AND (time_out IS NULL OR time_out = '')
-    """, (employee_id, date))
-    existing_record = cursor.fetchone()
+    # Take the write lock first so the presence check and the insert can't
+    # interleave with another worker marking the same employee in.
+    conn.execute("BEGIN IMMEDIATE")
+    presence_index.sync(get_db_connection, force=True)
 
-    if existing_record:
+    # Check if employee has already marked in today
+    if presence_index.status(employee_id) == STATUS_IN:
+        conn.rollback()
         flash("Employee has already marked in today and not yet marked out.", "error")
     else:
-        conn.execute("INSERT INTO attendance (employee_id, date, time_in, location) VALUES (?, ?, ?, ?)",
-                     (employee_id, date, time_in, location))
+        before = presence_index.flags(employee_id)
+        cursor = conn.execute(attendance_write_sql(conn)['insert'],
+                              (employee_id, date, time_in, None, location))
+        version = current_version(conn)
         conn.commit()
+        presence_index.record_in(employee_id, cursor.lastrowid, version)
+        invalidate_dashboard_cache()
+        publish_attendance_change(employee_id, before, location, version)
         flash("Employee marked in successfully!", "success")
     
-    conn.close()
     return redirect(url_for('index'))
 
 @app.route('/mark_out', methods=['POST'])
 def mark_out():
-    employee_id = request.form['employee_id']
+    try:
+        employee_id = int(request.form['employee_id'])
+    except ValueError:
+        flash("Invalid employee selected.", "error")
+        return redirect(url_for('index'))
     date = datetime.now().strftime('%Y-%m-%d')
     time_out = datetime.now().strftime('%H:%M:%S')
 
+    if write_behind:
+        error = submit_write_behind(employee_id, 'out', date, time_out)
+        if error:
+            flash(error, "error")
+        else:
+            flash("Employee marked out successfully!", "success")
+        return redirect(url_for('index'))
+
     conn = get_db_connection()
-    cursor = conn.cursor()
 
     # Find the latest 'in' record for today that hasn't been marked out yet
-    cursor.execute(f"""
-        SELECT id, time_in FROM attendance
-        WHERE employee_id = ? AND date = ? AND (time_out IS NULL OR time_out = '')
-        ORDER BY time_in DESC
-        LIMIT 1
-    """, (employee_id, date))
-    record = cursor.fetchone()
-
-    if record:
-        conn.execute("UPDATE attendance SET time_out = ? WHERE id = ?", (time_out, record['id']))
+    conn.execute("BEGIN IMMEDIATE")
+    presence_index.sync(get_db_connection, force=True)
+    record_id = presence_index.open_record_id(employee_id)
+
+    if record_id:
+        before = presence_index.flags(employee_id)
+        conn.execute(attendance_write_sql(conn)['close'], (time_out, record_id))
+        version = current_version(conn)
         conn.commit()
+        presence_index.record_out(employee_id, record_id, version)
+        invalidate_dashboard_cache()
+        publish_attendance_change(employee_id, before, version=version)
         flash("Employee marked out successfully!", "success")
     else:
+        conn.rollback()
         flash("No active 'mark in' record found for this employee today.", "error")
     
-    conn.close()
     return redirect(url_for('index'))
 
-@app.route('/records')
-@admin_required
-def records():
+# Largest number of events accepted by one /api/attendance/batch request
+BATCH_MAX_EVENTS = 5000
+
+# Bulk check-in/check-out for kiosks and badge-reader gateways.
+# Body: {"events": [{"employee_id": 12, "action": "in"|"out",
+#                    "timestamp": "2025-06-09T08:59:12" (optional, defaults to now),
+#                    "location": "Onsite" (optional, "in" only)}, ...]}
+# Events are checked in order with the same rules as /mark_in and /mark_out (an IN
+# is rejected while one is open for that day, an OUT needs an open IN), then all
+# accepted events are written in one transaction with executemany().
+# Returns one result per event, in request order.
+@app.route('/api/attendance/batch', methods=['POST'])
+def mark_batch():
+    payload = request.get_json(silent=True)
+    events = payload.get('events') if isinstance(payload, dict) else None
+    if not isinstance(events, list):
+        return jsonify({'error': 'Expected a JSON object with an "events" list.'}), 400
+    if len(events) > BATCH_MAX_EVENTS:
+        return jsonify({'error': f'At most {BATCH_MAX_EVENTS} events per batch.'}), 413
+
+    results = []
+    parsed = []  # (result, employee_id, action, date, time, location)
+    for position, event in enumerate(events):
+        result = {'index': position, 'status': 'error'}
+        results.append(result)
+        if not isinstance(event, dict):
+            result['message'] = "Event must be an object."
+            continue
+        result['employee_id'] = event.get('employee_id')
+        result['action'] = event.get('action')
+        try:
+            employee_id = int(event.get('employee_id'))
+        except (TypeError, ValueError):
+            result['message'] = "Invalid employee_id."
+            continue
+        action = str(event.get('action', '')).lower()
+        if action not in ('in', 'out'):
+            result['message'] = "action must be 'in' or 'out'."
+            continue
+        try:
+            timestamp = datetime.fromisoformat(event['timestamp']) if event.get('timestamp') else datetime.now()
+        except (TypeError, ValueError):
+            result['message'] = "Invalid timestamp; expected ISO 8601 (YYYY-MM-DDTHH:MM:SS)."
+            continue
+        if timestamp.tzinfo is not None:
+            # Attendance is stored in the server's local wall-clock time (see db.py)
+            timestamp = timestamp.astimezone()
+        parsed.append((result, employee_id, action, timestamp.strftime('%Y-%m-%d'),
+                       timestamp.strftime('%H:%M:%S'), event.get('location') or 'Onsite'))
+
     conn = get_db_connection()
-    attendance_records = []
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    employee_id_filter = request.args.get('employee_id_filter') # New filter
+    conn.execute("BEGIN IMMEDIATE")
+    # In write-behind mode also hold the queue lock, so single mark_in/mark_out
+    # calls can't change presence between validation and submission.
+    if write_behind:
+        write_behind_lock.acquire()
+    try:
+        presence_index.sync(get_db_connection, force=True)
+        today_date = presence_index.today()
+
+        employee_ids = sorted({employee_id for _, employee_id, *_ in parsed})
+        known_employees = {row['id'] for row in conn.execute(
+            "SELECT id FROM employees WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(employee_ids),))}
+        # Archived periods are read-only (see archive.AttendanceArchive)
+        archived_through = attendance_archive.archived_through(conn)
+
+        # Open rows per (employee_id, date): today's come from the presence index,
+        # other days (late-delivered swipes) are read once per distinct date.
+        open_rows = {}
+        open_time_ins = {}  # attendance id -> time_in, for the rows read per date
+        loaded_dates = set()
+        def open_rows_for(employee_id, date):
+            key = (employee_id, date)
+            if date == today_date:
+                if key not in open_rows:
+                    # The open row's id is None if it is still queued for write-behind
+                    open_rows[key] = ([presence_index.open_record_id(employee_id)]
+                                      if presence_index.status(employee_id) == STATUS_IN else [])
+            elif date not in loaded_dates:
+                loaded_dates.add(date)
+                read_sql = ATTENDANCE_READ_SQL[current_attendance_storage(conn)]
+                for row in conn.execute(
+                        f"SELECT a.id, a.employee_id, a.time_in FROM attendance a WHERE {read_sql['on_date']} "
+                        f"AND a.time_out IS NULL ORDER BY {read_sql['oldest_first']}", {'date': date}):
+                    open_rows.setdefault((row['employee_id'], date), []).append(row['id'])
+                    open_time_ins[row['id']] = row['time_in']
+            return open_rows.setdefault(key, [])
+
+        def open_time_in(employee_id, date, entry):
+            if isinstance(entry, list):
+                return entry[2]  # IN from earlier in this same batch
+            if entry is None:
+                # Today's IN still queued for write-behind: the latest queued one
+                return next((event['time'] for event in reversed(write_behind.pending_events())
+                             if event['employee_id'] == employee_id and event['date'] == date
+                             and event['action'] == 'in'), None)
+            if entry not in open_time_ins:
+                open_time_ins[entry] = conn.execute(
+                    "SELECT time_in FROM attendance WHERE id = ?", (entry,)).fetchone()['time_in']
+            return open_time_ins[entry]
+
+        new_rows = []  # [employee_id, date, time_in, time_out, location] for executemany
+        updates = []   # (time_out, attendance id)
+        for result, employee_id, action, date, time_of_day, location in parsed:
+            if employee_id not in known_employees:
+                result['message'] = "Employee not found."
+                continue
+            if archived_through and date <= archived_through:
+                result['message'] = f"Attendance up to {archived_through} has been archived and can't be changed."
+                continue
+            open_for_day = open_rows_for(employee_id, date)
+            if action == 'in':
+                if open_for_day:
+                    result['message'] = "Employee has already marked in today and not yet marked out."
+                    continue
+                row = [employee_id, date, time_of_day, None, location]
+                new_rows.append(row)
+                open_for_day.append(row)
+                result.update(status='ok', message="Employee marked in successfully!")
+            else:
+                if not open_for_day:
+                    result['message'] = "No active 'mark in' record found for this employee today."
+                    continue
+                # Gateways can deliver swipes out of order; an OUT before the IN it would
+                # close isn't an overnight shift (that would have its OUT on the next date)
+                time_in = open_time_in(employee_id, date, open_for_day[-1])
+                if time_in is not None and time_of_day < time_in:
+                    result['message'] = f"Mark out at {time_of_day} is before the open mark in at {time_in}."
+                    continue
+                latest = open_for_day.pop()
+                if isinstance(latest, list):
+                    latest[3] = time_of_day  # IN from earlier in this same batch
+                else:
+                    updates.append((time_of_day, latest))
+                result.update(status='ok', message="Employee marked out successfully!")
+
+        if write_behind:
+            # Accepted events go through the journal like single mark_in/mark_out
+            # calls, in request order, so they can't race with queued ones.
+            conn.rollback()
+            for result, employee_id, action, date, time_of_day, location in parsed:
+                if result['status'] == 'ok':
+                    write_behind.submit(employee_id, action, date, time_of_day,
+                                        location if action == 'in' else None)
+                    if date == today_date:
+                        before = presence_index.flags(employee_id)
+                        presence_index.record_pending(employee_id, action)
+                        publish_attendance_change(employee_id, before, location if action == 'in' else None)
+            new_rows = updates = []
+        if new_rows:
+            conn.executemany(attendance_write_sql(conn)['insert'], new_rows)
+        if updates:
+            conn.executemany(attendance_write_sql(conn)['close'], updates)
+        if new_rows or updates:
+            # Rebuild today's presence from the rows just written (still inside the
+            # transaction, so nothing else can have changed them).
+            presence_index.load(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        # Whatever was loaded above may include the rolled-back rows
+        presence_index.load(conn)
+        raise
+    finally:
+        if write_behind:
+            write_behind_lock.release()
+
+    if new_rows or updates:
+        invalidate_dashboard_cache()
+    applied = sum(1 for result in results if result['status'] == 'ok')
+    return jsonify({'results': results, 'applied': applied, 'rejected': len(results) - applied})
 
-    print("--- Debugging /records route ---")
-    print(f"DEBUG: Filters received: start_date={start_date}, end_date={end_date}, employee_id_filter={employee_id_filter}")
-
-    query = """
-        SELECT
-            a.id,
-            e.name,
-            e.employee_id_text,
-            a.date,
-            a.time_in,
-            a.time_out,
-            a.location
-        FROM
-            attendance a
-        JOIN
-            employees e ON a.employee_id = e.id
-        WHERE 1=1
-    """
+# Builds the attendance filter shared by /records and /export_csv from the
+# start_date, end_date and employee_id_filter query-string arguments.
+# Returns (sql, params, employee_id) where sql is a string of " AND ..." conditions
+# on the `a` (attendance) alias for the given storage format (params are the same
+# for both), and employee_id is None if no valid filter was given.
+def attendance_filter_clause(args, storage='text'):
+    read_sql = ATTENDANCE_READ_SQL[storage]
+    sql = ""
     params = []
+    start_date = args.get('start_date')
+    end_date = args.get('end_date')
+    employee_id = None
 
     if start_date:
-        query += " AND a.date >= ?"
+        sql += " AND " + read_sql['from_date']
         params.append(start_date)
     if end_date:
-        query += " AND a.date <= ?"
+        sql += " AND " + read_sql['through_date']
         params.append(end_date)
-    # Add filter for employee_id_filter (the internal employee ID)
-    if employee_id_filter:
+    if args.get('employee_id_filter'):
         try:
-            employee_id_filter_int = int(employee_id_filter)
-            query += " AND a.employee_id = ?"
-            params.append(employee_id_filter_int)
+            employee_id = int(args.get('employee_id_filter'))
+            sql += " AND a.employee_id = ?"
+            params.append(employee_id)
         except ValueError:
-            flash("Invalid Employee ID filter.", "danger")
-            # You might want to handle this more gracefully, e.g., clear the filter
-            employee_id_filter = None
+            employee_id = None
+    return sql, params, employee_id
 
-    query += " ORDER BY a.date DESC, a.time_in DESC"
+# Page size used by /records and /api/records when none is requested, and the upper bound
+RECORDS_PAGE_SIZE = 100
+RECORDS_MAX_PAGE_SIZE = 1000
 
-    print(f"DEBUG: SQL Query: {query}")
-    print(f"DEBUG: Query Parameters: {params}")
+# Keyset pagination cursors are the (date, time_in, id) of the last row on a page,
+# packed into an opaque URL-safe string.
+def encode_records_cursor(record):
+    raw = json.dumps([record['date'], record['time_in'], record['id']], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
 
+def decode_records_cursor(cursor):
+    # Raises ValueError for anything that isn't a cursor we produced
     try:
-        cursor = conn.execute(query, params)
-        records = cursor.fetchall()
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        date, time_in, record_id = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    return str(date), str(time_in), int(record_id)
 
-        print(f"DEBUG: Number of records fetched from DB: {len(records)}")
-        if records:
-            print(f"DEBUG: First record (if any): {dict(records[0])}") # Convert Row to dict for readable print
-        else:
-            print("DEBUG: No records fetched from DB.")
-
-        for record in records:
-            attendance_records.append({
-                'id': record['id'],
-                'name': record['name'],
-                'employee_id_text': record['employee_id_text'],
-                'date': record['date'],
-                'time_in': record['time_in'],
-                'time_out': record['time_out'],
-                'location': record['location']
-            })
-    except sqlite3.Error as e:
-        print(f"Database error in /records: {e}")
-        flash(f"Database error: {e}", "danger")
+# Fetches one page of attendance records, newest first, for /records and /api/records.
+# Seeks straight to the row after `cursor` on the (date, time_in) or ts_in index instead of
+# using OFFSET, so every page costs the same no matter how deep into history it is.
+# Archived partitions are only opened once the hot table runs out of rows for the page.
+# Returns (records, next_cursor, employee_id_filter); next_cursor is None on the last page.
+def fetch_records_page(conn, args):
+    cursor = args.get('cursor')
+    if cursor:
+        # The cursor row already lies inside the end_date bound, and leaving the
+        # bound out lets SQLite seek on the cursor's row value instead of
+        # walking back from end_date past every row of the earlier pages.
+        args = {key: value for key, value in args.items() if key != 'end_date'}
+    _, params, employee_id_filter = attendance_filter_clause(args)
+
+    try:
+        page_size = int(args.get('page_size', RECORDS_PAGE_SIZE))
+    except ValueError:
+        page_size = RECORDS_PAGE_SIZE
+    page_size = max(1, min(page_size, RECORDS_MAX_PAGE_SIZE))
+
+    # Archived partitions may be in a different storage format from the hot table
+    def page_query(schema):
+        storage = attendance_storage(conn, schema=schema)
+        query = """
+            SELECT
+                a.id,
+                e.name,
+                e.employee_id_text,
+                a.date,
+                a.time_in,
+                a.time_out,
+                a.location
+            FROM
+                {schema}.attendance a
+            JOIN
+                employees e ON a.employee_id = e.id
+            WHERE 1=1
+        """.format(schema=schema) + attendance_filter_clause(args, storage)[0]
+        if cursor:
+            query += " AND " + ATTENDANCE_READ_SQL[storage]['before']
+        # One extra row tells us whether there is a next page
+        return query + f" ORDER BY {ATTENDANCE_READ_SQL[storage]['newest_first']} LIMIT ?"
+
+    newest_date = args.get('end_date')
+    if cursor:
+        cursor_values = decode_records_cursor(cursor)
+        params.extend(cursor_values)
+        newest_date = cursor_values[0]
+    params.append(page_size + 1)
+
+    # Partitions come newest first and never overlap, so appending keeps the order
+    rows = []
+    sources = attendance_archive.sources(conn, args.get('start_date'), newest_date)
+    try:
+        for schema in sources:
+            params[-1] = page_size + 1 - len(rows)
+            rows += conn.execute(page_query(schema), params).fetchall()
+            if len(rows) > page_size:
+                break
     finally:
-        conn.close()
+        sources.close()
+    next_cursor = encode_records_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    attendance_records = [dict(row) for row in rows[:page_size]]
 
-    # Get all employees for the filter dropdown
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("records page start_date=%s end_date=%s employee_id=%s cursor=%s page_size=%d rows=%d has_next=%s",
+                         args.get('start_date'), args.get('end_date'), employee_id_filter,
+                         cursor, page_size, len(attendance_records), next_cursor is not None)
+
+    return attendance_records, next_cursor, employee_id_filter
+
+@app.route('/records')
+@admin_required
+def records():
     conn = get_db_connection()
-    employees = conn.execute('SELECT id, name, employee_id_text FROM employees ORDER BY name').fetchall()
-    conn.close()
+    attendance_records = []
+    next_cursor = None
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    employee_id_filter = request.args.get('employee_id_filter') # New filter
+
+    try:
+        attendance_records, next_cursor, employee_id_filter_int = fetch_records_page(conn, request.args)
+        # Filter on employee_id_filter (the internal employee ID)
+        if employee_id_filter and employee_id_filter_int is None:
+            flash("Invalid Employee ID filter.", "danger")
+            # You might want to handle this more gracefully, e.g., clear the filter
+            employee_id_filter = None
+    except ValueError:
+        flash("Invalid page cursor; showing the first page.", "danger")
+        return redirect(url_for('records', start_date=start_date, end_date=end_date,
+                                employee_id_filter=employee_id_filter))
+    except sqlite3.Error as e:
+        app.logger.error("Database error in /records: %s", e)
+        flash(f"Database error: {e}", "danger")
+
+    # All employees for the filter dropdown, from the shared directory cache
+    employees, _ = get_employees()
 
     return render_template('records.html',
                            attendance_records=attendance_records,
                            start_date=start_date,
                            end_date=end_date,
                            employees=employees, # Pass employees to the template
-                           selected_employee_id=employee_id_filter) # Pass the selected employee ID for persistence
+                           selected_employee_id=employee_id_filter, # Pass the selected employee ID for persistence
+                           page_size=request.args.get('page_size'),
+                           next_cursor=next_cursor,
+                           is_first_page=not request.args.get('cursor'))
+
+# JSON variant of /records for loading further pages incrementally in the browser.
+# Takes the same query-string arguments; pass back next_cursor as ?cursor= for the next page.
+@app.route('/api/records')
+@admin_required
+def api_records():
+    if request.args.get('employee_id_filter'):
+        try:
+            int(request.args['employee_id_filter'])
+        except ValueError:
+            return jsonify({'error': 'Invalid Employee ID filter.'}), 400
+    try:
+        attendance_records, next_cursor, _ = fetch_records_page(get_db_connection(), request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'records': attendance_records, 'next_cursor': next_cursor})
 
 
 @app.route('/admin_dashboard') # This route is for the employee list, not the summary
 @admin_required
 def admin_dashboard():
-    conn = get_db_connection()
-    employees = conn.execute("SELECT id, employee_id_text, name, department, job_title FROM employees ORDER BY name ASC").fetchall()
-    conn.close()
-    return render_template('admin_dashboard.html', employees=employees)
+    employees, etag = get_employees()
+    return render_with_etag(etag, 'admin_dashboard.html', employees=employees)
+
+
+# All of today's dashboard counters in a single pass over today's attendance rows
+# (served by idx_attendance_date_location, or idx_attendance_ts_in in the 'integer'
+# storage format), plus the two table-wide totals, which come from the
+# trigger-maintained table_row_counts rather than COUNT(*) scans.
+DASHBOARD_STATS_QUERY = {storage: f"""
+    SELECT
+        (SELECT row_count FROM table_row_counts WHERE table_name = 'employees') AS total_employees,
+        (SELECT row_count FROM table_row_counts WHERE table_name = 'attendance') AS total_attendance_records,
+        (SELECT version FROM attendance_version WHERE id = 1) AS attendance_version,
+        (SELECT version FROM employees_version WHERE id = 1) AS employees_version,
+        COUNT(DISTINCT CASE WHEN a.time_out IS NULL THEN a.employee_id END) AS employees_in_today,
+        COUNT(DISTINCT CASE WHEN a.time_out IS NOT NULL THEN a.employee_id END) AS employees_out_today,
+        COALESCE(SUM(a.location = 'Onsite'), 0) AS onsite_count,
+        COALESCE(SUM(a.location = 'Remote'), 0) AS remote_count
+    FROM attendance a
+    WHERE {read_sql['on_date']}
+""" for storage, read_sql in ATTENDANCE_READ_SQL.items()}
+
+# CROSS JOIN pins attendance as the outer loop so the newest 10 rows are read
+# straight off idx_attendance_date_time_in (or idx_attendance_ts_in); with a plain
+# JOIN the planner can decide to walk every employee's history and sort millions
+# of rows instead.
+DASHBOARD_RECENT_QUERY = {storage: f"""
+    SELECT e.name, a.date, a.time_in, a.time_out, a.location
+    FROM attendance a
+    CROSS JOIN employees e ON a.employee_id = e.id
+    ORDER BY {read_sql['newest_first']}
+    LIMIT 10
+""" for storage, read_sql in ATTENDANCE_READ_SQL.items()}
+
+# How long (seconds) computed dashboard stats are reused before being recomputed.
+# mark_in, mark_out and add_employee invalidate the cache straight away in this
+# process; other worker processes pick the change up when their copy expires.
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', 10))
+
+# The counters sent to live dashboards by publish_dashboard_counters()
+DASHBOARD_COUNTERS = ('total_employees', 'employees_in_today', 'employees_out_today',
+                      'employees_not_marked_today', 'total_attendance_records', 'onsite_count', 'remote_count')
+
+_dashboard_cache = {}
+_dashboard_cache_lock = threading.Lock()
+_dashboard_cache_generation = 0
+
+def query_dashboard_stats(conn, today_date):
+    storage = current_attendance_storage(conn)
+    row = conn.execute(DASHBOARD_STATS_QUERY[storage], {'date': today_date}).fetchone()
+    stats = dict(row)
+
+    # Employees not marked today
+    stats['employees_not_marked_today'] = max(
+        0, stats['total_employees'] - (stats['employees_in_today'] + stats['employees_out_today']))
+    stats['recent_activities'] = [dict(activity) for activity in conn.execute(DASHBOARD_RECENT_QUERY[storage])]
+    return stats
+
+def get_dashboard_stats(conn, today_date):
+    with _dashboard_cache_lock:
+        if (_dashboard_cache.get('date') == today_date and
+                _dashboard_cache.get('expires', 0) > time.monotonic()):
+            return _dashboard_cache['stats']
+        generation = _dashboard_cache_generation
+
+    stats = query_dashboard_stats(conn, today_date)
 
+    with _dashboard_cache_lock:
+        # Don't store a result that an attendance write has already made stale
+        if generation == _dashboard_cache_generation:
+            _dashboard_cache.update(date=today_date, stats=stats,
+                                    expires=time.monotonic() + DASHBOARD_CACHE_TTL)
+    return stats
+
+# Employees present and hours worked per day over the last DASHBOARD_TREND_DAYS days,
+# for the dashboard's trend chart: about one daily_attendance_summary row per employee
+# per day instead of every punch. Past days rarely change, so the result is reused for
+# DASHBOARD_TREND_TTL seconds rather than recomputed after every mark_in/mark_out.
+DASHBOARD_TREND_DAYS = int(os.environ.get('DASHBOARD_TREND_DAYS', 30))
+DASHBOARD_TREND_TTL = float(os.environ.get('DASHBOARD_TREND_TTL', 300))
+DASHBOARD_TREND_QUERY = """
+    SELECT date,
+           COUNT(*) AS employees_present,
+           SUM(worked_seconds) AS worked_seconds,
+           SUM(onsite_sessions) AS onsite_sessions,
+           SUM(remote_sessions) AS remote_sessions
+    FROM daily_attendance_summary
+    WHERE date BETWEEN date(?, ?) AND ?
+    GROUP BY date
+    ORDER BY date
+"""
+
+_dashboard_trend = {}
+
+def get_dashboard_trend(conn, today_date):
+    with _dashboard_cache_lock:
+        if _dashboard_trend.get('date') == today_date and _dashboard_trend['expires'] > time.monotonic():
+            return _dashboard_trend['trend']
+    trend = [dict(row, worked_hours=round(row['worked_seconds'] / 3600, 1)) for row in conn.execute(
+        DASHBOARD_TREND_QUERY, (today_date, f'-{DASHBOARD_TREND_DAYS - 1} days', today_date))]
+    with _dashboard_cache_lock:
+        _dashboard_trend.update(date=today_date, trend=trend, expires=time.monotonic() + DASHBOARD_TREND_TTL)
+    return trend
+
+def invalidate_dashboard_cache():
+    global _dashboard_cache_generation
+    with _dashboard_cache_lock:
+        _dashboard_cache_generation += 1
+        _dashboard_cache.clear()
 
 @app.route('/dashboard')
 @admin_required
 def dashboard():
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
- 
+
         # Get current date
         today_date = datetime.now().strftime('%Y-%m-%d')
- 
-        # Total Employees
-        cursor.execute("SELECT COUNT(*) FROM employees")
-        total_employees = cursor.fetchone()[0] or 0
- 
-        # Employees IN Today (marked in today, not marked out yet)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT E.id)
-            FROM employees E
-            JOIN attendance A ON E.id = A.employee_id
-            WHERE A.date = ? AND (A.time_out IS NULL OR A.time_out = '')
-        """, (today_date,))
-        employees_in_today = cursor.fetchone()[0] or 0
- 
-        # Employees OUT Today (marked in AND out today)
-        cursor.execute("""
-            SELECT COUNT(DISTINCT E.id)
-            FROM employees E
-            JOIN attendance A ON E.id = A.employee_id
-            WHERE A.date = ? AND A.time_out IS NOT NULL AND A.time_out != ''
-        """, (today_date,))
-        employees_out_today = cursor.fetchone()[0] or 0
- 
-        # Employees not marked today
-        employees_not_marked_today = total_employees - (employees_in_today + employees_out_today)
-        if employees_not_marked_today < 0:
-            employees_not_marked_today = 0
- 
-        # Total attendance records (all time)
-        cursor.execute("SELECT COUNT(*) FROM attendance")
-        total_attendance_records = cursor.fetchone()[0] or 0
- 
-        # Onsite records count (for today)
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM attendance
-            WHERE date = ? AND location = 'Onsite'
-        """, (today_date,))
-        onsite_count = cursor.fetchone()[0] or 0
- 
-        # Remote records count (for today)
-        cursor.execute("""
-            SELECT COUNT(*)
-            FROM attendance
-            WHERE date = ? AND location = 'Remote'
-        """, (today_date,))
-        Remote_count = cursor.fetchone()[0] or 0
- 
-        # Recent Attendance Activities
-        cursor.execute("""
-            SELECT E.name, A.date, A.time_in, A.time_out, A.location
-            FROM attendance A
-            JOIN employees E ON A.employee_id = E.id
-            ORDER BY A.date DESC, A.time_in DESC
-            LIMIT 10
-        """)
-        recent_activities = cursor.fetchall()
- 
+
+        stats = get_dashboard_stats(conn, today_date)
+        daily_trend = get_dashboard_trend(conn, today_date)
+
         return render_template('dashboard.html',
                             current_date=today_date,
-                            total_employees=total_employees,
-                            employees_in_today=employees_in_today,
-                            employees_out_today=employees_out_today,
-                            employees_not_marked_today=employees_not_marked_today,
-                            total_attendance_records=total_attendance_records,
-                            onsite_count=onsite_count,
-                            Remote_count=Remote_count,
-                            recent_activities=recent_activities)
+                            total_employees=stats['total_employees'],
+                            employees_in_today=stats['employees_in_today'],
+                            employees_out_today=stats['employees_out_today'],
+                            employees_not_marked_today=stats['employees_not_marked_today'],
+                            total_attendance_records=stats['total_attendance_records'],
+                            onsite_count=stats['onsite_count'],
+                            Remote_count=stats['remote_count'],
+                            recent_activities=stats['recent_activities'],
+                            daily_trend=daily_trend,
+                            live_events=LIVE_EVENTS,
+                            trend_max=max([day['employees_present'] for day in daily_trend], default=0) or 1)
  
     except sqlite3.Error as e:
         print(f"SQLite error: {e}")
@@ -378,9 +1187,6 @@ def dashboard():
         print(f"General error: {e}")
         flash(f"An error occurred: {e}", "error")
         return redirect(url_for('admin_dashboard'))
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 @app.route('/add_employee', methods=['GET', 'POST'])
 @admin_required
@@ -394,13 +1200,16 @@ def add_employee():
 
         if not employee_id_text or not name:
             flash("Employee ID and Name are required fields.", "error")
-            conn.close()
             return redirect(url_for('add_employee'))
 
         try:
             conn.execute("INSERT INTO employees (employee_id_text, name, department, job_title) VALUES (?, ?, ?, ?)",
                          (employee_id_text, name, department, job_title))
+            version = conn.execute("SELECT version FROM employees_version WHERE id = 1").fetchone()[0]
             conn.commit()
+            employee_directory.invalidate()
+            invalidate_dashboard_cache()
+            publish_dashboard_counters(delta={'total_employees': 1}, version=('employees', version))
             flash(f"Employee '{name}' (ID: {employee_id_text}) added successfully!", "success")
             return redirect(url_for('add_employee'))
         except sqlite3.IntegrityError:
@@ -410,12 +1219,91 @@ def add_employee():
             flash(f"An error occurred: {e}", "error")
             conn.rollback()
     
-    # Fetch employees to display, including their unique ID
-    employees = conn.execute("SELECT id, employee_id_text, name, department, job_title FROM employees ORDER BY name ASC").fetchall()
-    conn.close()
+    # Employees to display, including their unique ID
+    employees, _ = get_employees()
     return render_template('add_employee.html', employees=employees)
 
 
+EMPLOYEE_SEARCH_LIMIT = 10
+EMPLOYEE_SEARCH_MAX_LIMIT = 50
+
+# Typeahead search over the employee directory (employees_fts, see directory.py).
+# ?q= is matched word by word as prefixes of name, employee ID, department and job
+# title; ?limit= caps the matches returned. Open to the kiosk, which only gets the
+# name and employee ID of each match.
+@app.route('/api/employees/search')
+def api_search_employees():
+    try:
+        limit = int(request.args.get('limit', EMPLOYEE_SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'limit must be a number.'}), 400
+    if not 1 <= limit <= EMPLOYEE_SEARCH_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {EMPLOYEE_SEARCH_MAX_LIMIT}.'}), 400
+    query = request.args.get('q', '')
+    matches = search_employees(get_db_connection(), query, limit)
+    if not session.get('admin'):
+        matches = [{'id': match['id'], 'employee_id_text': match['employee_id_text'], 'name': match['name']}
+                   for match in matches]
+    return jsonify({'query': query, 'employees': matches})
+
+
+# Rows written per transaction by the employee CSV import, and how many per-row
+# errors its report lists before truncating
+IMPORT_CHUNK_SIZE = 500
+IMPORT_MAX_ERRORS = 1000
+
+# Upsert employees from an uploaded CSV (see employee_import.py). Accepts either a
+# multipart form with a "file" field or a raw text/csv request body, which is read
+# as a stream. Returns (report, error message).
+def run_employee_import():
+    if request.mimetype == 'text/csv':
+        stream = request.stream
+    elif 'file' in request.files:
+        stream = request.files['file'].stream
+    else:
+        return None, "Upload a CSV file in the 'file' field or send a text/csv body."
+
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        report = import_employees_csv(get_db_connection(), lines,
+                                      chunk_size=IMPORT_CHUNK_SIZE, max_errors=IMPORT_MAX_ERRORS)
+    except ImportFileError as e:
+        return None, str(e)
+    finally:
+        lines.detach()  # Leave closing the request stream to Werkzeug
+
+    if report['inserted'] or report['updated']:
+        employee_directory.invalidate()
+        invalidate_dashboard_cache()
+        # Committed in chunks, so a rebuild may have counted some of them: count afresh
+        publish_dashboard_counters(get_db_connection(), presence_index.today())
+    return report, None
+
+@app.route('/import_employees', methods=['POST'])
+@admin_required
+def import_employees():
+    report, error = run_employee_import()
+    if error:
+        flash(error, "error")
+        return redirect(url_for('add_employee'))
+    flash(f"Imported {report['rows']} rows: {report['inserted']} added, {report['updated']} updated, "
+          f"{report['unchanged']} unchanged, {report['skipped']} skipped.",
+          "success" if not report['skipped'] else "error")
+    for entry in report['errors'][:20]:
+        flash(f"Line {entry['line']}: {entry['message']}", "error")
+    if report['skipped'] > 20:
+        flash(f"... and {report['skipped'] - 20} more rows skipped; "
+              f"POST the file to {url_for('api_import_employees')} for the full report.", "error")
+    return redirect(url_for('add_employee'))
+
+@app.route('/api/employees/import', methods=['POST'])
+@admin_required
+def api_import_employees():
+    report, error = run_employee_import()
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify(report)
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -436,28 +1324,95 @@ def logout():
     flash("Logged out successfully.", "info")
     return redirect(url_for('index'))
 
+# Rows fetched from SQLite per batch while streaming /export_csv
+EXPORT_BATCH_SIZE = 1000
+
+# Accepted values of /export_csv's gzip argument (lower-cased), and whether each compresses
+EXPORT_GZIP_FLAGS = {'': False, '0': False, 'false': False, 'no': False, 'off': False,
+                     '1': True, 'true': True, 'yes': True, 'on': True}
+
 @app.route('/export_csv')
 @admin_required
 def export_csv():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT E.employee_id_text, E.name, A.date, A.time_in, A.time_out, A.location
-        FROM attendance A
-        JOIN employees E ON A.employee_id = E.id
-        ORDER BY A.date DESC, A.time_in DESC
-    """)
-    records = cursor.fetchall()
-    conn.close()
+    # Accepts the same start_date / end_date / employee_id_filter arguments as /records.
+    # Rows are read in fetchmany() batches and streamed to the client as they are
+    # formatted, so memory use stays flat however large the export is.
+    # Add ?gzip=1 to receive the file compressed on the fly as attendance_records.csv.gz.
+    # Archived partitions in the date range are read after the hot table, newest first.
+    gzip_flag = request.args.get('gzip', '').strip().lower()
+    employee_id_filter = request.args.get('employee_id_filter')
+    error = None
+    if gzip_flag not in EXPORT_GZIP_FLAGS:
+        error = "Invalid gzip option; use gzip=1 or gzip=0."
+    elif employee_id_filter and attendance_filter_clause(request.args)[2] is None:
+        error = "Invalid Employee ID filter."
+        employee_id_filter = None  # /records would flash it again
+    if error:
+        flash(error, "danger")
+        return redirect(url_for('records', start_date=request.args.get('start_date'),
+                                end_date=request.args.get('end_date'), employee_id_filter=employee_id_filter))
 
-    csv_data = "Employee ID,Employee Name,Date,Time In,Time Out,Location\n"
-    for record in records:
-        time_out = record['time_out'] if record['time_out'] else 'N/A'
-        csv_data += f"{record['employee_id_text']},{record['name']},{record['date']},{record['time_in']},{time_out},{record['location']}\n"
-    
-    response = app.make_response(csv_data)
-    response.headers["Content-Disposition"] = "attachment; filename=attendance_records.csv"
-    response.headers["Content-type"] = "text/csv"
+    # Archived partitions may be in a different storage format from the hot table
+    queries = {}
+    for storage, read_sql in ATTENDANCE_READ_SQL.items():
+        filter_sql, params, _ = attendance_filter_clause(request.args, storage)
+        queries[storage] = """
+            SELECT e.employee_id_text, e.name, a.date, a.time_in, a.time_out, a.location
+            FROM {schema}.attendance a
+            JOIN employees e ON a.employee_id = e.id
+            WHERE 1=1
+        """ + filter_sql + f" ORDER BY {read_sql['newest_first']}"
+    start_date, end_date = request.args.get('start_date'), request.args.get('end_date')
+
+    def generate_rows():
+        # The generator outlives the request's app context, so it checks out
+        # its own connection instead of the one stored on `g`.
+        conn = db_pool.acquire()
+        sources = attendance_archive.sources(conn, start_date, end_date)
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)  # Quotes names containing commas, quotes or newlines
+            writer.writerow(["Employee ID", "Employee Name", "Date", "Time In", "Time Out", "Location"])
+            for schema in sources:
+                query = queries[attendance_storage(conn, schema=schema)]
+                cursor = conn.execute(query.format(schema=schema), params)
+                try:
+                    while True:
+                        batch = cursor.fetchmany(EXPORT_BATCH_SIZE)
+                        if not batch:
+                            break
+                        writer.writerows(
+                            (record['employee_id_text'], record['name'], record['date'], record['time_in'],
+                             record['time_out'] if record['time_out'] else 'N/A', record['location'])
+                            for record in batch
+                        )
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate(0)
+                finally:
+                    # An archive can only be detached once nothing is reading from it
+                    cursor.close()
+            # Header only when there were no rows
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            sources.close()
+            db_pool.release(conn)
+
+    def generate_gzip():
+        compressor = zlib.compressobj(wbits=31)  # wbits=31 -> gzip container
+        for chunk in generate_rows():
+            data = compressor.compress(chunk.encode('utf-8'))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    if EXPORT_GZIP_FLAGS[gzip_flag]:
+        response = Response(generate_gzip(), mimetype="application/gzip")
+        response.headers["Content-Disposition"] = "attachment; filename=attendance_records.csv.gz"
+    else:
+        response = Response(generate_rows(), mimetype="text/csv")
+        response.headers["Content-Disposition"] = "attachment; filename=attendance_records.csv"
     return response
 
 @app.route('/employee_report/<int:employee_id>')
@@ -468,56 +1423,112 @@ def employee_report(employee_id):
     employee = conn.execute("SELECT id, employee_id_text, name, department, job_title FROM employees WHERE id = ?", (employee_id,)).fetchone()
     if not employee:
         flash("Employee not found.", "error")
-        conn.close()
         return redirect(url_for('dashboard')) # Redirect to dashboard if employee not found
 
-    attendance_records = []
-    
-    # Fetch all attendance records for the specific employee
-    # Calculate duration in minutes for each record
-    cursor = conn.cursor()
-    cursor.execute(f"""
-        SELECT date, time_in, time_out, location
-        FROM attendance
-        WHERE employee_id = ?
-        ORDER BY date DESC, time_in DESC
-    """, (employee_id,))
-    
-    raw_records = cursor.fetchall()
+    # All attendance records for the employee, with durations computed by SQLite
+    attendance_records = employee_sessions(conn, employee_id, archive=attendance_archive)
 
-    for record in raw_records:
-        duration_minutes = None
-        if record['time_in'] and record['time_out']:
-            try:
-                # Convert time strings to datetime objects to calculate duration
-                time_in_dt = datetime.strptime(record['time_in'], '%H:%M:%S')
-                time_out_dt = datetime.strptime(record['time_out'], '%H:%M:%S')
-                
-                # Handle cases where time_out might be on the next day (e.g., worked past midnight)
-                # For simplicity here, we assume within same day. If cross-day, need to adjust date.
-                if time_out_dt < time_in_dt:
-                    # This implies time_out is on the next day, add 24 hours to time_out_dt
-                    time_out_dt += timedelta(days=1)
-                
-                duration = time_out_dt - time_in_dt
-                duration_minutes = round(duration.total_seconds() / 60) # Convert to minutes
-            except ValueError:
-                # Handle cases where time format might be incorrect
-                duration_minutes = None 
-        
-        # Append record with calculated duration
-        attendance_records.append({
-            'date': record['date'],
-            'time_in': record['time_in'],
-            'time_out': record['time_out'],
-            'location': record['location'],
-            'duration_minutes': duration_minutes
-        })
-
-    conn.close()
-
-    return render_template('employee_report.html', employee=employee, attendance_records=attendance_records)
+    # Month-by-month totals over the employee's whole history
+    monthly_totals = attendance_summary(conn, '0001-01-01', '9999-12-31', period='month',
+                                        employee_id=employee_id, **report_settings())
+
+    return render_template('employee_report.html', employee=employee, attendance_records=attendance_records,
+                           monthly_totals=monthly_totals)
+
+# Standard working day and the latest on-time first check-in, for overtime and
+# late-arrival figures in reports
+WORKDAY_HOURS = float(os.environ.get('WORKDAY_HOURS', 8))
+LATE_AFTER = os.environ.get('LATE_AFTER', '09:15:00')
+
+def report_settings():
+    return {'workday_seconds': int(WORKDAY_HOURS * 3600), 'late_after': LATE_AFTER}
+
+# Reads start_date, end_date, period, group_by, department and employee_id from the
+# query string for /reports and /api/reports/attendance, defaulting to this month
+# per employee. Raises ValueError with a user-facing message on bad input.
+def report_args(args):
+    today = datetime.now()
+    start_date = args.get('start_date') or today.strftime('%Y-%m-01')
+    end_date = args.get('end_date') or today.strftime('%Y-%m-%d')
+    try:
+        start_date, end_date = parse_report_date(start_date), parse_report_date(end_date)
+    except ValueError:
+        raise ValueError("Dates must be in YYYY-MM-DD format.")
+    period = args.get('period', 'month')
+    group_by = args.get('group_by', 'employee')
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of: {', '.join(PERIODS)}.")
+    if group_by not in GROUPINGS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUPINGS)}.")
+    employee_id = None
+    if args.get('employee_id'):
+        try:
+            employee_id = int(args['employee_id'])
+        except ValueError:
+            raise ValueError("Invalid employee_id.")
+    return {'start_date': start_date, 'end_date': end_date, 'period': period, 'group_by': group_by,
+            'department': args.get('department') or None, 'employee_id': employee_id}
+
+@app.route('/reports')
+@admin_required
+def reports():
+    try:
+        filters = report_args(request.args)
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for('reports'))
+    conn = get_db_connection()
+    summary = attendance_summary(conn, **filters, **report_settings())
+    departments = [row[0] for row in conn.execute(
+        "SELECT DISTINCT COALESCE(NULLIF(department, ''), 'Unassigned') FROM employees ORDER BY 1")]
+    return render_template('reports.html', summary=summary, filters=filters, departments=departments,
+                           periods=list(PERIODS), groupings=list(GROUPINGS))
+
+# JSON variant of /reports, same query-string arguments
+@app.route('/api/reports/attendance')
+@admin_required
+def api_attendance_report():
+    try:
+        filters = report_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    summary = attendance_summary(get_db_connection(), **filters, **report_settings())
+    return jsonify({'filters': filters, 'workday_hours': WORKDAY_HOURS, 'late_after': LATE_AFTER,
+                    'summary': summary})
+
+
+@app.route('/db_pool_stats')
+@admin_required
+def db_pool_stats():
+    # Connection pool hit/miss counters and time spent waiting for a free connection
+    return jsonify(db_pool.stats())
+
+@app.route('/write_behind_stats')
+@admin_required
+def write_behind_stats():
+    # Queue depth and group-commit latency when write-behind mode is on
+    if not write_behind:
+        return jsonify({'enabled': False})
+    return jsonify(dict(write_behind.stats(), enabled=True))
+
+@app.route('/live_events_stats')
+@admin_required
+def live_events_stats():
+    # Connected SSE clients, events published and slow clients disconnected
+    return jsonify(event_broadcaster.stats())
+
+@app.route('/metrics')
+def metrics():
+    # Prometheus text exposition of the INSTRUMENTATION=1 histograms
+    if request_metrics is None:
+        return jsonify({'error': 'Instrumentation is off; start the app with INSTRUMENTATION=1.'}), 404
+    authorization = request.headers.get('Authorization', '')
+    if not session.get('admin') and not (
+            METRICS_TOKEN and hmac.compare_digest(authorization.encode(), f'Bearer {METRICS_TOKEN}'.encode())):
+        return jsonify({'error': 'Admin login or metrics token required.'}), 403
+    return Response(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    LIVE_EVENTS = os.environ.get('LIVE_EVENTS', '1') == '1'  # The development server is threaded
+    create_app().run(debug=True)
\ No newline at end of file
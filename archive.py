@@ -0,0 +1,245 @@
+import calendar
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from db import ATTENDANCE_READ_SQL, ATTENDANCE_TABLES, attendance_storage, rebuild_daily_summary, ts_in_sql, ts_out_sql
+
+# Name an archive file is attached under while it is being read or written.
+# Only one archive is attached to a connection at a time: SQLite allows just
+# ten attached databases, fewer than there are monthly partitions in a year.
+ARCHIVE_SCHEMA = 'archive'
+
+# Indexes on each archive's attendance table, per storage format: per-employee
+# history and the per-day report totals (covering, as on the hot table), and date
+# order (records, export_csv). As on the hot table, 'integer' archives index ts_in.
+ARCHIVE_INDEXES = {
+    'text': [
+        "CREATE INDEX IF NOT EXISTS {schema}.idx_archive_employee_date ON attendance (employee_id, date, time_in, time_out)",
+        "CREATE INDEX IF NOT EXISTS {schema}.idx_archive_date_time_in ON attendance (date, time_in)",
+    ],
+    'integer': [
+        "CREATE INDEX IF NOT EXISTS {schema}.idx_archive_employee_ts_in ON attendance (employee_id, ts_in)",
+        "CREATE INDEX IF NOT EXISTS {schema}.idx_archive_ts_in ON attendance (ts_in)",
+    ],
+}
+
+# Partition naming per period: SQL expression on a 'YYYY-MM-DD' date, and the strftime() equivalent
+PARTITION_PERIODS = {
+    'month': ("substr({date}, 1, 7)", '%Y-%m'),
+    'year': ("substr({date}, 1, 4)", '%Y'),
+}
+
+
+class AttendanceArchive:
+    """Closed months (or years) of attendance, moved out of the hot table into
+    one SQLite file per partition under ``directory``.
+
+    compact() moves rows; the attendance_partitions table in the main
+    database records which files exist and the dates each one covers.
+    Attendance left in the main table is always dated after every archived
+    partition (archived periods are read-only, see archived_through()), so
+    partitions never overlap: a query over several of them, newest first,
+    returns rows in date order by simply running against each in turn (see
+    sources()). Queries about recent dates never open an archive at all.
+
+    Pick ``period`` once; switching an archive directory between monthly and
+    yearly partitions is refused by compact().
+    """
+
+    def __init__(self, directory, period='month'):
+        if period not in PARTITION_PERIODS:
+            raise ValueError(f"period must be one of {', '.join(PARTITION_PERIODS)}")
+        self.directory = directory
+        self.period = period
+
+    def partition_name(self, date):
+        return datetime.strptime(date, '%Y-%m-%d').strftime(PARTITION_PERIODS[self.period][1])
+
+    def partition_range(self, name):
+        """First and last date (inclusive) of partition ``name``."""
+        if self.period == 'year':
+            return f'{name}-01-01', f'{name}-12-31'
+        year, month = map(int, name.split('-'))
+        return f'{name}-01', f'{name}-{calendar.monthrange(year, month)[1]:02d}'
+
+    def file_name(self, name):
+        return f'attendance-{name}.db'
+
+    def partitions(self, conn, start_date=None, end_date=None):
+        """Registered partitions overlapping the dates (inclusive, either may be None), newest first."""
+        return [dict(row) for row in conn.execute("""
+            SELECT name, file, start_date, end_date, row_count, archived_at FROM attendance_partitions
+            WHERE end_date >= COALESCE(?, end_date) AND start_date <= COALESCE(?, start_date)
+            ORDER BY start_date DESC
+        """, (start_date, end_date))]
+
+    def archived_through(self, conn):
+        """Last archived date, or None. Attendance up to it can no longer be written."""
+        return conn.execute("SELECT MAX(end_date) FROM attendance_partitions").fetchone()[0]
+
+    @contextmanager
+    def attached(self, conn, file, create=False):
+        path = os.path.join(self.directory, file)
+        if create:
+            os.makedirs(self.directory, exist_ok=True)
+        elif not os.path.exists(path):
+            # ATTACH would silently create an empty file instead
+            raise sqlite3.OperationalError(f"Attendance archive {path} is missing")
+        if any(row[1] == ARCHIVE_SCHEMA for row in conn.execute("PRAGMA database_list")):
+            conn.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")  # Left behind by an interrupted request
+        conn.execute(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (path,))
+        try:
+            yield ARCHIVE_SCHEMA
+        finally:
+            conn.execute(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+    def sources(self, conn, start_date=None, end_date=None):
+        """Yield the schemas holding attendance between the dates, newest first.
+
+        'main' (the hot table) comes first, then each overlapping archive,
+        which stays attached only until the next one is requested: finish
+        with a schema's cursors before moving on, and close() the generator
+        when stopping early.
+        """
+        yield 'main'
+        for partition in self.partitions(conn, start_date, end_date):
+            with self.attached(conn, partition['file']) as schema:
+                yield schema
+
+    def compact(self, conn, before, progress=None):
+        """Move attendance dated before ``before`` out of the hot table, one partition at a time.
+
+        ``before`` is rounded down to the start of its partition so that only
+        whole, closed periods move. Each partition is first copied into its
+        file in a transaction on that file alone, then the copied rows are
+        deleted from the main table and the partition registered in a second
+        transaction. Neither database is ever written without the other
+        already holding the rows, so an interrupted run leaves at worst
+        duplicates, which the next run cleans up. Rows written to the period
+        in between (late batch uploads) are picked up by another pass.
+        Returns [(partition name, rows moved)] in the order moved.
+        """
+        before = self.partition_range(self.partition_name(before))[0]
+        partition_of_start = PARTITION_PERIODS[self.period][0].format(date='start_date')
+        conflicting = conn.execute(
+            f"SELECT name FROM attendance_partitions WHERE name != {partition_of_start} LIMIT 1").fetchone()
+        if conflicting:
+            raise ValueError(f"The archive already holds partition {conflicting[0]!r}, "
+                             f"which isn't a {self.period}ly partition")
+
+        moved = []
+        while True:
+            oldest_first = ATTENDANCE_READ_SQL[attendance_storage(conn)]['oldest_first']
+            oldest = conn.execute(f"SELECT a.date FROM attendance a ORDER BY {oldest_first} LIMIT 1").fetchone()
+            if oldest is None or oldest[0] >= before:
+                break
+            name = self.partition_name(oldest[0])
+            rows = self._compact_partition(conn, name)
+            moved.append((name, rows))
+            if progress:
+                progress(name, rows)
+        if moved:
+            conn.execute("PRAGMA optimize")
+        return moved
+
+    def _compact_partition(self, conn, name):
+        start_date, end_date = self.partition_range(name)
+        file = self.file_name(name)
+        hot_storage = attendance_storage(conn)
+        read_sql = ATTENDANCE_READ_SQL[hot_storage]
+        in_partition = f"{read_sql['from_date']} AND {read_sql['through_date']}"  # On main.attendance a
+        moved = 0
+        with self.attached(conn, file, create=True) as schema:
+            if not conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'attendance'").fetchone():
+                conn.execute(ATTENDANCE_TABLES[hot_storage].format(name=f'{schema}.attendance'))
+            storage = attendance_storage(conn, schema=schema)
+            if storage == 'text':
+                columns = "id, employee_id, date, time_in, time_out, location"
+            elif hot_storage == 'integer':
+                columns = "id, employee_id, ts_in, ts_out, location"
+            else:
+                columns = (f"id, employee_id, {ts_in_sql('date', 'time_in')}, "
+                           f"{ts_out_sql('date', 'time_in', 'time_out')}, location")
+            target_columns = columns if storage == 'text' else "id, employee_id, ts_in, ts_out, location"
+
+            while True:
+                # 1. Copy. OR REPLACE: a row closed since an interrupted run copied it is newer.
+                conn.execute("BEGIN")
+                try:
+                    conn.execute(f"""
+                        INSERT OR REPLACE INTO {schema}.attendance ({target_columns})
+                        SELECT {columns} FROM main.attendance a WHERE {in_partition}
+                    """, (start_date, end_date))
+                    for statement in ARCHIVE_INDEXES[storage]:
+                        conn.execute(statement.format(schema=schema))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+
+                # 2. Delete what the archive now holds, identically, and register the partition
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    deleted = conn.execute(f"""
+                        DELETE FROM main.attendance AS a
+                        WHERE {in_partition} AND EXISTS (
+                            SELECT 1 FROM {schema}.attendance c
+                            WHERE c.id = a.id AND c.employee_id = a.employee_id AND c.date = a.date
+                              AND c.time_in = a.time_in AND c.time_out IS a.time_out
+                              AND c.location IS a.location)
+                    """, (start_date, end_date)).rowcount
+                    # The triggers only see the delete: archived rows still count as records,
+                    # and their days stay in daily_attendance_summary
+                    conn.execute("UPDATE table_row_counts SET row_count = row_count + ? WHERE table_name = 'attendance'",
+                                 (deleted,))
+                    rebuild_daily_summary(conn, start_date, end_date, schemas=(schema, 'main'))
+                    conn.execute(f"""
+                        INSERT INTO attendance_partitions (name, file, start_date, end_date, row_count, archived_at)
+                        VALUES (?, ?, ?, ?, (SELECT COUNT(*) FROM {schema}.attendance), datetime('now', 'localtime'))
+                        ON CONFLICT (name) DO UPDATE SET row_count = excluded.row_count, archived_at = excluded.archived_at
+                    """, (name, file, start_date, end_date))
+                    remaining = conn.execute(f"SELECT EXISTS (SELECT 1 FROM main.attendance a WHERE {in_partition})",
+                                             (start_date, end_date)).fetchone()[0]
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                moved += deleted
+                if not remaining:
+                    break
+            conn.execute(f"ANALYZE {schema}")
+        return moved
+
+    def rebuild_daily_summary(self, conn, progress=None):
+        """Recompute daily_attendance_summary from every archived partition and the hot table.
+
+        Each partition is rebuilt in a transaction of its own, as ATTACH
+        can't run inside one, and the hot table's dates last.
+        """
+        partitions = self.partitions(conn)
+        for partition in reversed(partitions):
+            with self.attached(conn, partition['file']) as schema:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    rebuild_daily_summary(conn, partition['start_date'], partition['end_date'], schemas=(schema,))
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            if progress:
+                progress(partition['name'])
+        hot_start = None
+        if partitions:
+            last_archived = datetime.strptime(partitions[0]['end_date'], '%Y-%m-%d')
+            hot_start = (last_archived + timedelta(days=1)).strftime('%Y-%m-%d')
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rebuild_daily_summary(conn, start_date=hot_start)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if progress:
+            progress('hot table')
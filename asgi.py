@@ -0,0 +1,278 @@
+"""ASGI entry point: serve the app from one asyncio event loop.
+
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+(uvicorn, or any other ASGI server, has to be installed separately; the
+threaded ``python app.py`` / WSGI deployment keeps working unchanged.)
+
+The endpoints that are held open or hit constantly are answered on the event
+loop itself and never tie up a thread while waiting:
+
+- /get_attendance_status/<id> comes straight from the in-memory presence
+  index;
+- /events streams Server-Sent Events, however many clients are connected.
+
+Everything else, and any database access the two need, runs on the Flask
+app in a bounded thread pool of ASGI_DB_THREADS workers (by default the
+connection pool size). A burst of slow requests therefore queues for a
+thread instead of piling up blocked threads or connections. Run one process
+per CPU core, as with the WSGI server.
+"""
+import asyncio
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from itsdangerous import BadSignature
+from werkzeug.http import parse_cookie
+
+import app as attendance_app
+from events import format_event
+
+# /events is answered on the event loop, so pages can keep it open (see app.LIVE_EVENTS)
+attendance_app.LIVE_EVENTS = os.environ.get('LIVE_EVENTS', '1') == '1'
+flask_app = attendance_app.create_app()
+
+db_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('ASGI_DB_THREADS', attendance_app.db_pool.max_size)),
+    thread_name_prefix='asgi-db')
+
+# Request bodies larger than this are spooled to a temporary file (CSV imports)
+MAX_BODY_IN_MEMORY = 1024 * 1024
+
+STATUS_PATH = re.compile(r'^/get_attendance_status/(\d+)$')
+
+
+def run_blocking(func, *args):
+    return asyncio.get_running_loop().run_in_executor(db_executor, func, *args)
+
+
+async def send_response(send, status, body, content_type='application/json', headers=()):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type.encode('latin-1')),
+                            (b'content-length', str(len(body)).encode('latin-1')), *headers]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+# --- Natively async endpoints ---
+
+async def attendance_status(send, employee_id):
+    # Same answer as the Flask view; SQLite is only touched when a version check is due
+    if attendance_app.presence_index.check_due():
+        await run_blocking(attendance_app.sync_presence_index)
+    status = attendance_app.presence_index.status(employee_id)
+    await send_response(send, 200, b'{"status":"%s"}\n' % status.encode('ascii'))
+
+
+def session_from_scope(scope):
+    # Decode Flask's signed session cookie without going through a request context
+    cookies = parse_cookie(header_value(scope, b'cookie') or '')
+    value = cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    if not value:
+        return {}
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    try:
+        return serializer.loads(value, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except BadSignature:
+        return {}
+
+
+def header_value(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def initial_frames(topics):
+    # Snapshots for a new subscriber (runs on the executor: it may query SQLite)
+    attendance_app.sync_presence_index()
+    date, statuses = attendance_app.presence_index.statuses()
+    broadcaster = attendance_app.event_broadcaster
+    frames = []
+    if 'presence' in topics:
+        frames.append(format_event(broadcaster.last_id, 'presence',
+                                   {'type': 'snapshot', 'date': date, 'statuses': statuses}))
+    if 'dashboard' in topics:
+        frames.append(format_event(broadcaster.last_id, 'dashboard',
+                                   {'type': 'counters', 'counters': attendance_app.dashboard_counters_snapshot(date),
+                                    'delta': {}}))
+    return frames
+
+
+async def live_events(scope, receive, send):
+    # The asyncio counterpart of app.live_events(), with the same parameters and frames
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    topics = set(filter(None, query.get('topics', ['presence'])[0].split(',')))
+    if not topics <= {'presence', 'dashboard'}:
+        return await send_response(send, 400, b'{"error":"topics must be presence and/or dashboard."}\n')
+    if 'dashboard' in topics and not session_from_scope(scope).get('admin'):
+        return await send_response(send, 403, b'{"error":"The dashboard topic requires an admin login."}\n')
+    try:
+        last_event_id = header_value(scope, b'last-event-id') or query.get('last_event_id', [None])[0]
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    broadcaster = attendance_app.event_broadcaster
+    subscription, resumed = broadcaster.subscribe(topics, last_event_id)
+    if subscription is None:
+        return await send_response(send, 503, b"Too many live connections, try again shortly.\n",
+                                   'text/plain', [(b'retry-after', b'10')])
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    subscription.on_ready = lambda: loop.call_soon_threadsafe(ready.set)
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        frames = [] if resumed else await run_blocking(initial_frames, topics)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'body': b''.join([b"retry: 3000\n\n", *frames]),
+                    'more_body': True})
+        while not subscription.closed and not disconnected.done():
+            ready.clear()
+            frames = subscription.drain()
+            if not frames:
+                waiter = asyncio.ensure_future(ready.wait())
+                await asyncio.wait({waiter, disconnected}, timeout=attendance_app.SSE_HEARTBEAT_SECONDS,
+                                   return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if ready.is_set() or disconnected.done():
+                    continue
+                if attendance_app.presence_index.check_due():
+                    await run_blocking(attendance_app.sync_presence_index)
+                frames = [b": keepalive\n\n"]
+            await send({'type': 'http.response.body', 'body': b''.join(frames), 'more_body': True})
+        if not disconnected.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    except OSError:
+        pass  # Client went away mid-send
+    finally:
+        disconnected.cancel()
+        broadcaster.unsubscribe(subscription)
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+# --- Everything else: the Flask app on the executor ---
+
+async def read_body(receive):
+    body = tempfile.SpooledTemporaryFile(max_size=MAX_BODY_IN_MEMORY)
+    more_body = True
+    while more_body:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body.write(message.get('body', b''))
+        more_body = message.get('more_body', False)
+    body.seek(0)
+    return body
+
+
+def wsgi_environ(scope, body):
+    # The body has been read in full (and de-chunked) by read_body(), so its length is
+    # known even for a chunked upload: Werkzeug reads nothing without CONTENT_LENGTH.
+    length = body.seek(0, os.SEEK_END)
+    body.seek(0)
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_LENGTH', 'TRANSFER_ENCODING'):
+            continue
+        if name == 'CONTENT_TYPE':
+            environ[name] = value
+        else:
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    environ['CONTENT_LENGTH'] = str(length)
+    return environ
+
+
+def run_wsgi(environ, send, loop):
+    # Runs on the executor. Each chunk is handed to the event loop and awaited
+    # there, so a streamed response (e.g. /export_csv) is sent with backpressure.
+    response_started = []
+
+    def start_response(status, headers, exc_info=None):
+        response_started[:] = [int(status.split(' ', 1)[0]),
+                               [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]]
+
+    def forward(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    result = flask_app(environ, start_response)
+    try:
+        started = False
+        for chunk in result:
+            if not chunk:
+                continue
+            if not started:
+                forward({'type': 'http.response.start', 'status': response_started[0],
+                         'headers': response_started[1]})
+                started = True
+            forward({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not started:
+            forward({'type': 'http.response.start', 'status': response_started[0], 'headers': response_started[1]})
+        forward({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+
+async def wsgi_fallback(scope, receive, send):
+    body = await read_body(receive)
+    try:
+        await run_blocking(run_wsgi, wsgi_environ(scope, body), send, asyncio.get_running_loop())
+    finally:
+        body.close()
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            db_executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        raise ValueError(f"Unsupported ASGI scope type {scope['type']!r}")
+    if scope['method'] == 'GET':
+        match = STATUS_PATH.match(scope['path'])
+        if match:
+            return await attendance_status(send, int(match.group(1)))
+        if scope['path'] == '/events':
+            return await live_events(scope, receive, send)
+    return await wsgi_fallback(scope, receive, send)
@@ -0,0 +1,31 @@
+"""Benchmarks for the attendance app.
+
+Run from the repository root, e.g. ``python -m benchmarks.bench_dashboard``.
+Synthetic databases are written under ``benchmarks/data/`` (git-ignored) and
+reused between runs when the requested size matches.
+"""
+import math
+import os
+
+import app
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+
+def use_database(path, pool_size=8):
+    """Point the app at the database file at ``path`` and make sure its schema exists.
+
+    Re-creates the app on a pool for ``path`` via app.create_app(), which
+    also moves the attendance archive beside it and reloads the in-memory
+    state built from it, so routes, helpers and init_db() all work against
+    the benchmark database.
+    """
+    app.create_app(path, pool_size)
+    return app.db_pool
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of the sorted ``samples``, e.g. fraction=0.95 for p95; None if empty."""
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, math.ceil(fraction * len(samples)) - 1)]
@@ -0,0 +1,95 @@
+"""Attendance archive: hot-path and history queries before and after `flask compact-attendance`.
+
+    python -m benchmarks.bench_archive --employees 2000 --days 365
+
+Copies a synthetic database, times each query on it, moves every closed
+month but the last into monthly archive files (archive.AttendanceArchive)
+and times the same queries again. Also compares the main database file's
+size after VACUUM, which is what backups and VACUUM itself have to process.
+"""
+import argparse
+import os
+import shutil
+import time
+from datetime import date, timedelta
+
+import app
+from benchmarks import use_database
+from benchmarks.bench_dashboard import time_calls
+from benchmarks.data import create_synthetic_database, database_path
+
+
+def scenarios(client, conn, employees):
+    today = date.today()
+    old_start = (today - timedelta(days=180)).strftime('%Y-%m-01')
+    old_end = (today - timedelta(days=150)).strftime('%Y-%m-%d')
+    return {
+        'dashboard stats (uncached)': lambda: app.query_dashboard_stats(conn, today.isoformat()),
+        'presence index load': lambda: app.presence_index.load(conn),
+        'records, first page': lambda: client.get('/api/records'),
+        'records, page 5 months back': lambda: client.get(
+            '/api/records', query_string={'start_date': old_start, 'end_date': old_end}),
+        'export_csv, last 30 days': lambda: client.get(
+            '/export_csv', query_string={'start_date': (today - timedelta(days=30)).isoformat()}).data,
+        'report, month 5 months back': lambda: client.get(
+            '/api/reports/attendance', query_string={'start_date': old_start, 'end_date': old_end}),
+        'employee_report (full history)': lambda: client.get(f'/employee_report/{employees // 2}'),
+    }
+
+
+def vacuumed_size(conn, path):
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    source = database_path(args.employees, args.days)
+    rows = create_synthetic_database(source, employees=args.employees, days=args.days)
+    path = database_path(args.employees, args.days, name='bench-archive')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(source, path)
+    pool = use_database(path)
+    shutil.rmtree(app.attendance_archive.directory, ignore_errors=True)
+    print(f"{args.employees} employees, {rows} attendance rows")
+
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['admin'] = True
+    conn = pool.acquire()
+    try:
+        size_before = vacuumed_size(conn, path)
+        before = {name: time_calls(func, args.iterations)
+                  for name, func in scenarios(client, conn, args.employees).items()}
+
+        today = date.today()
+        month = today.year * 12 + today.month - 1 - app.ARCHIVE_KEEP_MONTHS
+        started = time.perf_counter()
+        moved = app.attendance_archive.compact(conn, f'{month // 12:04d}-{month % 12 + 1:02d}-01')
+        elapsed = time.perf_counter() - started
+        hot_rows = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+        size_after = vacuumed_size(conn, path)
+        print(f"compacted {sum(count for _, count in moved)} rows into {len(moved)} partitions "
+              f"in {elapsed:.1f} s; {hot_rows} rows left in the hot table")
+        print(f"main database after VACUUM: {size_before / 2**20:.1f} MiB -> {size_after / 2**20:.1f} MiB")
+
+        after = {name: time_calls(func, args.iterations)
+                 for name, func in scenarios(client, conn, args.employees).items()}
+    finally:
+        pool.release(conn)
+
+    print(f"{'':32} {'single table p50':>18} {'archived p50':>14}")
+    for name in before:
+        print(f"{name:32} {before[name]['p50_ms']:>15} ms {after[name]['p50_ms']:>11} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Sync vs. async serving: the threaded WSGI server vs. asgi.py under uvicorn.
+
+    python -m benchmarks.bench_asgi --connections 1000 --sse 1000 --duration 10
+
+Each mode is started in its own process on the same synthetic database. For
+each, ``--sse`` idle /events subscribers are connected first (kiosks and
+dashboards left open). Then ``--connections`` keep-alive clients each send
+requests back to back for ``--duration`` seconds. They run once against
+/get_attendance_status/<id> and once against /dashboard (as an admin).
+Reports requests/s, p50/p99 latency, failed connections and the server's
+thread count and peak RSS. Needs uvicorn.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import time
+
+import app
+from benchmarks import percentile
+from benchmarks.data import create_synthetic_database, database_path
+
+
+def serve(mode, path, port):
+    from benchmarks import use_database
+    use_database(path)
+    if mode == 'sync':
+        import logging
+        from werkzeug.serving import ThreadedWSGIServer, make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        ThreadedWSGIServer.request_queue_size = 4096  # listen() backlog, as uvicorn's below
+        make_server('127.0.0.1', port, app.app, threaded=True).serve_forever()
+    else:
+        import uvicorn
+        import asgi
+        uvicorn.run(asgi.application, host='127.0.0.1', port=port, log_level='warning',
+                    backlog=4096, timeout_keep_alive=60)
+
+
+def admin_cookie():
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['admin'] = True
+    return client.get_cookie('session').value
+
+
+async def request_loop(port, paths, headers, deadline, latencies, failures):
+    # Keep-alive where the server allows it; Werkzeug's server answers
+    # "Connection: close", so reconnect whenever that's the case.
+    writer = None
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(f"GET {random.choice(paths)} HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n".encode('latin-1'))
+            head = (await reader.readuntil(b'\r\n\r\n')).lower()
+            length = 0
+            for line in head.split(b'\r\n'):
+                if line.startswith(b'content-length:'):
+                    length = int(line.split(b':', 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if b'\r\nconnection: close' in head:
+                writer.close()
+                writer = None
+    except (OSError, asyncio.IncompleteReadError):
+        failures.append(1)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def hold_subscriber(port, connected, stop):
+    try:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b"GET /events?topics=presence HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await reader.readuntil(b'\r\n\r\n')
+    except (OSError, asyncio.IncompleteReadError):
+        return
+    connected.append(1)
+    while not stop.is_set():
+        try:
+            if not await asyncio.wait_for(reader.read(65536), 1.0):
+                break
+        except asyncio.TimeoutError:
+            pass
+    writer.close()
+
+
+async def run_load(port, pid, args, cookie):
+    stop = asyncio.Event()
+    connected = []
+    holders = [asyncio.ensure_future(hold_subscriber(port, connected, stop)) for _ in range(args.sse)]
+    await asyncio.sleep(2 + args.sse / 500)
+
+    results = {'sse_subscribers': len(connected), 'max_threads': process_status(pid)[0]}
+    scenarios = {
+        'status': ([f'/get_attendance_status/{n}' for n in range(1, args.employees + 1)], ''),
+        'dashboard': (['/dashboard'], f'Cookie: session={cookie}\r\n'),
+    }
+    for name, (paths, headers) in scenarios.items():
+        latencies, failures = [], []
+        deadline = time.perf_counter() + args.duration
+        clients = asyncio.gather(*(request_loop(port, paths, headers, deadline, latencies, failures)
+                                   for _ in range(args.connections)))
+        await asyncio.sleep(args.duration / 2)
+        results['max_threads'] = max(results['max_threads'], process_status(pid)[0])
+        await clients
+        results['max_threads'] = max(results['max_threads'], process_status(pid)[0])
+        latencies.sort()
+        results[name] = {
+            'requests_per_s': round(len(latencies) / args.duration),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+            'failed_connections': len(failures),
+        }
+    stop.set()
+    await asyncio.gather(*holders, return_exceptions=True)
+    return results
+
+
+def process_status(pid):
+    with open(f'/proc/{pid}/status') as status:
+        fields = dict(line.split(':', 1) for line in status)
+    return int(fields['Threads']), int(fields['VmHWM'].split()[0]) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--sse', type=int, default=1000, help='Idle /events subscribers held open.')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--port', type=int, default=8631)
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.database, args.port)
+
+    path = database_path(args.employees, args.days)
+    create_synthetic_database(path, employees=args.employees, days=args.days)
+    cookie = admin_cookie()
+    env = dict(os.environ, SSE_MAX_SUBSCRIBERS=str(args.sse + 100))
+    print(f"{args.connections} request connections, {args.sse} idle SSE subscribers, "
+          f"{args.duration:g} s per scenario, {os.cpu_count()} CPU(s)")
+    for mode in ('sync', 'async'):
+        server = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_asgi', '--serve', mode,
+                                   '--database', path, '--port', str(args.port)], env=env)
+        try:
+            time.sleep(4)
+            results = asyncio.run(run_load(args.port, server.pid, args, cookie))
+            peak_rss = process_status(server.pid)[1]
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:5}  SSE connected {results['sse_subscribers']:>5}   server threads {results['max_threads']:>5}   "
+              f"peak RSS {peak_rss:7.1f} MiB")
+        for name in ('status', 'dashboard'):
+            result = results[name]
+            print(f"       {name:9}  {result['requests_per_s']:>7} req/s   p50 {result['p50_ms']:>8} ms   "
+                  f"p99 {result['p99_ms']:>8} ms   failed connections {result['failed_connections']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Check-in/check-out throughput: one event per /mark_in or /mark_out POST vs. /api/attendance/batch.
+
+    python -m benchmarks.bench_batch --employees 2000 --batch-size 200
+"""
+import argparse
+import os
+import time
+
+import app
+from benchmarks import use_database
+from benchmarks.data import create_synthetic_database, database_path
+
+
+def fresh_database(employees):
+    # Employees only, no history, so every run starts with nobody marked in
+    path = database_path(employees, 0, name='batch')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    create_synthetic_database(path, employees=employees, days=0)
+    use_database(path)
+
+
+def run_single(client, employees):
+    started = time.perf_counter()
+    for employee_id in range(1, employees + 1):
+        client.post('/mark_in', data={'employee_id': employee_id, 'location': 'Onsite'})
+    for employee_id in range(1, employees + 1):
+        client.post('/mark_out', data={'employee_id': employee_id})
+    return time.perf_counter() - started
+
+
+def run_batch(client, employees, batch_size):
+    events = ([{'employee_id': n, 'action': 'in', 'location': 'Onsite'} for n in range(1, employees + 1)] +
+              [{'employee_id': n, 'action': 'out'} for n in range(1, employees + 1)])
+    started = time.perf_counter()
+    for offset in range(0, len(events), batch_size):
+        response = client.post('/api/attendance/batch', json={'events': events[offset:offset + batch_size]})
+        assert response.json['rejected'] == 0, response.json
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=200)
+    args = parser.parse_args()
+
+    # No cookie jar: otherwise every un-read flash() message piles up in the session cookie
+    client = app.app.test_client(use_cookies=False)
+    events = args.employees * 2
+
+    fresh_database(args.employees)
+    single = run_single(client, args.employees)
+    fresh_database(args.employees)
+    batch = run_batch(client, args.employees, args.batch_size)
+
+    print(f"{events} events ({args.employees} employees, IN then OUT)")
+    print(f"single-event POSTs        {single:8.3f} s   {events / single:10.0f} events/s")
+    print(f"batches of {args.batch_size:<6}        {batch:8.3f} s   {events / batch:10.0f} events/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Dashboard latency: the original seven queries vs. the single aggregate pass and its cache.
+
+    python -m benchmarks.bench_dashboard --employees 10000 --days 550
+
+(10,000 employees x 550 days at 90% presence is about 5M attendance rows.)
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+import app
+from benchmarks import percentile, use_database
+from benchmarks.data import create_synthetic_database, database_path
+
+
+def seven_query_dashboard(conn, today_date):
+    # The dashboard() implementation before the aggregate query, kept for comparison
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM employees")
+    cursor.fetchone()
+    cursor.execute("""
+        SELECT COUNT(DISTINCT E.id) FROM employees E JOIN attendance A ON E.id = A.employee_id
+        WHERE A.date = ? AND (A.time_out IS NULL OR A.time_out = '')""", (today_date,))
+    cursor.fetchone()
+    cursor.execute("""
+        SELECT COUNT(DISTINCT E.id) FROM employees E JOIN attendance A ON E.id = A.employee_id
+        WHERE A.date = ? AND A.time_out IS NOT NULL AND A.time_out != ''""", (today_date,))
+    cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM attendance")
+    cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM attendance WHERE date = ? AND location = 'Onsite'", (today_date,))
+    cursor.fetchone()
+    cursor.execute("SELECT COUNT(*) FROM attendance WHERE date = ? AND location = 'Remote'", (today_date,))
+    cursor.fetchone()
+    cursor.execute("""
+        SELECT E.name, A.date, A.time_in, A.time_out, A.location FROM attendance A
+        JOIN employees E ON A.employee_id = E.id ORDER BY A.date DESC, A.time_in DESC LIMIT 10""")
+    cursor.fetchall()
+
+
+def time_calls(func, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p50_ms': round(percentile(samples, 0.5), 3),
+        'p95_ms': round(percentile(samples, 0.95), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=550)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    path = database_path(args.employees, args.days)
+    rows = create_synthetic_database(path, employees=args.employees, days=args.days)
+    pool = use_database(path)
+    print(f"{args.employees} employees, {rows} attendance rows ({path})")
+
+    today_date = datetime.now().strftime('%Y-%m-%d')
+    conn = pool.acquire()
+    try:
+        results = {
+            'seven queries (before)': time_calls(lambda: seven_query_dashboard(conn, today_date), args.iterations),
+            'aggregate query, uncached': time_calls(lambda: app.query_dashboard_stats(conn, today_date), args.iterations),
+            'aggregate query, cached': time_calls(lambda: app.get_dashboard_stats(conn, today_date), args.iterations),
+        }
+    finally:
+        pool.release(conn)
+
+    for name, result in results.items():
+        print(f"{name:28} mean {result['mean_ms']:>9} ms   p50 {result['p50_ms']:>9} ms   p95 {result['p95_ms']:>9} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Employee onboarding: one /add_employee form POST per person vs. a CSV upload to /api/employees/import.
+
+    python -m benchmarks.bench_import --employees 3000
+
+Also measures the import's peak Python memory (tracemalloc) for a small and
+a large file, which should depend on IMPORT_CHUNK_SIZE rather than file size.
+"""
+import argparse
+import csv
+import os
+import time
+import tracemalloc
+
+import app
+from benchmarks import DATA_DIR, use_database
+from benchmarks.data import DEPARTMENTS, database_path
+from employee_import import import_employees_csv
+
+
+def fresh_database(name):
+    path = database_path(0, 0, name=name)
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    use_database(path)
+
+
+def write_csv(path, employees, prefix='IMP'):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['employee_id_text', 'name', 'department', 'job_title'])
+        for n in range(1, employees + 1):
+            writer.writerow([f'{prefix}{n:07d}', f'Imported Employee {n:07d}', DEPARTMENTS[n % len(DEPARTMENTS)], 'Staff'])
+
+
+def admin_client():
+    client = app.app.test_client()
+    with client.session_transaction() as session:
+        session['admin'] = True
+    return client
+
+
+def run_form_posts(employees):
+    # What onboarding looks like today: POST, then the redirect re-renders the list
+    fresh_database('import-form')
+    client = admin_client()
+    started = time.perf_counter()
+    for n in range(1, employees + 1):
+        client.post('/add_employee', data={'employee_id_text': f'IMP{n:07d}', 'name': f'Imported Employee {n:07d}',
+                                           'department': DEPARTMENTS[n % len(DEPARTMENTS)], 'job_title': 'Staff'},
+                    follow_redirects=True)
+    return time.perf_counter() - started
+
+
+def run_upload(path):
+    fresh_database('import-csv')
+    client = admin_client()
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        response = client.post('/api/employees/import', data=f, content_type='text/csv')
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200 and not response.json['skipped'], response.json
+    return elapsed
+
+
+def peak_import_memory(path):
+    fresh_database('import-memory')
+    conn = app.db_pool.acquire()
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            tracemalloc.start()
+            import_employees_csv(conn, f, chunk_size=app.IMPORT_CHUNK_SIZE)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    finally:
+        app.db_pool.release(conn)
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=3000)
+    parser.add_argument('--large', type=int, default=200000, help='Rows in the file used for the memory comparison.')
+    args = parser.parse_args()
+
+    small_csv = os.path.join(DATA_DIR, f'import-{args.employees}.csv')
+    large_csv = os.path.join(DATA_DIR, f'import-{args.large}.csv')
+    write_csv(small_csv, args.employees)
+    write_csv(large_csv, args.large)
+
+    form = run_form_posts(args.employees)
+    upload = run_upload(small_csv)
+    print(f"{args.employees} employees")
+    print(f"one form POST each   {form:8.3f} s   {args.employees / form:10.0f} employees/s")
+    print(f"one CSV upload       {upload:8.3f} s   {args.employees / upload:10.0f} employees/s")
+    for path, rows in ((small_csv, args.employees), (large_csv, args.large)):
+        print(f"peak import memory, {rows:>7} rows ({os.path.getsize(path) / 2**20:6.1f} MiB file): "
+              f"{peak_import_memory(path) / 2**10:8.1f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""What INSTRUMENTATION=1 and PROFILE_SAMPLE_RATE cost the check-in hot path and the dashboard.
+
+    python -m benchmarks.bench_instrumentation --employees 2000 --days 30
+
+Runs the same requests with instrumentation off, with the query, request
+and template metrics on, and with the metrics plus 1% cProfile sampling.
+Each /mark_in + /mark_out pair goes to a fresh database copy's employees in
+turn, so every pair does the full write. Also times a /metrics scrape.
+"""
+import argparse
+import os
+import shutil
+import tempfile
+from functools import partial
+
+import app
+from benchmarks import use_database
+from benchmarks.bench_dashboard import time_calls
+from benchmarks.data import create_synthetic_database, database_path
+from db import PooledConnection
+from instrumentation import InstrumentedConnection, Metrics, RequestProfiler
+
+
+def configure(mode, profile_dir):
+    app.request_metrics = Metrics() if mode != 'off' else None
+    app.request_profiler = RequestProfiler(profile_dir, 0.01) if mode == 'metrics + 1% profiling' else None
+    app.db_pool.close_all()
+    app.db_pool.factory = (partial(InstrumentedConnection, metrics=app.request_metrics)
+                           if app.request_metrics else PooledConnection)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    source = database_path(args.employees, args.days)
+    create_synthetic_database(source, employees=args.employees, days=args.days)
+    path = database_path(args.employees, args.days, name='bench-instrumentation')
+    profile_dir = tempfile.mkdtemp(prefix='bench-profiles-')
+
+    # No cookie jar for the kiosk requests, as their flash() messages would pile up in it
+    kiosk = app.app.test_client(use_cookies=False)
+    admin = app.app.test_client()
+    with admin.session_transaction() as session:
+        session['admin'] = True
+
+    results = {}
+    for mode in ('off', 'metrics', 'metrics + 1% profiling'):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        shutil.copyfile(source, path)
+        use_database(path)
+        configure(mode, profile_dir)
+        employee_ids = iter(range(1, args.employees + 1))
+
+        def check_in_out():
+            employee_id = next(employee_ids)
+            # buffered: the test client only closes (and so records) a response it has buffered
+            kiosk.post('/mark_in', data={'employee_id': employee_id, 'location': 'Onsite'}, buffered=True)
+            kiosk.post('/mark_out', data={'employee_id': employee_id}, buffered=True)
+
+        results[mode] = {
+            'mark_in + mark_out': time_calls(check_in_out, min(args.iterations, args.employees)),
+            'get_attendance_status': time_calls(
+                lambda: kiosk.get(f'/get_attendance_status/{args.employees // 2}', buffered=True), args.iterations),
+            'dashboard': time_calls(lambda: admin.get('/dashboard', buffered=True), args.iterations // 5),
+        }
+        if app.request_metrics:
+            results[mode]['/metrics scrape'] = time_calls(lambda: admin.get('/metrics', buffered=True), 20)
+    configure('off', profile_dir)
+    profiles = len(os.listdir(profile_dir))
+    shutil.rmtree(profile_dir)
+
+    modes = list(results)
+    print(f"{args.employees} employees, {args.days} days; p50 per request (ms); {profiles} profiles written")
+    print(f"{'':24}" + ''.join(f"{mode:>26}" for mode in modes))
+    for name in results['metrics']:
+        print(f"{name:24}" + ''.join(f"{results[mode][name]['p50_ms'] if name in results[mode] else '-':>26}"
+                                     for mode in modes))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Employee typeahead search: the employees_fts index vs. a LIKE scan, at directory sizes the kiosk <select> can't handle.
+
+    python -m benchmarks.bench_search --employees 100000
+
+Builds a directory of employees with varied names (the other benchmarks'
+"Employee 000123" names all share one prefix), then times search_employees()
+and GET /api/employees/search for inputs as they are typed, and the kiosk
+page with the full <select> vs. with the search box.
+"""
+import argparse
+import os
+import random
+import time
+
+import app
+from benchmarks import use_database
+from benchmarks.bench_dashboard import time_calls
+from benchmarks.data import DEPARTMENTS, database_path
+from directory import search_employees
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Charles', 'Karen',
+               'Aarav', 'Priya', 'Wei', 'Mei', 'Hiroshi', 'Yuki', 'Olusegun', 'Amara', 'José', 'Zoë', 'Søren',
+               'Ingrid', 'Mohammed', 'Fatima', 'Dmitri', 'Anastasia', 'Lucas', 'Camille', 'Mateo', 'Valentina']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+              'Sharma', 'Patel', 'Zhang', 'Wang', 'Tanaka', 'Sato', 'Adeyemi', 'Okafor', 'Müller', 'Schmidt',
+              'Ångström', 'Nielsen', 'Haddad', 'Khan', 'Ivanov', 'Petrova', 'Dubois', 'Moreau', 'Rossi', 'Silva']
+JOB_TITLES = ['Engineer', 'Analyst', 'Manager', 'Associate', 'Specialist', 'Technician', 'Coordinator', 'Director']
+
+# What a kiosk user has typed so far, from the first letter to a full name or ID
+INPUTS = ['m', 'ma', 'mar', 'mart', 'martinez', 'maria mar', 'zoë ång', 'emp00123', 'EMP012345', 'sales', 'xyz']
+
+
+def like_search(conn, text, limit=10):
+    # The obvious alternative: a scan of every employee
+    pattern = f'%{text.strip()}%'
+    return conn.execute("""
+        SELECT id, employee_id_text, name, department, job_title FROM employees
+        WHERE name LIKE ?1 OR employee_id_text LIKE ?1 OR department LIKE ?1 OR job_title LIKE ?1
+        ORDER BY name LIMIT ?2
+    """, (pattern, limit)).fetchall()
+
+
+def build_directory(path, employees, seed=0):
+    if os.path.exists(path):
+        return
+    use_database(path)
+    rng = random.Random(seed)
+    conn = app.db_pool.acquire()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO employees (employee_id_text, name, department, job_title) VALUES (?, ?, ?, ?)",
+                ((f'EMP{n:06d}', f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', rng.choice(DEPARTMENTS),
+                  rng.choice(JOB_TITLES)) for n in range(1, employees + 1)))
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        app.db_pool.release(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=100000)
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    path = database_path(args.employees, 0, name='bench-search')
+    build_directory(path, args.employees)
+    pool = use_database(path)
+    conn = pool.acquire()
+    try:
+        started = time.perf_counter()
+        conn.execute("INSERT INTO employees_fts (employees_fts) VALUES ('rebuild')")
+        conn.commit()
+        print(f"{args.employees} employees; rebuilding employees_fts takes {time.perf_counter() - started:.2f} s")
+
+        kiosk = app.app.test_client(use_cookies=False)
+        print(f"{'input':14} {'matches':>8} {'LIKE scan p50':>14} {'FTS5 p50':>10} {'FTS5 p95':>10} {'API p50':>10}")
+        for text in INPUTS:
+            matches = len(search_employees(conn, text, 50))
+            like = time_calls(lambda: like_search(conn, text), max(args.iterations // 10, 3))
+            fts = time_calls(lambda: search_employees(conn, text), args.iterations)
+            api = time_calls(lambda: kiosk.get('/api/employees/search', query_string={'q': text}), args.iterations)
+            print(f"{text:14} {matches:>8} {like['p50_ms']:>11} ms {fts['p50_ms']:>7} ms {fts['p95_ms']:>7} ms "
+                  f"{api['p50_ms']:>7} ms")
+    finally:
+        pool.release(conn)
+
+    # The kiosk page, as a full <select> and with the search box
+    for limit, label in ((args.employees, 'full <select>'), (0, 'search box')):
+        app.KIOSK_SELECT_MAX_EMPLOYEES = limit
+        timing = time_calls(lambda: kiosk.get('/'), 5)
+        print(f"kiosk page, {label:14} {len(kiosk.get('/').data) / 1024:>9.0f} KiB   p50 {timing['p50_ms']} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Live presence push: hundreds of /events subscribers while employees mark in and out.
+
+    python -m benchmarks.bench_sse --subscribers 300 --slow 30 --events 2000
+
+Serves the app on a local port with the threaded Werkzeug server. Every
+subscriber holds one /events?topics=presence stream; the "slow" ones stop
+reading after the snapshot (a stalled browser tab) and should be cut off
+once their SSE_MAX_PENDING buffer fills, while the rest keep receiving.
+Reports delivery latency from the start of each /mark_in or /mark_out POST
+to the event's arrival, per-subscriber completeness and peak memory.
+"""
+import argparse
+import http.client
+import multiprocessing
+import resource
+import socket
+import threading
+import time
+
+from werkzeug.serving import make_server
+
+import app
+from benchmarks import percentile
+from benchmarks.bench_batch import fresh_database
+
+
+def subscribe(port, slow, ready, arrivals):
+    # One subscriber; appends the arrival time of each presence status event
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.sock = socket.socket()
+    if slow:
+        # A tiny receive window (set before connecting so it is advertised), so
+        # the server-side buffer fills up rather than the kernel's
+        conn.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+    conn.sock.connect(('127.0.0.1', port))
+    conn.request('GET', '/events?topics=presence')
+    response = conn.getresponse()
+    event = None
+    try:
+        for line in response:
+            if line.startswith(b'event: '):
+                event = line[7:].rstrip()
+            elif line.startswith(b'data: ') and event == b'presence':
+                if b'"snapshot"' in line:
+                    ready.release()
+                    if slow:
+                        time.sleep(3600)  # A stalled tab: never read again
+                    continue
+                arrivals.append(time.time())
+    except (OSError, http.client.HTTPException):
+        pass
+
+
+def subscriber_process(port, count, slow_count, ready, done, results):
+    # Subscribers run in separate processes so their parsing doesn't compete
+    # with the server for the GIL; each reports its arrival times at the end.
+    arrivals = [[] for _ in range(count)]
+    for n in range(count):
+        threading.Thread(target=subscribe, args=(port, n < slow_count, ready, arrivals[n]), daemon=True).start()
+    done.wait()
+    results.put([times for n, times in enumerate(arrivals) if n >= slow_count])
+
+
+def percentile_ms(samples, fraction):
+    return round(percentile(samples, fraction), 3) if samples else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscribers', type=int, default=300)
+    parser.add_argument('--slow', type=int, default=30, help='How many subscribers stop reading.')
+    parser.add_argument('--events', type=int, default=5000, help='mark_in/mark_out POSTs to send.')
+    parser.add_argument('--employees', type=int, default=500)
+    parser.add_argument('--sndbuf', type=int, default=16384, help='Server socket send buffer, bytes.')
+    parser.add_argument('--processes', type=int, default=4, help='Processes the subscribers are spread over.')
+    args = parser.parse_args()
+
+    fresh_database(args.employees)
+    server = make_server('127.0.0.1', 0, app.app, threaded=True)
+    port = server.server_port
+    # Accepted sockets inherit this. Without a fixed size Linux lets a stalled
+    # loopback connection buffer megabytes, and the app-level limit never
+    # comes into play within a short run.
+    server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, args.sndbuf)
+
+    # Fork the subscriber processes before any server threads exist
+    context = multiprocessing.get_context('fork')
+    ready = context.Semaphore(0)
+    done = context.Event()
+    workers = []
+    for n in range(args.processes):
+        count = args.subscribers // args.processes + (n < args.subscribers % args.processes)
+        slow = args.slow // args.processes + (n < args.slow % args.processes)
+        results = context.Queue()
+        process = context.Process(target=subscriber_process, args=(port, count, slow, ready, done, results), daemon=True)
+        process.start()
+        workers.append((process, results))
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    for _ in range(args.subscribers):
+        ready.acquire(timeout=30)
+    print(f"{app.event_broadcaster.stats()['subscribers']} subscribers connected ({args.slow} slow)")
+
+    sent = []
+    peak_queued = 0
+    driver = http.client.HTTPConnection('127.0.0.1', port)
+    started = time.perf_counter()
+    for n in range(args.events):
+        employee_id = n % args.employees + 1
+        marking_in = (n // args.employees) % 2 == 0
+        body = f'employee_id={employee_id}&location=Onsite' if marking_in else f'employee_id={employee_id}'
+        sent.append(time.time())
+        driver.request('POST', '/mark_in' if marking_in else '/mark_out', body,
+                       {'Content-Type': 'application/x-www-form-urlencoded'})
+        driver.getresponse().read()
+        if n % 50 == 0:
+            peak_queued = max(peak_queued, app.event_broadcaster.stats()['max_queued'])
+    elapsed = time.perf_counter() - started
+    time.sleep(2.0)  # Let the last events drain
+
+    done.set()
+    fast = []
+    for process, results in workers:
+        fast.extend(results.get(timeout=60))
+    # One driver thread, so the i-th event each subscriber sees is the i-th POST
+    latencies = sorted((arrived - sent[i]) * 1000 for times in fast for i, arrived in enumerate(times))
+    stats = app.event_broadcaster.stats()
+    print(f"{args.events} events in {elapsed:.2f} s ({args.events / elapsed:.0f} events/s) "
+          f"fanned out to {len(fast)} reading subscribers")
+    print(f"reading subscribers with every event: {sum(len(times) == args.events for times in fast)}/{len(fast)}")
+    print(f"delivery latency ms: p50 {percentile_ms(latencies, 0.5)}  p95 {percentile_ms(latencies, 0.95)}  "
+          f"p99 {percentile_ms(latencies, 0.99)}")
+    print(f"slow subscribers disconnected: {stats['dropped_slow_subscribers']}/{args.slow}  "
+          f"peak queued frames per subscriber: {peak_queued} (limit {stats['max_pending']})")
+    print(f"server peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Worker startup: how long until a fresh process can serve, and what its first requests cost.
+
+    python -m benchmarks.bench_startup --employees 2000 --days 90 --runs 5
+
+Each run is a new Python process pointed at the database by
+ATTENDANCE_DB_PATH, as a server worker would be:
+
+- import: ``import app`` alone, which no longer touches the database;
+- create_app: the app factory, against the synthetic database (warm: its
+  schema is current, so only the version is checked) and against a new,
+  empty file (cold: the schema is created);
+- lazy: no create_app(), so the first request runs startup() instead,
+  as with ``flask run`` or a server given ``app:app``.
+
+For each, the process's wall time is split into interpreter + import,
+startup, and the first and second GET / through the test client. The
+server rows start ``--server`` (or both) in a process and time it from
+launch until the first response to GET /, and that request and the next.
+"""
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks import DATA_DIR
+from benchmarks.bench_asgi import serve
+from benchmarks.data import create_synthetic_database, database_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter, so that ``import app`` is timed from scratch
+MEASURE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+if sys.argv[1] != 'lazy':
+    app.create_app()
+ready = time.perf_counter()
+client = app.app.test_client(use_cookies=False)
+timings = {'import_ms': imported - started, 'startup_ms': ready - imported}
+for name in ('first_request_ms', 'second_request_ms'):
+    request_started = time.perf_counter()
+    assert client.get('/', buffered=True).status_code == 200
+    timings[name] = time.perf_counter() - request_started
+print(json.dumps({name: seconds * 1000 for name, seconds in timings.items()}))
+"""
+
+
+def remove_database(path):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def measure_process(mode, path):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', MEASURE, mode], cwd=ROOT, check=True, capture_output=True,
+                            text=True, env=dict(os.environ, ATTENDANCE_DB_PATH=path)).stdout
+    timings = json.loads(output.splitlines()[-1])
+    timings['process_ms'] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def get(port, path='/'):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    finally:
+        connection.close()
+
+
+def measure_server(mode, path, port):
+    started = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_startup', '--serve', mode,
+                               '--database', path, '--port', str(port)], cwd=ROOT)
+    try:
+        while True:
+            if server.poll() is not None:
+                raise SystemExit(f"The {mode} server exited with status {server.returncode}")
+            request_started = time.perf_counter()
+            try:
+                status = get(port)
+            except OSError:
+                time.sleep(0.01)
+                continue
+            finished = time.perf_counter()
+            break
+        second_started = time.perf_counter()
+        get(port)
+        second = time.perf_counter() - second_started
+    finally:
+        server.terminate()
+        server.wait()
+    if status != 200:
+        raise SystemExit(f"The {mode} server answered GET / with {status}")
+    return {'boot_ms': (finished - started) * 1000, 'first_request_ms': (finished - request_started) * 1000,
+            'second_request_ms': second * 1000}
+
+
+def median(runs):
+    return {name: round(statistics.median(run[name] for run in runs), 1) for name in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--server', choices=['sync', 'async', 'both'], default='both',
+                        help="'async' and 'both' need uvicorn.")
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.database, args.port)
+        return
+
+    path = database_path(args.employees, args.days)
+    create_synthetic_database(path, employees=args.employees, days=args.days)
+    empty = os.path.join(DATA_DIR, 'bench-startup-empty.db')
+
+    results = {}
+    for name, mode, target in (('create_app, warm', 'factory', path), ('create_app, cold', 'factory', empty),
+                               ('lazy (first request)', 'lazy', path)):
+        runs = []
+        for _ in range(args.runs):
+            if target == empty:
+                remove_database(empty)
+            runs.append(measure_process(mode, target))
+        results[name] = median(runs)
+    remove_database(empty)
+
+    servers = []
+    for mode in ('sync', 'async'):
+        if args.server in (mode, 'both'):
+            results[f'{mode} server'] = median([measure_server(mode, path, args.port) for _ in range(args.runs)])
+            servers.append(f'{mode} server')
+
+    print(f"{args.employees} employees, {args.days} days; median of {args.runs} runs (ms)")
+    columns = ('process_ms', 'import_ms', 'startup_ms', 'first_request_ms', 'second_request_ms')
+    print(f"{'':22}" + ''.join(f"{column[:-3]:>16}" for column in columns))
+    for name, timings in results.items():
+        if name not in servers:
+            print(f"{name:22}" + ''.join(f"{timings[column]:>16}" for column in columns))
+    for name in servers:
+        timings = results[name]
+        print(f"{name:22} boot to first response {timings['boot_ms']:>8} ms   first request "
+              f"{timings['first_request_ms']:>7} ms   second request {timings['second_request_ms']:>7} ms")
+
+
+if __name__ == '__main__':
+    main()
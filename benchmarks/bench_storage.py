@@ -0,0 +1,72 @@
+"""Attendance storage: TEXT date/time columns vs. integer timestamps (db.migrate_to_integer_timestamps).
+
+    python -m benchmarks.bench_storage --employees 2000 --days 365
+
+Builds a TEXT database, migrates a copy, VACUUMs both and compares the space
+taken by the attendance table and its indexes, then times a date-range
+report and the records listing on each.
+"""
+import argparse
+import shutil
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from db import ATTENDANCE_READ_SQL, attendance_storage, migrate_to_integer_timestamps
+from benchmarks.bench_dashboard import time_calls
+from benchmarks.data import create_synthetic_database, database_path
+from reports import attendance_summary
+
+
+def attendance_bytes(conn):
+    # Needs SQLite built with SQLITE_ENABLE_DBSTAT_VTAB (the python.org builds are)
+    return dict(conn.execute("""
+        SELECT CASE WHEN m.type = 'table' THEN 'table' ELSE 'indexes' END, SUM(s.pgsize)
+        FROM dbstat s JOIN sqlite_master m ON m.name = s.name
+        WHERE m.tbl_name = 'attendance'
+        GROUP BY 1
+    """).fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    text_path = database_path(args.employees, args.days)
+    rows = create_synthetic_database(text_path, employees=args.employees, days=args.days)
+    integer_path = database_path(args.employees, args.days, name='bench-integer')
+    shutil.copyfile(text_path, integer_path)
+    print(f"{args.employees} employees, {rows} attendance rows")
+
+    conn = sqlite3.connect(integer_path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    started = time.perf_counter()
+    copied = migrate_to_integer_timestamps(conn)
+    print(f"migrated {copied} rows in {time.perf_counter() - started:.1f} s")
+    conn.close()
+
+    end_date = date.today().strftime('%Y-%m-%d')
+    start_date = (date.today() - timedelta(days=30)).strftime('%Y-%m-%d')
+    for path in (text_path, integer_path):
+        conn = sqlite3.connect(path, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("VACUUM")
+        sizes = attendance_bytes(conn)
+        read_sql = ATTENDANCE_READ_SQL[attendance_storage(conn)]
+        report = time_calls(lambda: attendance_summary(conn, start_date, end_date), args.iterations)
+        listing = time_calls(lambda: conn.execute(f"""
+            SELECT a.id, a.date, a.time_in, a.time_out, a.location FROM attendance a
+            WHERE {read_sql['from_date']} AND {read_sql['through_date']}
+            ORDER BY {read_sql['newest_first']} LIMIT 1000
+        """, (start_date, end_date)).fetchall(), args.iterations)
+        print(f"{attendance_storage(conn):8} table {sizes['table'] / 2**20:8.1f} MiB   "
+              f"indexes {sizes['indexes'] / 2**20:8.1f} MiB   "
+              f"30-day report p50 {report['p50_ms']:>9} ms   1000-row listing p50 {listing['p50_ms']:>8} ms")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+"""Every route, in-process and under concurrent load, with the results saved as JSON for comparing commits.
+
+    python -m benchmarks.bench_suite --employees 2000 --days 90 --output before.json
+    python -m benchmarks.bench_suite --employees 2000 --days 90 --compare before.json
+
+Two phases, each on a fresh copy of the same synthetic database:
+
+- test_client: each route is called --requests times in a row through
+  Flask's test client, which measures the app alone.
+- load: the app is started in a server process (the threaded WSGI server,
+  or asgi.py under uvicorn with --server async) and --concurrency
+  keep-alive connections send requests to one route at a time for
+  --duration seconds each.
+
+Check-ins go through /mark_in and /mark_out in pairs for employees who
+aren't marked in, so every one is a real write. For each route the JSON
+records requests, errors, requests/s and latency percentiles. Each phase
+also records peak RSS (the benchmark process, or the server) and the
+database size afterwards, next to the commit, versions and relevant
+environment settings.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from urllib.parse import urlencode
+
+import app
+from benchmarks import DATA_DIR, percentile, use_database
+from benchmarks.bench_asgi import admin_cookie, process_status, serve
+from benchmarks.data import DEFAULT_LOCATIONS, create_synthetic_database, database_path, parse_locations
+
+ROUTES = ('mark_in', 'mark_out', 'get_attendance_status', 'index', 'dashboard', 'records', 'export_csv',
+          'employee_report')
+
+# Settings that change what a run measures, recorded with the results
+RECORDED_ENVIRONMENT = ('ATTENDANCE_STORAGE', 'ATTENDANCE_WRITE_BEHIND', 'DB_POOL_SIZE', 'INSTRUMENTATION',
+                        'PROFILE_SAMPLE_RATE', 'ASGI_DB_THREADS', 'DASHBOARD_CACHE_TTL')
+
+
+class Scenarios:
+    """The requests sent to each route: (route, method, path, form or None, needs admin).
+
+    requests(route) returns a function giving the next request(s) to send
+    in order; mark_in and mark_out share one that yields a pair for the
+    next employee in a rotation of those not marked in, so neither is ever
+    rejected while concurrency stays below the rotation's length.
+    """
+
+    def __init__(self, conn, employees, locations, export_days, seed=0):
+        self.employees = employees
+        self.locations = locations
+        self.export_start = (date.today() - timedelta(days=export_days)).isoformat()
+        self.rng = random.Random(seed)
+        self.rotation = [row[0] for row in conn.execute("""
+            SELECT e.id FROM employees e
+            WHERE NOT EXISTS (SELECT 1 FROM attendance a
+                              WHERE a.employee_id = e.id AND a.date = ? AND a.time_out IS NULL)
+            ORDER BY e.id
+        """, (date.today().isoformat(),))]
+        self.position = 0
+
+    def next_employee(self):
+        return self.rng.randint(1, self.employees)
+
+    def check_in_out(self):
+        employee_id = self.rotation[self.position % len(self.rotation)]
+        self.position += 1
+        location = self.rng.choices(list(self.locations), weights=list(self.locations.values()))[0]
+        return [('mark_in', 'POST', '/mark_in', {'employee_id': employee_id, 'location': location}, False),
+                ('mark_out', 'POST', '/mark_out', {'employee_id': employee_id}, False)]
+
+    def requests(self, route):
+        if route in ('mark_in', 'mark_out'):
+            return self.check_in_out
+        paths = {
+            'get_attendance_status': lambda: f'/get_attendance_status/{self.next_employee()}',
+            'index': lambda: '/',
+            'dashboard': lambda: '/dashboard',
+            'records': lambda: '/records',
+            'export_csv': lambda: f'/export_csv?{urlencode({"start_date": self.export_start})}',
+            'employee_report': lambda: f'/employee_report/{self.next_employee()}',
+        }[route]
+        admin = route not in ('get_attendance_status', 'index')
+        return lambda: [(route, 'GET', paths(), None, admin)]
+
+
+def expected_status(method):
+    # The kiosk POSTs redirect back to the index; an admin page redirecting means the login failed
+    return 302 if method == 'POST' else 200
+
+
+def summarise(latencies, errors, elapsed):
+    latencies.sort()
+    count = len(latencies)
+
+    def percentile_ms(fraction):
+        return round(percentile(latencies, fraction) * 1000, 3) if count else None
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'requests_per_s': round(count / elapsed, 1) if elapsed else None,
+        'mean_ms': round(sum(latencies) / count * 1000, 3) if count else None,
+        'p50_ms': percentile_ms(0.5),
+        'p90_ms': percentile_ms(0.9),
+        'p99_ms': percentile_ms(0.99),
+        'max_ms': round(latencies[-1] * 1000, 3) if count else None,
+    }
+
+
+def fresh_copy(source, name):
+    # Through the backup API, which also copies whatever is still in the source's WAL
+    path = os.path.join(os.path.dirname(source), name + '.db')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    with sqlite3.connect(source) as source_conn, sqlite3.connect(path) as copy:
+        source_conn.backup(copy)
+    source_conn.close()
+    copy.close()
+    return path
+
+
+def database_size(path):
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+
+
+def peak_rss_mib():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (2**20 if sys.platform == 'darwin' else 1024), 1)  # bytes on macOS, KiB elsewhere
+
+
+# --- Phase 1: Flask's test client ---
+
+def run_test_client(path, args):
+    pool = use_database(path)
+    conn = pool.acquire()
+    try:
+        scenarios = Scenarios(conn, args.employees, args.locations, args.export_days)
+    finally:
+        pool.release(conn)
+    # No cookie jar for the kiosk, or its un-read flash() messages would pile up in the session cookie
+    kiosk = app.app.test_client(use_cookies=False)
+    admin = app.app.test_client(use_cookies=False)
+    admin_headers = {'Cookie': f"{app.app.config['SESSION_COOKIE_NAME']}={admin_cookie()}"}
+
+    routes = {}
+    for route in args.routes:
+        if route == 'mark_out' and 'mark_in' in args.routes:
+            continue  # Measured together with mark_in
+        next_requests = scenarios.requests(route)
+        latencies, errors = {}, {}
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            for name, method, url, form, needs_admin in next_requests():
+                request_started = time.perf_counter()
+                # buffered: the response is read and closed, as a server would
+                response = (admin if needs_admin else kiosk).open(
+                    url, method=method, data=form, headers=admin_headers if needs_admin else None, buffered=True)
+                latencies.setdefault(name, []).append(time.perf_counter() - request_started)
+                errors[name] = errors.get(name, 0) + (response.status_code != expected_status(method))
+        elapsed = time.perf_counter() - started
+        for name in latencies:
+            routes[name] = summarise(latencies[name], errors[name], elapsed)
+    return {'peak_rss_mib': peak_rss_mib(), 'database_bytes_after': database_size(path), 'routes': routes}
+
+
+# --- Phase 2: a server process under concurrent load ---
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.split(b'\r\n')
+    status = int(lines[0].split(b' ', 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if b':' in line:
+            name, value = line.split(b':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+    if headers.get(b'transfer-encoding') == b'chunked':  # Streamed responses (/export_csv)
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';', 1)[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif b'content-length' in headers:
+        await reader.readexactly(int(headers[b'content-length']))
+    else:
+        await reader.read()  # Delimited by closing the connection
+        return status, True
+    return status, headers.get(b'connection') == b'close'
+
+
+async def load_worker(port, next_requests, cookie, deadline, latencies, errors):
+    reader = writer = None
+    try:
+        while time.perf_counter() < deadline:
+            for name, method, url, form, needs_admin in next_requests():
+                body = urlencode(form).encode('ascii') if form else b''
+                headers = f"Cookie: session={cookie}\r\n" if needs_admin else ''
+                if form:
+                    headers += f"Content-Type: application/x-www-form-urlencoded\r\nContent-Length: {len(body)}\r\n"
+                started = time.perf_counter()
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(f"{method} {url} HTTP/1.1\r\nHost: localhost\r\n{headers}\r\n".encode('latin-1') + body)
+                status, closed = await read_response(reader)
+                latencies.setdefault(name, []).append(time.perf_counter() - started)
+                errors[name] = errors.get(name, 0) + (status != expected_status(method))
+                if closed:  # Werkzeug's server answers "Connection: close"
+                    writer.close()
+                    writer = None
+    except (OSError, asyncio.IncompleteReadError, ValueError):
+        errors['connection'] = errors.get('connection', 0) + 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def drive_route(port, next_requests, cookie, args):
+    latencies, errors = {}, {}
+    deadline = time.perf_counter() + args.duration
+    started = time.perf_counter()
+    await asyncio.gather(*(load_worker(port, next_requests, cookie, deadline, latencies, errors)
+                           for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+    failed_connections = errors.pop('connection', 0)
+    results = {name: summarise(latencies[name], errors.get(name, 0), elapsed) for name in latencies}
+    for result in results.values():
+        result['failed_connections'] = failed_connections
+    return results
+
+
+def wait_for_port(port, server, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"The server process exited with status {server.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"The server didn't start listening on port {port} within {timeout} s")
+
+
+def run_load(path, args):
+    conn = sqlite3.connect(path)
+    try:
+        scenarios = Scenarios(conn, args.employees, args.locations, args.export_days)
+    finally:
+        conn.close()
+    cookie = admin_cookie()
+    server = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_suite', '--serve', args.server,
+                               '--database', path, '--port', str(args.port)])
+    try:
+        wait_for_port(args.port, server)
+        routes = {}
+        max_threads = 0
+        for route in args.routes:
+            if route == 'mark_out' and 'mark_in' in args.routes:
+                continue
+            routes.update(asyncio.run(drive_route(args.port, scenarios.requests(route), cookie, args)))
+            max_threads = max(max_threads, process_status(server.pid)[0])
+        peak_rss = process_status(server.pid)[1]
+    finally:
+        server.terminate()
+        server.wait()
+    return {'server': args.server, 'concurrency': args.concurrency, 'duration_s': args.duration,
+            'server_peak_rss_mib': round(peak_rss, 1), 'server_max_threads': max_threads,
+            'database_bytes_after': database_size(path), 'routes': routes}
+
+
+# --- Results ---
+
+def git_revision():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=root, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def print_results(results, baseline=None):
+    for phase in ('test_client', 'load'):
+        if phase not in results:
+            continue
+        routes = results[phase]['routes']
+        previous = (baseline or {}).get(phase, {}).get('routes', {})
+        print(f"\n{phase}" + (f" ({results[phase]['server']} server, {results[phase]['concurrency']} connections)"
+                                if phase == 'load' else ''))
+        print(f"  {'route':24} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'errors':>7}"
+              + ('   p50 vs. baseline' if previous else ''))
+        for name, result in routes.items():
+            line = (f"  {name:24} {result['requests_per_s']:>9} {result['p50_ms']:>9} {result['p90_ms']:>9} "
+                    f"{result['p99_ms']:>9} {result['errors']:>7}")
+            if previous.get(name, {}).get('p50_ms'):
+                line += f"   {previous[name]['p50_ms']:>8} ms ({result['p50_ms'] / previous[name]['p50_ms'] - 1:+.0%})"
+            print(line)
+        rss = results[phase].get('peak_rss_mib', results[phase].get('server_peak_rss_mib'))
+        print(f"  peak RSS {rss} MiB, database {results[phase]['database_bytes_after'] / 2**20:.1f} MiB after the run")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--punches', type=int, default=1, help='IN/OUT sessions per employee per day.')
+    parser.add_argument('--locations', type=parse_locations, default=DEFAULT_LOCATIONS,
+                        help='Location weights, e.g. Onsite=0.6,Remote=0.4.')
+    parser.add_argument('--routes', type=lambda value: value.split(','), default=list(ROUTES),
+                        help=f"Comma-separated subset of: {', '.join(ROUTES)}.")
+    parser.add_argument('--phases', type=lambda value: value.split(','), default=['test_client', 'load'])
+    parser.add_argument('--requests', type=int, default=200, help='Requests per route in the test_client phase.')
+    parser.add_argument('--concurrency', type=int, default=50, help='Connections in the load phase.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per route in the load phase.')
+    parser.add_argument('--server', choices=['sync', 'async'], default='sync',
+                        help='Threaded WSGI server, or asgi.py under uvicorn.')
+    parser.add_argument('--export-days', type=int, default=7, help='Days of attendance per /export_csv request.')
+    parser.add_argument('--port', type=int, default=8632)
+    parser.add_argument('--output', help='Write the results here as JSON (default: benchmarks/data/suite-<commit>.json).')
+    parser.add_argument('--compare', help='Results JSON of an earlier run to compare the p50 latencies with.')
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        return serve(args.serve, args.database, args.port)
+    unknown = set(args.routes) - set(ROUTES)
+    if unknown:
+        parser.error(f"Unknown routes: {', '.join(sorted(unknown))}")
+    if args.server == 'async' and 'load' in args.phases:
+        import uvicorn  # noqa: F401 -- fail now rather than once the server process starts
+
+    source = database_path(args.employees, args.days, args.punches, locations=args.locations)
+    rows = create_synthetic_database(source, employees=args.employees, days=args.days,
+                                     punches_per_day=args.punches, locations=args.locations)
+    commit, dirty = git_revision()
+    results = {
+        'commit': commit,
+        'dirty': dirty,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'environment': {name: os.environ[name] for name in RECORDED_ENVIRONMENT if name in os.environ},
+        'database': {'employees': args.employees, 'days': args.days, 'punches_per_day': args.punches,
+                     'locations': args.locations, 'attendance_rows': rows, 'bytes': database_size(source)},
+    }
+    print(f"{args.employees} employees, {rows} attendance rows, {results['database']['bytes'] / 2**20:.1f} MiB")
+    if 'test_client' in args.phases:
+        results['test_client'] = run_test_client(fresh_copy(source, 'suite-test-client'), args)
+    if 'load' in args.phases:
+        results['load'] = run_load(fresh_copy(source, 'suite-load'), args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as file:
+            baseline = json.load(file)
+        print(f"baseline: {args.compare} (commit {(baseline.get('commit') or 'unknown')[:12]})")
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(DATA_DIR, f"suite-{(commit or 'unknown')[:12]}{'-dirty' if dirty else ''}.json")
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+    print(f"\nresults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Reports from daily_attendance_summary vs. from raw attendance rows, and what the triggers cost writes.
+
+    python -m benchmarks.bench_summary --employees 2000 --days 365 --punches 4
+
+Times a year-long report both ways, the dashboard's trend query, and an
+IN/OUT write pair with and without the summary triggers.
+"""
+import argparse
+import os
+import shutil
+from datetime import date, timedelta
+
+import app
+from benchmarks import use_database
+from benchmarks.bench_dashboard import time_calls
+from benchmarks.data import create_synthetic_database, database_path
+from db import SESSION_SECONDS_SQL, attendance_storage, attendance_write_sql, daily_summary_triggers
+from reports import attendance_summary
+
+
+def raw_attendance_summary(conn, start_date, end_date, group_by):
+    # attendance_summary() before the summary table: the per-day CTE over every punch
+    group_columns, group_key = {'employee': ("e.id, e.name", "e.id"),
+                                'department': ("e.department", "e.department")}[group_by]
+    return conn.execute(f"""
+        WITH daily AS (
+            SELECT a.employee_id, a.date, COUNT(*) AS sessions,
+                   SUM({SESSION_SECONDS_SQL[attendance_storage(conn)]}) AS worked_seconds, MIN(a.time_in) AS first_in
+            FROM attendance a WHERE a.date BETWEEN ? AND ?
+            GROUP BY a.employee_id, a.date
+        )
+        SELECT {group_columns}, substr(daily.date, 1, 7) AS period, COUNT(DISTINCT daily.employee_id),
+               COUNT(*), SUM(daily.sessions), SUM(daily.worked_seconds),
+               SUM(MAX(daily.worked_seconds - 28800, 0)), SUM(daily.first_in > '09:15:00')
+        FROM daily JOIN employees e ON e.id = daily.employee_id
+        GROUP BY {group_key}, period
+    """, (start_date, end_date)).fetchall()
+
+
+def write_pair(conn, employee_id, day):
+    # One IN and its OUT, each in its own transaction as mark_in/mark_out do
+    statements = attendance_write_sql(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    row_id = conn.execute(statements['insert'], (employee_id, day, '08:00:00', None, 'Onsite')).lastrowid
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    conn.execute(statements['close'], ('17:00:00', row_id))
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--punches', type=int, default=4, help='IN/OUT sessions per employee per day.')
+    parser.add_argument('--iterations', type=int, default=10)
+    args = parser.parse_args()
+
+    source = database_path(args.employees, args.days, args.punches)
+    rows = create_synthetic_database(source, employees=args.employees, days=args.days, punches_per_day=args.punches)
+    path = database_path(args.employees, args.days, args.punches, name='bench-summary')
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    shutil.copyfile(source, path)
+    pool = use_database(path)
+    conn = pool.acquire()
+    try:
+        summary_rows = conn.execute("SELECT COUNT(*) FROM daily_attendance_summary").fetchone()[0]
+        print(f"{args.employees} employees, {rows} attendance rows, {summary_rows} summary rows")
+
+        today = date.today().isoformat()
+        year_ago = (date.today() - timedelta(days=364)).isoformat()
+        results = {}
+        for group_by in ('employee', 'department'):
+            results[f'year report by {group_by}, raw rows'] = time_calls(
+                lambda: raw_attendance_summary(conn, year_ago, today, group_by), args.iterations)
+            results[f'year report by {group_by}, summary'] = time_calls(
+                lambda: attendance_summary(conn, year_ago, today, group_by=group_by), args.iterations)
+        results['dashboard 30-day trend'] = time_calls(
+            lambda: conn.execute(app.DASHBOARD_TREND_QUERY, (today, '-29 days', today)).fetchall(), args.iterations)
+
+        # Writes to a day nobody has attendance on, so every pair starts a fresh summary row
+        write_day = (date.today() + timedelta(days=1)).isoformat()
+        employee_ids = iter(range(1, args.employees + 1))
+        results['IN + OUT write pair, with triggers'] = time_calls(
+            lambda: write_pair(conn, next(employee_ids), write_day), min(args.employees // 2, 500))
+        for name in ('trg_daily_summary_insert', 'trg_daily_summary_update', 'trg_daily_summary_delete'):
+            conn.execute(f"DROP TRIGGER {name}")
+        results['IN + OUT write pair, no triggers'] = time_calls(
+            lambda: write_pair(conn, next(employee_ids), write_day), min(args.employees // 2, 500))
+        for statement in daily_summary_triggers(attendance_storage(conn)):
+            conn.execute(statement)
+    finally:
+        pool.release(conn)
+
+    for name, result in results.items():
+        print(f"{name:40} p50 {result['p50_ms']:>9} ms   p95 {result['p95_ms']:>9} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Synthetic attendance databases for benchmarks.
+
+    python -m benchmarks.data --employees 10000 --days 365 --punches 2 --locations Onsite=0.6,Remote=0.4
+"""
+import argparse
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+
+from benchmarks import DATA_DIR, use_database
+
+DEPARTMENTS = ['Engineering', 'Sales', 'Support', 'Finance', 'Operations', 'HR']
+
+# Share of days worked at each location (the kiosk offers Onsite and Remote)
+DEFAULT_LOCATIONS = {'Onsite': 0.7, 'Remote': 0.3}
+
+
+def database_path(employees, days, punches_per_day=1, name='bench', locations=None, presence_ratio=0.9):
+    # Databases are reused by file name, so a non-default mix gets a file of its own
+    mix = ''
+    if locations and locations != DEFAULT_LOCATIONS:
+        mix = ''.join(f'-{location.lower()}{round(weight * 100)}' for location, weight in locations.items())
+    if presence_ratio != 0.9:
+        mix += f'-present{round(presence_ratio * 100)}'
+    return os.path.join(DATA_DIR, f'{name}-{employees}e-{days}d-{punches_per_day}p{mix}.db')
+
+
+def parse_locations(value):
+    """'Onsite=0.6,Remote=0.4' -> {'Onsite': 0.6, 'Remote': 0.4}, normalised to sum to 1."""
+    locations = {}
+    for item in value.split(','):
+        location, _, weight = item.partition('=')
+        locations[location.strip()] = float(weight or 1)
+    total = sum(locations.values())
+    if not locations or total <= 0:
+        raise ValueError("Give at least one location with a positive weight")
+    return {location: weight / total for location, weight in locations.items()}
+
+
+def create_synthetic_database(path, employees=1000, days=30, punches_per_day=1,
+                              locations=None, presence_ratio=0.9, seed=0):
+    """Create (or reuse) a database at ``path`` in the app's schema.
+
+    Each employee is present on ``presence_ratio`` of the last ``days`` days
+    (today included) with ``punches_per_day`` IN/OUT sessions per day, at a
+    location drawn from the ``locations`` weights (DEFAULT_LOCATIONS if not
+    given). Today's last session is left open for about half the employees
+    so the IN/OUT counters have something to count. The same arguments and
+    ``seed`` always produce the same rows. Returns the number of attendance
+    rows.
+    """
+    if os.path.exists(path):
+        with sqlite3.connect(path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+
+    # Build the schema through the app itself so it always matches init_db()
+    use_database(path)
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    # Bulk load: durability doesn't matter for a throwaway benchmark file
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -200000")
+
+    conn.executemany(
+        "INSERT INTO employees (employee_id_text, name, department, job_title) VALUES (?, ?, ?, ?)",
+        ((f'EMP{n:06d}', f'Employee {n:06d}', rng.choice(DEPARTMENTS), 'Staff')
+         for n in range(1, employees + 1)))
+
+    # Cumulative weights, so a single draw picks the location
+    cumulative, thresholds = 0.0, []
+    for location, weight in (locations or DEFAULT_LOCATIONS).items():
+        cumulative += weight
+        thresholds.append((cumulative, location))
+
+    today = date.today()
+    session_minutes = max(30, (10 * 60) // punches_per_day)
+
+    def rows():
+        for day_offset in range(days - 1, -1, -1):
+            day = (today - timedelta(days=day_offset)).isoformat()
+            for employee_id in range(1, employees + 1):
+                if rng.random() > presence_ratio:
+                    continue
+                draw = rng.random() * cumulative
+                location = next((location for threshold, location in thresholds if draw < threshold),
+                                thresholds[-1][1])
+                start = 7 * 60 + rng.randrange(180)
+                for punch in range(punches_per_day):
+                    time_in = start + punch * session_minutes
+                    time_out = time_in + session_minutes - rng.randrange(1, 20)
+                    open_session = (day_offset == 0 and punch == punches_per_day - 1
+                                    and employee_id % 2 == 0)
+                    yield (employee_id, day, f'{time_in // 60:02d}:{time_in % 60:02d}:{rng.randrange(60):02d}',
+                           None if open_session else f'{time_out // 60:02d}:{time_out % 60:02d}:{rng.randrange(60):02d}',
+                           location)
+
+    conn.executemany(
+        "INSERT INTO attendance (employee_id, date, time_in, time_out, location) VALUES (?, ?, ?, ?, ?)",
+        rows())
+    conn.commit()
+    conn.execute("ANALYZE")
+    # Leave everything in the main file, so benchmarks can copy just that
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    total = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+    conn.close()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--employees', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--punches', type=int, default=1, help='IN/OUT sessions per employee per day.')
+    parser.add_argument('--locations', type=parse_locations, default=DEFAULT_LOCATIONS,
+                        help='Location weights, e.g. Onsite=0.6,Remote=0.4.')
+    parser.add_argument('--presence', type=float, default=0.9, help='Share of days each employee is present.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--path', help='Where to write the database (default: under benchmarks/data/).')
+    args = parser.parse_args()
+
+    path = args.path or database_path(args.employees, args.days, args.punches, locations=args.locations,
+                                      presence_ratio=args.presence)
+    rows = create_synthetic_database(path, employees=args.employees, days=args.days, punches_per_day=args.punches,
+                                     locations=args.locations, presence_ratio=args.presence, seed=args.seed)
+    print(f"{path}: {args.employees} employees, {rows} attendance rows, {os.path.getsize(path) / 2**20:.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,765 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+
+# Pragmas applied to every pooled connection.
+# WAL lets dashboard readers keep reading while mark_in/mark_out are writing,
+# busy_timeout makes writers wait for the lock instead of failing with
+# "database is locked", and the cache/mmap sizes keep hot pages in memory.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',   # Safe with WAL; fsync only on checkpoint
+    'busy_timeout': 5000,      # Milliseconds
+    'cache_size': -20000,      # Negative value = KiB, so ~20 MB per connection
+    'mmap_size': 268435456,    # 256 MB
+    'temp_store': 'MEMORY',
+}
+
+_PRAGMA_SETTING = re.compile(r"^\s*([A-Za-z_]+)\s*=\s*(-?\w+)\s*$")
+
+
+def parse_pragmas(text):
+    """'cache_size=-64000, mmap_size=0' -> DEFAULT_PRAGMAS with those two replaced."""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    for item in filter(str.strip, text.split(',')):
+        match = _PRAGMA_SETTING.match(item)
+        if not match:
+            raise ValueError(f"Expected name=value, got {item.strip()!r}")
+        value = match.group(2)
+        pragmas[match.group(1).lower()] = int(value) if value.lstrip('-').isdigit() else value
+    return pragmas
+
+
+# Number of compiled statements each connection keeps around.
+# Pooled connections live for the life of the worker, so the same SQL text
+# issued by every request is only prepared once per connection.
+STATEMENT_CACHE_SIZE = 256
+
+
+class PooledConnection(sqlite3.Connection):
+    # A plain subclass so per-connection state (see current_attendance_storage) can be attached
+    pass
+
+
+class ConnectionPool:
+    """A small thread-safe pool of SQLite connections.
+
+    Connections are created lazily up to ``max_size``. Once that many are
+    checked out, callers wait (up to ``timeout`` seconds) for one to be
+    released. Hit/miss/wait counters are kept so they can be reported.
+    """
+
+    def __init__(self, db_path, max_size=8, timeout=30.0, pragmas=None, factory=PooledConnection):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.factory = factory
+
+        self._idle = deque()
+        self._created = 0
+        self._pid = os.getpid()
+        self._cond = threading.Condition()
+
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.pragmas.get('busy_timeout', 5000) / 1000.0,
+            check_same_thread=False,  # Connections move between request threads
+            cached_statements=STATEMENT_CACHE_SIZE,
+            factory=self.factory,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _check_fork(self):
+        # Connections must never be shared across processes (e.g. gunicorn
+        # forking after the app was imported), so start afresh in a child.
+        if self._pid != os.getpid():
+            self._idle.clear()
+            self._created = 0
+            self._pid = os.getpid()
+
+    def acquire(self):
+        with self._cond:
+            self._check_fork()
+            if self._idle:
+                self._hits += 1
+                return self._idle.pop()
+            if self._created < self.max_size:
+                self._misses += 1
+                self._created += 1
+            else:
+                # Pool exhausted: wait for another request to release one
+                self._waits += 1
+                started = time.perf_counter()
+                deadline = started + self.timeout
+                while not self._idle:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise sqlite3.OperationalError(
+                            f"Timed out after {self.timeout}s waiting for a database connection")
+                    self._cond.wait(remaining)
+                waited = time.perf_counter() - started
+                self._wait_time += waited
+                self._max_wait_time = max(self._max_wait_time, waited)
+                self._hits += 1
+                return self._idle.pop()
+
+        # Open the new connection outside the lock so other threads aren't held up
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn):
+        # Never hand a connection with a half-finished transaction to the next request
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                conn = self._idle.pop()
+                self._created -= 1
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+
+    def stats(self):
+        with self._cond:
+            requests = self._hits + self._misses
+            return {
+                'max_size': self.max_size,
+                'open_connections': self._created,
+                'idle_connections': len(self._idle),
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / requests, 4) if requests else 0.0,
+                'waits': self._waits,
+                'total_wait_ms': round(self._wait_time * 1000, 3),
+                'avg_wait_ms': round(self._wait_time * 1000 / self._waits, 3) if self._waits else 0.0,
+                'max_wait_ms': round(self._max_wait_time * 1000, 3),
+            }
+
+
+# Indexes and triggers that live on the attendance table. They are created by
+# the migrations below and re-created by migrate_to_integer_timestamps() when it
+# swaps in the rebuilt table, so anything new on attendance belongs here too.
+# ATTENDANCE_INDEXES are for the 'text' storage format (see ATTENDANCE_TABLES).
+ATTENDANCE_INDEXES = [
+    # get_attendance_status, mark_in, mark_out, index: open/closed row for
+    # one employee today. time_in is included so mark_out's ORDER BY
+    # time_in is answered from the index alone.
+    """CREATE INDEX IF NOT EXISTS idx_attendance_employee_date_out
+       ON attendance (employee_id, date, time_out, time_in)""",
+    # dashboard: today's IN/OUT counts and Onsite/Remote split
+    """CREATE INDEX IF NOT EXISTS idx_attendance_date_location
+       ON attendance (date, location, time_out, employee_id)""",
+    # records, export_csv, dashboard recent activity:
+    # ORDER BY date DESC, time_in DESC walks this index backwards
+    """CREATE INDEX IF NOT EXISTS idx_attendance_date_time_in
+       ON attendance (date, time_in)""",
+]
+
+# The 'integer' format indexes the stored timestamps instead: indexing its virtual
+# date/time columns would store their TEXT values all over again. The date filters
+# and orderings in ATTENDANCE_READ_SQL are ranges on these.
+INTEGER_ATTENDANCE_INDEXES = [
+    # get_attendance_status, write-behind flushes: one employee's rows on one day
+    """CREATE INDEX IF NOT EXISTS idx_attendance_employee_ts_in
+       ON attendance (employee_id, ts_in)""",
+    # presence, dashboard, records, export_csv: a day or date range, in time order
+    """CREATE INDEX IF NOT EXISTS idx_attendance_ts_in
+       ON attendance (ts_in)""",
+]
+
+ATTENDANCE_COUNT_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS trg_attendance_count_insert AFTER INSERT ON attendance
+       BEGIN UPDATE table_row_counts SET row_count = row_count + 1 WHERE table_name = 'attendance'; END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_attendance_count_delete AFTER DELETE ON attendance
+       BEGIN UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'attendance'; END""",
+]
+
+
+def attendance_version_triggers(storage):
+    # UPDATE OF has to name stored columns, which differ between storage formats
+    updated_columns = 'time_out, date, employee_id' if storage == 'text' else 'ts_out, ts_in, employee_id'
+    return [
+        """CREATE TRIGGER IF NOT EXISTS trg_attendance_version_insert AFTER INSERT ON attendance
+           BEGIN UPDATE attendance_version SET version = version + 1 WHERE id = 1; END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_attendance_version_update AFTER UPDATE OF {updated_columns} ON attendance
+           BEGIN UPDATE attendance_version SET version = version + 1 WHERE id = 1; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_attendance_version_delete AFTER DELETE ON attendance
+           BEGIN UPDATE attendance_version SET version = version + 1 WHERE id = 1; END""",
+    ]
+
+
+# Per (date, employee) rollup of attendance for reports and trend charts: about
+# one row per employee per working day however many punches there were.
+DAILY_SUMMARY_TABLE = """
+    CREATE TABLE IF NOT EXISTS daily_attendance_summary (
+        date TEXT NOT NULL,
+        employee_id INTEGER NOT NULL,
+        sessions INTEGER NOT NULL,
+        open_sessions INTEGER NOT NULL,   -- Not marked out yet
+        first_in TEXT NOT NULL,
+        last_out TEXT,                    -- Latest time_out, NULL until a session is closed
+        worked_seconds INTEGER NOT NULL,  -- Closed sessions only
+        onsite_sessions INTEGER NOT NULL,
+        remote_sessions INTEGER NOT NULL,
+        PRIMARY KEY (date, employee_id)
+    ) WITHOUT ROWID
+"""
+
+DAILY_SUMMARY_COLUMNS = ("employee_id, date, sessions, open_sessions, first_in, last_out, "
+                         "worked_seconds, onsite_sessions, remote_sessions")
+
+
+def daily_summary_select(storage, table='attendance', where='1'):
+    # Summary rows (in DAILY_SUMMARY_COLUMNS order) for the attendance rows matching ``where``
+    return f"""
+        SELECT a.employee_id, a.date, COUNT(*), SUM(a.time_out IS NULL), MIN(a.time_in), MAX(a.time_out),
+               COALESCE(SUM({SESSION_SECONDS_SQL[storage]}), 0),
+               SUM(a.location = 'Onsite'), SUM(a.location = 'Remote')
+        FROM {table} a
+        WHERE {where}
+        GROUP BY a.employee_id, a.date"""
+
+
+def daily_summary_triggers(storage):
+    # Each write recomputes just the summary row of the (employee, date) it touched,
+    # from that day's few attendance rows, in the writer's own transaction. A plain
+    # DELETE + INSERT rather than INSERT OR REPLACE: an outer INSERT OR IGNORE would
+    # turn the REPLACE into an IGNORE. In the 'integer' format that day's rows are
+    # found by a ts_in range, the only thing INTEGER_ATTENDANCE_INDEXES can seek on.
+    def refresh(row, condition=''):
+        key = f"employee_id = {row}.employee_id AND date = {row}.date"
+        if storage == 'text':
+            rows = f"a.{key}"
+        else:
+            day = f"({row}.ts_in - {row}.ts_in % 86400)"
+            rows = f"a.employee_id = {row}.employee_id AND a.ts_in >= {day} AND a.ts_in < {day} + 86400"
+        return (f"DELETE FROM daily_attendance_summary WHERE {key}{condition}; "
+                f"INSERT INTO daily_attendance_summary ({DAILY_SUMMARY_COLUMNS}) "
+                f"{daily_summary_select(storage, where=f'{rows}{condition}')};")
+    updated_columns = 'time_out, date, employee_id' if storage == 'text' else 'ts_out, ts_in, employee_id'
+    moved = " AND (OLD.employee_id, OLD.date) IS NOT (NEW.employee_id, NEW.date)"
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_daily_summary_insert AFTER INSERT ON attendance
+            BEGIN {refresh('NEW')} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_daily_summary_update AFTER UPDATE OF {updated_columns} ON attendance
+            BEGIN {refresh('NEW')} {refresh('OLD', moved)} END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_daily_summary_delete AFTER DELETE ON attendance
+            BEGIN {refresh('OLD')} END""",
+    ]
+
+
+def create_daily_summary_triggers(conn):
+    for statement in daily_summary_triggers(attendance_storage(conn)):
+        conn.execute(statement)
+
+
+def rebuild_daily_summary(conn, start_date=None, end_date=None, schemas=('main',)):
+    """Recompute daily_attendance_summary from scratch between two dates (inclusive).
+
+    Either date may be None for no bound. Rows are aggregated from the
+    attendance table of every schema in ``schemas`` (e.g. an attached
+    archive and the hot table) and merged. Run it inside a write transaction.
+    """
+    bounds = [(operator, value) for operator, value in (('>=', start_date), ('<=', end_date)) if value]
+    params = [value for _, value in bounds]
+
+    summary_where = ' AND '.join(f"date {operator} ?" for operator, _ in bounds) or '1'
+
+    conn.execute(f"DELETE FROM daily_attendance_summary WHERE {summary_where}", params)
+    for schema in schemas:
+        storage = attendance_storage(conn, schema=schema)
+        read_sql = ATTENDANCE_READ_SQL[storage]
+        where = ' AND '.join(read_sql['from_date' if operator == '>=' else 'through_date']
+                             for operator, _ in bounds) or '1'
+        conn.execute(f"""
+            INSERT INTO daily_attendance_summary ({DAILY_SUMMARY_COLUMNS})
+            {daily_summary_select(storage, f'{schema}.attendance', where)}
+            ON CONFLICT (date, employee_id) DO UPDATE SET
+                sessions = sessions + excluded.sessions,
+                open_sessions = open_sessions + excluded.open_sessions,
+                first_in = MIN(first_in, excluded.first_in),
+                last_out = COALESCE(MAX(last_out, excluded.last_out), last_out, excluded.last_out),
+                worked_seconds = worked_seconds + excluded.worked_seconds,
+                onsite_sessions = onsite_sessions + excluded.onsite_sessions,
+                remote_sessions = remote_sessions + excluded.remote_sessions
+        """, params)
+
+
+# Full-text index over the employee directory for typeahead search (see
+# directory.search_employees). External content: the text lives only in
+# employees, and these triggers keep the index in step with every write to it,
+# whether from add_employee, the CSV import or anything else. prefix='1 2 3'
+# indexes the first one to three characters of every term, so the short
+# prefixes typed first don't have to scan the term list.
+EMPLOYEE_SEARCH_COLUMNS = "name, employee_id_text, department, job_title"
+
+EMPLOYEE_SEARCH_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS employees_fts USING fts5(
+        {EMPLOYEE_SEARCH_COLUMNS},
+        content='employees', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )
+"""
+
+EMPLOYEE_SEARCH_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_employees_fts_insert AFTER INSERT ON employees BEGIN
+            INSERT INTO employees_fts (rowid, {EMPLOYEE_SEARCH_COLUMNS})
+            VALUES (new.id, new.name, new.employee_id_text, new.department, new.job_title);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_employees_fts_delete AFTER DELETE ON employees BEGIN
+            INSERT INTO employees_fts (employees_fts, rowid, {EMPLOYEE_SEARCH_COLUMNS})
+            VALUES ('delete', old.id, old.name, old.employee_id_text, old.department, old.job_title);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_employees_fts_update
+            AFTER UPDATE OF {EMPLOYEE_SEARCH_COLUMNS} ON employees BEGIN
+            INSERT INTO employees_fts (employees_fts, rowid, {EMPLOYEE_SEARCH_COLUMNS})
+            VALUES ('delete', old.id, old.name, old.employee_id_text, old.department, old.job_title);
+            INSERT INTO employees_fts (rowid, {EMPLOYEE_SEARCH_COLUMNS})
+            VALUES (new.id, new.name, new.employee_id_text, new.department, new.job_title);
+        END""",
+]
+
+
+def attendance_indexes(storage):
+    return ATTENDANCE_INDEXES if storage == 'text' else INTEGER_ATTENDANCE_INDEXES
+
+
+def reindex_attendance(conn):
+    # Tables converted by an older migrate_to_integer_timestamps() still carry
+    # the 'text' indexes, built over the virtual columns, and summary triggers
+    # that look a day's rows up by the virtual date
+    storage = attendance_storage(conn)
+    if storage == 'text':
+        return
+    for name in ('idx_attendance_employee_date_out', 'idx_attendance_date_location', 'idx_attendance_date_time_in'):
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    for trigger in ('insert', 'update', 'delete'):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_daily_summary_{trigger}")
+    for statement in INTEGER_ATTENDANCE_INDEXES + daily_summary_triggers(storage):
+        conn.execute(statement)
+
+
+def attendance_table_objects(storage):
+    return (attendance_indexes(storage) + ATTENDANCE_COUNT_TRIGGERS + attendance_version_triggers(storage)
+            + daily_summary_triggers(storage))
+
+
+# Versioned schema migrations, applied in order on top of the base tables that
+# init_db() creates. The last applied version is kept in PRAGMA user_version,
+# so each migration runs exactly once per database file.
+# Each entry is (version, description, steps); a step is either an SQL string
+# or a callable taking the connection.
+MIGRATIONS = [
+    (1, "Store open attendance rows with time_out NULL only", [
+        # Older rows could use '' for "not marked out yet". Queries can only use
+        # the time_out column of an index when there is a single representation.
+        "UPDATE attendance SET time_out = NULL WHERE time_out = ''",
+    ]),
+    (2, "Index attendance for status, dashboard and ordering queries", [
+        *ATTENDANCE_INDEXES,
+    ]),
+    (3, "Keep trigger-maintained row counts for employees and attendance", [
+        # COUNT(*) over years of attendance has to read a whole index; the
+        # dashboard reads these counters instead.
+        """CREATE TABLE IF NOT EXISTS table_row_counts (
+               table_name TEXT PRIMARY KEY,
+               row_count INTEGER NOT NULL
+           )""",
+        """INSERT OR REPLACE INTO table_row_counts (table_name, row_count)
+           SELECT 'employees', COUNT(*) FROM employees
+           UNION ALL
+           SELECT 'attendance', COUNT(*) FROM attendance""",
+        """CREATE TRIGGER IF NOT EXISTS trg_employees_count_insert AFTER INSERT ON employees
+           BEGIN UPDATE table_row_counts SET row_count = row_count + 1 WHERE table_name = 'employees'; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_employees_count_delete AFTER DELETE ON employees
+           BEGIN UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'employees'; END""",
+        *ATTENDANCE_COUNT_TRIGGERS,
+    ]),
+    (4, "Version counter for cross-process presence index consistency", [
+        # Bumped in the same transaction as every attendance write, so each
+        # worker's in-memory presence index can tell with one primary-key
+        # lookup whether another process has changed attendance since.
+        """CREATE TABLE IF NOT EXISTS attendance_version (
+               id INTEGER PRIMARY KEY CHECK (id = 1),
+               version INTEGER NOT NULL
+           )""",
+        "INSERT OR IGNORE INTO attendance_version (id, version) VALUES (1, 0)",
+        *attendance_version_triggers('text'),
+    ]),
+    (5, "Track the last write-behind journal event applied to attendance", [
+        # Updated in the same transaction as each group commit, so replaying a
+        # journal after a crash skips events that already reached the table.
+        """CREATE TABLE IF NOT EXISTS writebehind_journal (
+               journal TEXT PRIMARY KEY,
+               last_seq INTEGER NOT NULL
+           )""",
+    ]),
+    (6, "Version counter for the cached employee directory", [
+        # Lets each worker's directory cache (directory.EmployeeDirectory) notice
+        # employees added or changed by another process with one lookup.
+        """CREATE TABLE IF NOT EXISTS employees_version (
+               id INTEGER PRIMARY KEY CHECK (id = 1),
+               version INTEGER NOT NULL
+           )""",
+        "INSERT OR IGNORE INTO employees_version (id, version) VALUES (1, 0)",
+        """CREATE TRIGGER IF NOT EXISTS trg_employees_version_insert AFTER INSERT ON employees
+           BEGIN UPDATE employees_version SET version = version + 1 WHERE id = 1; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_employees_version_update AFTER UPDATE ON employees
+           BEGIN UPDATE employees_version SET version = version + 1 WHERE id = 1; END""",
+        """CREATE TRIGGER IF NOT EXISTS trg_employees_version_delete AFTER DELETE ON employees
+           BEGIN UPDATE employees_version SET version = version + 1 WHERE id = 1; END""",
+    ]),
+    (7, "Registry of archived attendance partitions", [
+        # One row per archive file written by archive.AttendanceArchive.compact().
+        # Attendance still in the main table is always dated after MAX(end_date).
+        """CREATE TABLE IF NOT EXISTS attendance_partitions (
+               name TEXT PRIMARY KEY,   -- '2024-01' (monthly) or '2024' (yearly)
+               file TEXT NOT NULL,      -- File name inside the archive directory
+               start_date TEXT NOT NULL,
+               end_date TEXT NOT NULL,
+               row_count INTEGER NOT NULL,
+               archived_at TEXT NOT NULL
+           )""",
+    ]),
+    (8, "Daily attendance summary maintained by triggers", [
+        DAILY_SUMMARY_TABLE,
+        # employee_report's monthly totals; date-range reports use the primary key
+        """CREATE INDEX IF NOT EXISTS idx_daily_summary_employee_date
+           ON daily_attendance_summary (employee_id, date)""",
+        create_daily_summary_triggers,
+        # Hot table only: init_db() adds archived partitions afterwards
+        rebuild_daily_summary,
+    ]),
+    (9, "Full-text search index over employees", [
+        EMPLOYEE_SEARCH_TABLE,
+        *EMPLOYEE_SEARCH_TRIGGERS,
+        "INSERT INTO employees_fts (employees_fts) VALUES ('rebuild')",
+    ]),
+    (10, "Index integer-timestamp attendance on ts_in", [
+        reindex_attendance,
+    ]),
+]
+
+
+# The version a fully migrated database is at
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Apply every migration newer than the database's user_version.
+
+    Each migration runs in its own IMMEDIATE transaction, and the version is
+    re-read once the write lock is held so that several workers starting at
+    the same time don't apply the same migration twice.
+    Returns the list of versions that were applied.
+    """
+    applied = []
+    for version, description, steps in migrations:
+        if version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if version <= schema_version(conn):
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+
+    if applied:
+        # Refresh the planner statistics so the new indexes are picked up
+        conn.execute("PRAGMA optimize")
+    return applied
+
+
+# --- Attendance storage formats ---
+#
+# 'text':    date, time_in and time_out are stored as 'YYYY-MM-DD' / 'HH:MM:SS' TEXT.
+# 'integer': ts_in and ts_out are stored as INTEGER seconds since 1970-01-01 in
+#            local wall-clock time (no timezone conversion), and date, time_in and
+#            time_out are VIRTUAL generated columns derived from them. Reads keep
+#            using the same column names, but filter and order on ts_in through
+#            ATTENDANCE_READ_SQL, and writes go through ATTENDANCE_WRITE_SQL.
+#            The app only records sessions that close on the day they opened;
+#            a ts_out on a later day only comes from converting a 'text' row
+#            whose time_out is earlier than its time_in.
+TEXT_ATTENDANCE_TABLE = """
+    CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        time_in TEXT NOT NULL,
+        time_out TEXT,
+        location TEXT,
+        FOREIGN KEY (employee_id) REFERENCES employees(id)
+    )
+"""
+
+INTEGER_ATTENDANCE_TABLE = """
+    CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        ts_in INTEGER NOT NULL,
+        ts_out INTEGER,
+        location TEXT,
+        date TEXT GENERATED ALWAYS AS (date(ts_in, 'unixepoch')) VIRTUAL,
+        time_in TEXT GENERATED ALWAYS AS (time(ts_in, 'unixepoch')) VIRTUAL,
+        time_out TEXT GENERATED ALWAYS AS (time(ts_out, 'unixepoch')) VIRTUAL,
+        FOREIGN KEY (employee_id) REFERENCES employees(id)
+    )
+"""
+
+
+ATTENDANCE_TABLES = {'text': TEXT_ATTENDANCE_TABLE, 'integer': INTEGER_ATTENDANCE_TABLE}
+
+
+def ts_in_sql(date, time_in):
+    return f"CAST(strftime('%s', {date} || ' ' || {time_in}) AS INTEGER)"
+
+
+def ts_out_sql(date, time_in, time_out):
+    # A time_out earlier than time_in is read as a shift that ran past midnight,
+    # as SESSION_SECONDS_SQL['text'] does
+    return (f"CASE WHEN {time_out} IS NULL THEN NULL "
+            f"ELSE CAST(strftime('%s', {date} || ' ' || {time_out}) AS INTEGER) "
+            f"+ CASE WHEN {time_out} < {time_in} THEN 86400 ELSE 0 END END")
+
+
+# Statements the app uses to write attendance, with the same parameters in both
+# formats: insert (employee_id, date, time_in, time_out, location) and
+# close (time_out, attendance id).
+ATTENDANCE_WRITE_SQL = {
+    'text': {
+        'insert': "INSERT INTO attendance (employee_id, date, time_in, time_out, location) VALUES (?1, ?2, ?3, ?4, ?5)",
+        'close': "UPDATE attendance SET time_out = ?1 WHERE id = ?2 AND time_out IS NULL",
+    },
+    'integer': {
+        'insert': ("INSERT INTO attendance (employee_id, ts_in, ts_out, location) VALUES "
+                   f"(?1, {ts_in_sql('?2', '?3')}, {ts_out_sql('?2', '?3', '?4')}, ?5)"),
+        'close': f"UPDATE attendance SET ts_out = {ts_out_sql('date', 'time_in', '?1')} WHERE id = ?2 AND ts_out IS NULL",
+    },
+}
+
+
+# Date filters and orderings on attendance alias ``a``, with the same parameters
+# in both formats: on_date takes :date (named, so that it can be used twice),
+# from_date and through_date a positional 'YYYY-MM-DD' each, and before the
+# (date, time_in, id) of a records cursor. The 'integer' ones compare ts_in with
+# the epoch of the day's bounds, so they are ranges on INTEGER_ATTENDANCE_INDEXES
+# rather than a per-row computation of the virtual date.
+ATTENDANCE_READ_SQL = {
+    'text': {
+        'on_date': "a.date = :date",
+        'from_date': "a.date >= ?",
+        'through_date': "a.date <= ?",
+        'before': "(a.date, a.time_in, a.id) < (?, ?, ?)",
+        'oldest_first': "a.date, a.time_in, a.id",
+        'newest_first': "a.date DESC, a.time_in DESC, a.id DESC",
+    },
+    'integer': {
+        'on_date': ("a.ts_in >= CAST(strftime('%s', :date) AS INTEGER) "
+                    "AND a.ts_in < CAST(strftime('%s', :date, '+1 day') AS INTEGER)"),
+        'from_date': "a.ts_in >= CAST(strftime('%s', ?) AS INTEGER)",
+        'through_date': "a.ts_in < CAST(strftime('%s', ?, '+1 day') AS INTEGER)",
+        'before': f"(a.ts_in, a.id) < ({ts_in_sql('?', '?')}, ?)",
+        'oldest_first': "a.ts_in, a.id",
+        'newest_first': "a.ts_in DESC, a.id DESC",
+    },
+}
+
+
+# Seconds worked per session, per storage format. For TEXT columns SQLite parses
+# the 'HH:MM:SS' strings; a time_out earlier than time_in is a shift that ran past
+# midnight, hence the +86400 % 86400. Integer timestamps already account for that.
+# NULL while the session is still open.
+SESSION_SECONDS_SQL = {
+    'text': "((strftime('%s', a.time_out) - strftime('%s', a.time_in) + 86400) % 86400)",
+    'integer': "(a.ts_out - a.ts_in)",
+}
+
+
+def attendance_storage(conn, table='attendance', schema='main'):
+    columns = {row[1] for row in conn.execute(f"PRAGMA {schema}.table_xinfo({table})")}
+    return 'integer' if 'ts_in' in columns else 'text'
+
+
+def current_attendance_storage(conn):
+    """attendance_storage() of the main attendance table, cached on the connection.
+
+    The answer is re-checked whenever SQLite's schema cookie changes, so a
+    worker picks up migrate_to_integer_timestamps() swapping the table
+    underneath it. Call it inside the transaction that uses the answer.
+    """
+    schema = conn.execute("PRAGMA schema_version").fetchone()[0]
+    cached = getattr(conn, 'attendance_storage', None)
+    if cached is None or cached[0] != schema:
+        cached = (schema, attendance_storage(conn))
+        if isinstance(conn, PooledConnection):
+            conn.attendance_storage = cached
+    return cached[1]
+
+
+def attendance_write_sql(conn):
+    """The ATTENDANCE_WRITE_SQL statements matching the attendance table's storage format."""
+    return ATTENDANCE_WRITE_SQL[current_attendance_storage(conn)]
+
+
+def migrate_to_integer_timestamps(conn, batch_size=20000, progress=None):
+    """Rebuild attendance in the 'integer' storage format while the app keeps running.
+
+    Rows are copied into attendance_int in id order, ``batch_size`` per short
+    transaction, and each batch is compared column by column with its source
+    before it commits. Triggers mirror writes made to already-copied rows in
+    the meantime. A final short transaction drops the old table, renames the
+    new one into place and recreates the indexes and triggers.
+    Raises ValueError, before changing anything, if some row's date/time
+    text can't be converted exactly. Returns the number of rows copied.
+    """
+    if attendance_storage(conn) == 'integer':
+        return 0
+    if sqlite3.sqlite_version_info < (3, 31, 0):
+        raise RuntimeError(f"Generated columns need SQLite 3.31 or newer (have {sqlite3.sqlite_version})")
+
+    ts_in = ts_in_sql('date', 'time_in')
+    ts_out = ts_out_sql('date', 'time_in', 'time_out')
+    bad_rows = conn.execute(f"""
+        SELECT COUNT(*) FROM attendance
+        WHERE {ts_in} IS NULL OR (time_out IS NOT NULL AND {ts_out} IS NULL)
+    """).fetchone()[0]
+    if bad_rows:
+        raise ValueError(f"{bad_rows} attendance rows have dates or times that are not "
+                         "'YYYY-MM-DD' / 'HH:MM:SS'; fix them before migrating")
+
+    new_ts_in = ts_in_sql('NEW.date', 'NEW.time_in')
+    new_ts_out = ts_out_sql('NEW.date', 'NEW.time_in', 'NEW.time_out')
+    mirror = f"""INSERT OR REPLACE INTO attendance_int (id, employee_id, ts_in, ts_out, location)
+                 VALUES (NEW.id, NEW.employee_id, {new_ts_in}, {new_ts_out}, NEW.location);"""
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Start over if an earlier run was interrupted
+        for trigger in ('insert', 'update', 'delete'):
+            conn.execute(f"DROP TRIGGER IF EXISTS trg_attendance_mirror_{trigger}")
+        conn.execute("DROP TABLE IF EXISTS attendance_int")
+        conn.execute(INTEGER_ATTENDANCE_TABLE.format(name='attendance_int'))
+        conn.execute(f"CREATE TRIGGER trg_attendance_mirror_insert AFTER INSERT ON attendance BEGIN {mirror} END")
+        conn.execute(f"CREATE TRIGGER trg_attendance_mirror_update AFTER UPDATE ON attendance BEGIN {mirror} END")
+        conn.execute("""CREATE TRIGGER trg_attendance_mirror_delete AFTER DELETE ON attendance
+                        BEGIN DELETE FROM attendance_int WHERE id = OLD.id; END""")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    copied = 0
+    last_id = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            upper_id = conn.execute(
+                "SELECT MAX(id) FROM (SELECT id FROM attendance WHERE id > ? ORDER BY id LIMIT ?)",
+                (last_id, batch_size)).fetchone()[0]
+            if upper_id is None:
+                conn.rollback()
+                break
+            # OR IGNORE: a row the mirror triggers already copied is at least as new
+            cursor = conn.execute(f"""
+                INSERT OR IGNORE INTO attendance_int (id, employee_id, ts_in, ts_out, location)
+                SELECT id, employee_id, {ts_in}, {ts_out}, location
+                FROM attendance WHERE id > ? AND id <= ?
+            """, (last_id, upper_id))
+            mismatched = conn.execute("""
+                SELECT COUNT(*) FROM attendance a LEFT JOIN attendance_int b ON b.id = a.id
+                WHERE a.id > ? AND a.id <= ?
+                  AND (b.id IS NULL OR a.employee_id IS NOT b.employee_id OR a.date IS NOT b.date
+                       OR a.time_in IS NOT b.time_in OR a.time_out IS NOT b.time_out
+                       OR a.location IS NOT b.location)
+            """, (last_id, upper_id)).fetchone()[0]
+            if mismatched:
+                raise ValueError(f"{mismatched} rows between ids {last_id} and {upper_id} "
+                                 "did not convert losslessly")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        copied += cursor.rowcount
+        last_id = upper_id
+        if progress:
+            progress(copied)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        old_count = conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+        new_count = conn.execute("SELECT COUNT(*) FROM attendance_int").fetchone()[0]
+        if old_count != new_count:
+            raise ValueError(f"Row counts differ after copying ({old_count} vs {new_count})")
+        # Keep AUTOINCREMENT from handing out ids of rows deleted before the copy
+        old_sequence = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'attendance'").fetchone()
+        conn.execute("DROP TABLE attendance")  # Its triggers, mirrors included, go with it
+        conn.execute("ALTER TABLE attendance_int RENAME TO attendance")
+        if old_sequence:
+            conn.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'attendance'",
+                         (old_sequence[0],))
+        for statement in attendance_table_objects('integer'):
+            conn.execute(statement)
+        # Every worker's presence index reloads on its next check
+        conn.execute("UPDATE attendance_version SET version = version + 1 WHERE id = 1")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    conn.execute("PRAGMA optimize")
+    return copied
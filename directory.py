@@ -0,0 +1,120 @@
+import hashlib
+import re
+import threading
+import time
+
+DIRECTORY_QUERY = "SELECT id, employee_id_text, name, department, job_title FROM employees ORDER BY name ASC"
+
+# Matches ranked by search_employees(). A short prefix can match most of the
+# directory, so only this many matches (in rowid order, which FTS5 can stop
+# early on) are scored; typing another character narrows them down.
+SEARCH_CANDIDATES = 1000
+
+# bm25() column weights, in db.EMPLOYEE_SEARCH_COLUMNS order: name, employee_id_text, department, job_title
+SEARCH_WEIGHTS = (10.0, 5.0, 1.0, 1.0)
+
+SEARCH_QUERY = f"""
+    WITH matches AS (
+        SELECT rowid, bm25(employees_fts, {', '.join(map(str, SEARCH_WEIGHTS))}) AS score
+        FROM employees_fts WHERE employees_fts MATCH ?1
+        LIMIT {SEARCH_CANDIDATES}
+    )
+    SELECT e.id, e.employee_id_text, e.name, e.department, e.job_title
+    FROM matches JOIN employees e ON e.id = matches.rowid
+    ORDER BY e.employee_id_text = ?2 COLLATE NOCASE DESC, matches.score, e.name
+    LIMIT ?3
+"""
+
+# Runs of letters and digits, as FTS5's unicode61 tokenizer splits them
+_SEARCH_TERMS = re.compile(r"[^\W_]+")
+
+
+def search_query(text):
+    """FTS5 query for ``text`` typed into a search box: every word, as a prefix, must match.
+
+    Each word is quoted, so FTS5 operators and punctuation in the input are
+    taken literally. Returns None if ``text`` has no words at all.
+    """
+    terms = _SEARCH_TERMS.findall(text)
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_employees(conn, text, limit=10):
+    """Up to ``limit`` employees matching ``text`` by name, employee ID, department or job title.
+
+    An exact employee ID comes first, then the best bm25 matches (name
+    counting most). Served from the employees_fts index, so the cost depends
+    on how many employees match, never on the size of the directory.
+    """
+    query = search_query(text)
+    if query is None:
+        return []
+    return [dict(row) for row in conn.execute(SEARCH_QUERY, (query, text.strip(), limit))]
+
+
+def current_version(conn):
+    # Bumped by triggers on every INSERT, UPDATE and DELETE on employees
+    return conn.execute("SELECT version FROM employees_version WHERE id = 1").fetchone()[0]
+
+
+class EmployeeDirectory:
+    """The employee list, sorted by name, shared by every view that shows it.
+
+    Entries are plain dicts with id, employee_id_text, name, department and
+    job_title. The list is rebuilt only when the employees_version row has
+    moved, which is checked at most once per ``check_interval`` seconds (or
+    at once after invalidate()), the same scheme as presence.PresenceIndex.
+    ``etag`` identifies the list's content for If-None-Match revalidation.
+    """
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._employees = []
+        self._version = None
+        self._etag = None
+        self._checked_at = 0.0
+        self._loads = 0
+
+    def load(self, conn):
+        version = current_version(conn)
+        employees = [dict(row) for row in conn.execute(DIRECTORY_QUERY)]
+        digest = hashlib.blake2b(repr([tuple(e.values()) for e in employees]).encode('utf-8'), digest_size=12)
+        with self._lock:
+            self._employees = employees
+            self._version = version
+            self._etag = digest.hexdigest()
+            self._checked_at = time.monotonic()
+            self._loads += 1
+
+    def sync(self, connect, force=False):
+        """Reload if employees changed; ``connect`` is only called when a check is due."""
+        now = time.monotonic()
+        with self._lock:
+            if not (force or self._version is None or now - self._checked_at >= self.check_interval):
+                return
+            known_version = self._version
+        conn = connect()
+        if current_version(conn) != known_version:
+            self.load(conn)
+        else:
+            with self._lock:
+                self._checked_at = now
+
+    def snapshot(self, connect):
+        """(employees, etag) as of the latest sync. Treat the list as read-only."""
+        self.sync(connect)
+        with self._lock:
+            return self._employees, self._etag
+
+    def invalidate(self):
+        # Make the next lookup check the version (after a write in this process)
+        with self._lock:
+            self._checked_at = 0.0
+
+    def stats(self):
+        with self._lock:
+            return {'employees': len(self._employees), 'version': self._version,
+                    'etag': self._etag, 'loads': self._loads}
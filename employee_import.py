@@ -0,0 +1,114 @@
+import csv
+
+# Columns of an employee import file. Headers are matched case-insensitively,
+# with spaces treated as underscores, and "employee_id" accepted for employee_id_text.
+# A column named exactly takes precedence over an alias. "id" is deliberately not an
+# alias: in a dump of the employees table it is the internal key, not the business ID.
+IMPORT_COLUMNS = ('employee_id_text', 'name', 'department', 'job_title')
+REQUIRED_COLUMNS = ('employee_id_text', 'name')
+HEADER_ALIASES = {'employee_id': 'employee_id_text', 'employee_name': 'name'}
+
+# Existing employees (same employee_id_text) are updated in place, but only when
+# something differs, so unchanged rows don't bump employees_version.
+UPSERT_EMPLOYEE_SQL = """
+    INSERT INTO employees (employee_id_text, name, department, job_title) VALUES (?, ?, ?, ?)
+    ON CONFLICT (employee_id_text) DO UPDATE SET
+        name = excluded.name, department = excluded.department, job_title = excluded.job_title
+    WHERE (name, department, job_title) IS NOT (excluded.name, excluded.department, excluded.job_title)
+"""
+
+
+class ImportFileError(ValueError):
+    """The file as a whole can't be imported (bad header, not CSV, not UTF-8)."""
+
+
+def normalise_header(header):
+    return header.strip().lower().replace(' ', '_')
+
+
+def column_positions(header):
+    # {column: index of the first column with that name, or else with an alias of it}
+    names = [normalise_header(name) for name in header]
+    positions = {}
+    for position, name in enumerate(names):
+        positions.setdefault(name, position)
+    for position, name in enumerate(names):
+        if name in HEADER_ALIASES:
+            positions.setdefault(HEADER_ALIASES[name], position)
+    return positions
+
+
+def import_employees_csv(conn, lines, chunk_size=500, max_errors=1000):
+    """Upsert employees from CSV ``lines`` (any iterable of text lines, e.g. a stream).
+
+    Rows are validated as they are read and written ``chunk_size`` at a time,
+    each chunk in its own IMMEDIATE transaction, so memory use depends on the
+    chunk size rather than the file size and other requests only wait for one
+    chunk at a time. A row repeating an earlier employee_id_text updates it.
+    Returns a report: row counts plus up to ``max_errors`` entries of
+    {line, employee_id_text, message} for the rows that were skipped.
+    Raises ImportFileError if the header is unusable; rows already committed
+    stay committed if the file turns out to be malformed further on.
+    """
+    reader = csv.reader(lines)
+    try:
+        header = next(reader, None)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ImportFileError(f"Could not read the CSV header: {e}")
+    if not header:
+        raise ImportFileError("The file is empty.")
+    positions = column_positions(header)
+    missing = [column for column in REQUIRED_COLUMNS if column not in positions]
+    if missing:
+        raise ImportFileError(f"Missing required column(s): {', '.join(missing)}")
+
+    report = {'rows': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0,
+              'errors': [], 'errors_truncated': False}
+
+    def error(line, employee_id_text, message):
+        report['skipped'] += 1
+        if len(report['errors']) < max_errors:
+            report['errors'].append({'line': line, 'employee_id_text': employee_id_text, 'message': message})
+        else:
+            report['errors_truncated'] = True
+
+    def write(chunk):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.execute(
+                "SELECT row_count FROM table_row_counts WHERE table_name = 'employees'").fetchone()[0]
+            changed = conn.executemany(UPSERT_EMPLOYEE_SQL, chunk).rowcount
+            after = conn.execute(
+                "SELECT row_count FROM table_row_counts WHERE table_name = 'employees'").fetchone()[0]
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        report['inserted'] += after - before
+        report['updated'] += changed - (after - before)
+        report['unchanged'] += len(chunk) - changed
+
+    chunk = []
+    while True:
+        try:
+            row = next(reader, None)
+        except (csv.Error, UnicodeDecodeError) as e:
+            error(reader.line_num + 1, None, f"Unreadable CSV, import stopped here: {e}")
+            break
+        if row is None:
+            break
+        if not any(field.strip() for field in row):
+            continue  # Blank line
+        report['rows'] += 1
+        values = {column: (row[positions[column]].strip() if positions.get(column, len(row)) < len(row) else '')
+                  for column in IMPORT_COLUMNS}
+        if not values['employee_id_text'] or not values['name']:
+            error(reader.line_num, values['employee_id_text'] or None, "Employee ID and Name are required.")
+            continue
+        chunk.append(tuple(values[column] for column in IMPORT_COLUMNS))
+        if len(chunk) >= chunk_size:
+            write(chunk)
+            chunk = []
+    if chunk:
+        write(chunk)
+    return report
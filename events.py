@@ -0,0 +1,143 @@
+import json
+import threading
+from collections import deque
+
+
+def format_event(event_id, topic, data):
+    """One Server-Sent Events frame, encoded once and shared by every subscriber."""
+    payload = json.dumps(data, separators=(',', ':'))
+    return f"id: {event_id}\nevent: {topic}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class Subscription:
+    """One client's queue of pending frames, filled by EventBroadcaster.publish().
+
+    Threaded servers block in wait(). An asyncio server sets ``on_ready`` to a
+    thread-safe callback instead and collects frames with drain().
+    """
+
+    def __init__(self, topics):
+        self.topics = frozenset(topics)
+        self.frames = deque()
+        self.overflowed = False
+        self.closed = False
+        self.on_ready = None
+        self._ready = threading.Event()
+
+    def _wake(self):
+        self._ready.set()
+        if self.on_ready:
+            self.on_ready()
+
+    def wait(self, timeout):
+        """Wait up to ``timeout`` seconds for frames; returns them (possibly none)."""
+        self._ready.wait(timeout)
+        self._ready.clear()
+        return self.drain()
+
+    def drain(self):
+        """Take every queued frame without waiting."""
+        frames = []
+        # popleft() is atomic, so this races safely with publish() appending
+        while self.frames:
+            frames.append(self.frames.popleft())
+        return frames
+
+
+class EventBroadcaster:
+    """In-process fan-out of small JSON events to Server-Sent Events clients.
+
+    publish() formats each event once and appends the frame to every
+    matching subscriber's queue. A queue holds at most ``max_pending``
+    frames: a client that falls that far behind is disconnected instead of
+    buffering without limit, and its EventSource reconnects with
+    Last-Event-ID. The last ``history`` frames are kept so such a reconnect
+    can be replayed; a client whose position has dropped out of the history
+    is told to start from a fresh snapshot instead.
+    """
+
+    def __init__(self, max_pending=256, history=1024, max_subscribers=1000):
+        self.max_pending = max_pending
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history)  # (event_id, topic, frame)
+        self._last_id = 0
+        self._published = 0
+        self._dropped = 0
+        self._rejected = 0
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def has_subscribers(self, topic):
+        with self._lock:
+            return any(topic in subscription.topics for subscription in self._subscribers)
+
+    def publish(self, topic, data):
+        with self._lock:
+            self._last_id += 1
+            frame = format_event(self._last_id, topic, data)
+            self._history.append((self._last_id, topic, frame))
+            self._published += 1
+            for subscription in list(self._subscribers):
+                if topic not in subscription.topics:
+                    continue
+                if len(subscription.frames) >= self.max_pending:
+                    self._drop(subscription)
+                    continue
+                subscription.frames.append(frame)
+                subscription._wake()
+
+    def _drop(self, subscription):
+        # Caller holds the lock
+        subscription.overflowed = True
+        subscription.closed = True
+        self._subscribers.discard(subscription)
+        self._dropped += 1
+        subscription._wake()
+
+    def subscribe(self, topics, last_event_id=None):
+        """Register a client. Returns (subscription, resumed).
+
+        With ``last_event_id`` the missed frames are queued straight away if
+        they are all still in the history and ``resumed`` is True; otherwise
+        the caller should send a snapshot first. Returns (None, False) when
+        max_subscribers clients are already connected.
+        """
+        subscription = Subscription(topics)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._rejected += 1
+                return None, False
+            resumed = False
+            if last_event_id is not None and last_event_id <= self._last_id:
+                oldest = self._history[0][0] if self._history else self._last_id + 1
+                if last_event_id >= oldest - 1:
+                    missed = [frame for event_id, topic, frame in self._history
+                              if event_id > last_event_id and topic in subscription.topics]
+                    if len(missed) <= self.max_pending:
+                        subscription.frames.extend(missed)
+                        resumed = True
+            self._subscribers.add(subscription)
+        if subscription.frames:
+            subscription._ready.set()
+        return subscription, resumed
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscription.closed = True
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self._published,
+                'last_event_id': self._last_id,
+                'dropped_slow_subscribers': self._dropped,
+                'rejected_subscribers': self._rejected,
+                'max_queued': max((len(s.frames) for s in self._subscribers), default=0),
+                'max_pending': self.max_pending,
+            }
@@ -0,0 +1,313 @@
+import bisect
+import cProfile
+import functools
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from db import PooledConnection
+
+# Histogram bucket upper bounds, in seconds
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Query fingerprints longer than this are cut short in the `query` label;
+# `query_id` is taken from the whole fingerprint, so it still tells them apart.
+QUERY_LABEL_LENGTH = 200
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.I)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """The shape of a statement: literals replaced by ?, IN lists collapsed, whitespace normalised.
+
+    Queries that differ only in their values (including f-string built IN
+    lists and LIMITs) share one fingerprint, so they're aggregated together.
+    """
+    sql = _COMMENTS.sub(' ', sql)
+    sql = _STRINGS.sub('?', sql)
+    sql = _NUMBERS.sub('?', sql)
+    sql = _IN_LISTS.sub('IN (...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip().rstrip(';').rstrip()
+
+
+class MetricFamily:
+    # One metric name with its series, keyed by label values; updated under Metrics' lock
+    def __init__(self, name, kind, help_text, label_names, buckets=None):
+        self.name = name
+        self.kind = kind
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def inc(self, labels, amount=1):
+        self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for labels, series in sorted(self.series.items()):
+            pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, labels)]
+            if self.kind == 'counter':
+                value = round(series, 6) if isinstance(series, float) else series
+                lines.append(f"{self.name}{{{','.join(pairs)}}} {value}")
+                continue
+            counts, total, count = series
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{{{','.join([*pairs, le])}}} {cumulative}")
+            lines.append(f"{self.name}_sum{{{','.join(pairs)}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{','.join(pairs)}}} {count}")
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Latency histograms for SQL statements, requests and template renders.
+
+    Statements are recorded by InstrumentedConnection, requests and renders
+    by hooks in app.py. Everything is aggregated in memory per process and
+    rendered in the Prometheus text format by render(). Statements are
+    grouped by fingerprint(); after ``max_queries`` distinct fingerprints,
+    new ones are counted under the fingerprint "other" so a stream of
+    unexpected SQL can't grow the registry without limit.
+
+    begin_request()/end_request() total the statements a thread runs in
+    between, to attribute database time to endpoints.
+    """
+
+    def __init__(self, max_queries=500):
+        self.max_queries = max_queries
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._queries = MetricFamily(
+            'attendance_db_query_duration_seconds', 'histogram',
+            'Time spent executing SQL statements and fetching their rows, by statement fingerprint.',
+            ('query_id', 'query'), QUERY_BUCKETS)
+        self._query_rows = MetricFamily(
+            'attendance_db_query_rows_total', 'counter',
+            'Rows returned (or changed, for writes) by SQL statements, by statement fingerprint.',
+            ('query_id', 'query'))
+        self._requests = MetricFamily(
+            'attendance_http_request_duration_seconds', 'histogram',
+            'Time from the start of a request until its response body was sent, by endpoint.',
+            ('endpoint', 'method', 'status'), REQUEST_BUCKETS)
+        self._request_db = MetricFamily(
+            'attendance_http_request_db_seconds_total', 'counter',
+            'Time requests spent in SQL statements, by endpoint.', ('endpoint',))
+        self._request_queries = MetricFamily(
+            'attendance_http_request_queries_total', 'counter',
+            'SQL statements run by requests, by endpoint.', ('endpoint',))
+        self._templates = MetricFamily(
+            'attendance_template_render_duration_seconds', 'histogram',
+            'Time spent rendering templates, by template.', ('template',), REQUEST_BUCKETS)
+
+    def observe_query(self, sql, seconds, rows):
+        key = fingerprint(sql)
+        request = getattr(self._local, 'request', None)
+        if request is not None:
+            request[0] += 1
+            request[1] += seconds
+        with self._lock:
+            labels = self._query_labels(key)
+            self._queries.observe(labels, seconds)
+            self._query_rows.inc(labels, rows)
+
+    def _query_labels(self, key):
+        labels = (f'{zlib.crc32(key.encode()):08x}', key[:QUERY_LABEL_LENGTH])
+        if labels not in self._queries.series and len(self._queries.series) >= self.max_queries:
+            return ('other', 'other')
+        return labels
+
+    def begin_request(self):
+        self._local.request = [0, 0.0]
+
+    def end_request(self):
+        """(statements, seconds) run by this thread since begin_request()."""
+        request = getattr(self._local, 'request', None)
+        self._local.request = None
+        return tuple(request) if request else (0, 0.0)
+
+    def observe_request(self, endpoint, method, status, seconds, queries=0, query_seconds=0.0):
+        endpoint = endpoint or 'unmatched'
+        with self._lock:
+            self._requests.observe((endpoint, method, str(status)), seconds)
+            self._request_queries.inc((endpoint,), queries)
+            self._request_db.inc((endpoint,), query_seconds)
+
+    def observe_template(self, name, seconds):
+        with self._lock:
+            self._templates.observe((name or 'string',), seconds)
+
+    def render(self):
+        with self._lock:
+            families = (self._requests, self._request_db, self._request_queries,
+                        self._templates, self._queries, self._query_rows)
+            return '\n'.join(line for family in families for line in family.render()) + '\n'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that reports each statement to its connection's Metrics.
+
+    A statement's time is what execute() and the fetches of its rows took,
+    not the time the caller spent between fetches. It's recorded once its
+    rows are exhausted, or when the cursor runs another statement, is
+    closed or is garbage collected (the usual ``execute().fetchone()``).
+    """
+
+    _pending = None  # [sql, seconds, rows] of the statement whose rows are being fetched
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self.connection.metrics.observe_query(sql_script, time.perf_counter() - started, 0)
+
+    def _run(self, method, sql, parameters):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            method(sql, parameters)
+        finally:
+            self._pending = [sql, time.perf_counter() - started, 0]
+        if self.description is None:  # No result rows: a write, DDL or a silent PRAGMA
+            self._pending[2] = max(self.rowcount, 0)
+            self._finish()
+        return self
+
+    def _fetched(self, started, rows, exhausted):
+        if self._pending is not None:
+            self._pending[1] += time.perf_counter() - started
+            self._pending[2] += rows
+            if exhausted:
+                self._finish()
+
+    def _finish(self):
+        pending = self._pending
+        if pending is not None:
+            self._pending = None
+            self.connection.metrics.observe_query(*pending)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._fetched(started, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class InstrumentedConnection(PooledConnection):
+    """PooledConnection whose cursors (including those behind execute()) are InstrumentedCursors.
+
+    Pass ``functools.partial(InstrumentedConnection, metrics=...)`` as the
+    ConnectionPool factory.
+    """
+
+    def __init__(self, *args, metrics, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection's shortcuts create their cursor without going through cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+class RequestProfiler:
+    """cProfile a random ``sample_rate`` fraction of requests into ``directory``.
+
+    Each sampled request leaves one ``<timestamp>-<endpoint>-<ms>ms.prof``
+    file, for ``python -m pstats`` or snakeviz. From Python 3.12 only one
+    profiler can be active in a process, so a request sampled while another
+    is being profiled is skipped.
+    """
+
+    def __init__(self, directory, sample_rate):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.profiled = 0
+
+    def start(self):
+        """A running profiler if this request was sampled, else None."""
+        if random.random() >= self.sample_rate:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:  # Another profiler is active
+            return None
+        return profile
+
+    def finish(self, profile, endpoint, seconds):
+        profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint or 'unmatched'}-{seconds * 1000:.0f}ms.prof"
+        profile.dump_stats(os.path.join(self.directory, name))
+        self.profiled += 1
@@ -0,0 +1,197 @@
+import threading
+import time
+from datetime import datetime
+
+from db import ATTENDANCE_READ_SQL, current_attendance_storage
+
+# Status strings returned by /get_attendance_status
+STATUS_NONE = 'NONE'
+STATUS_IN = 'IN'
+STATUS_OUT = 'OUT'
+
+# Today's rows, in the order mark_out closes them, per storage format; served by
+# idx_attendance_date_time_in or idx_attendance_ts_in
+LOAD_QUERY = {
+    storage: f"SELECT a.id, a.employee_id, a.time_out FROM attendance a WHERE {sql['on_date']} ORDER BY {sql['oldest_first']}"
+    for storage, sql in ATTENDANCE_READ_SQL.items()
+}
+
+
+def current_version(conn):
+    # Bumped by triggers on every INSERT, time_out UPDATE and DELETE on attendance
+    return conn.execute("SELECT version FROM attendance_version WHERE id = 1").fetchone()[0]
+
+
+class PresenceIndex:
+    """Today's IN/OUT state for every employee, held in memory.
+
+    For each employee that has attendance rows today it keeps the ids of the
+    open (not yet marked out) rows in time_in order and whether a completed row
+    exists, which is everything get_attendance_status, index(), mark_in and
+    mark_out need to know.
+
+    Consistency between worker processes comes from the attendance_version
+    row: every write to attendance bumps it in the same transaction. sync()
+    compares it with the version this index was built from (at most once per
+    ``check_interval`` seconds) and reloads today's rows if another process
+    has written since. At midnight the index rolls over to the new date.
+
+    ``overlay`` may be set to a callable returning events that have been
+    acknowledged but not yet written to SQLite (write-behind mode); they are
+    re-applied on top of every reload. Their open rows have no id yet (None).
+
+    ``on_reload`` may be set to a callable taking (conn, date, changes), run
+    after each reload: ``changes`` maps employee_id to its new status for
+    every employee whose status differs from before the reload, or is None
+    when the index was (re)built for a new date.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._date = None
+        self._version = None
+        self._checked_at = 0.0
+        self._open = {}      # employee_id -> [open attendance row ids, oldest time_in first]
+        self._closed = set()  # employee_ids with at least one completed row today
+        self.overlay = None
+        self.on_reload = None
+
+    @staticmethod
+    def today():
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def load(self, conn, date=None):
+        """Rebuild the index from today's attendance rows (one indexed query)."""
+        date = date or self.today()
+        # Snapshot pending events before reading the table: an event flushed in
+        # between then shows up twice rather than not at all, and the version
+        # bump from that flush makes the next sync() reload it correctly.
+        pending = self.overlay() if self.overlay else []
+        # Read the version first: a write landing between the two queries then
+        # just causes one extra reload on the next sync().
+        version = current_version(conn)
+        rows = conn.execute(LOAD_QUERY[current_attendance_storage(conn)], {'date': date}).fetchall()
+
+        open_rows = {}
+        closed = set()
+        for row in rows:
+            if row['time_out'] is None:
+                open_rows.setdefault(row['employee_id'], []).append(row['id'])
+            else:
+                closed.add(row['employee_id'])
+        for event in pending:
+            if event['date'] == date:
+                self._apply_pending(open_rows, closed, event['employee_id'], event['action'])
+
+        with self._lock:
+            changes = None
+            if self.on_reload and self._date == date:
+                previous = self._statuses(self._open, self._closed)
+                current = self._statuses(open_rows, closed)
+                changes = {employee_id: current.get(employee_id, STATUS_NONE)
+                           for employee_id in previous.keys() | current.keys()
+                           if previous.get(employee_id) != current.get(employee_id)}
+            self._date = date
+            self._version = version
+            self._open = open_rows
+            self._closed = closed
+            self._checked_at = time.monotonic()
+        if self.on_reload:
+            self.on_reload(conn, date, changes)
+
+    def check_due(self):
+        """True if the next sync() would consult SQLite."""
+        with self._lock:
+            return (self._date != self.today()
+                    or time.monotonic() - self._checked_at >= self.check_interval)
+
+    def sync(self, connect, force=False):
+        """Reload if the date has rolled over or another process has written.
+
+        ``connect`` is a callable returning a database connection; it is only
+        called when a check is actually due, so most lookups never touch SQLite.
+        """
+        now = time.monotonic()
+        with self._lock:
+            rolled_over = self._date != self.today()
+            if not (force or rolled_over or now - self._checked_at >= self.check_interval):
+                return
+            known_version = self._version
+        conn = connect()
+        if rolled_over or current_version(conn) != known_version:
+            self.load(conn)
+        else:
+            with self._lock:
+                self._checked_at = now
+
+    def status(self, employee_id):
+        with self._lock:
+            if self._open.get(employee_id):
+                return STATUS_IN
+            if employee_id in self._closed:
+                return STATUS_OUT
+            return STATUS_NONE
+
+    def flags(self, employee_id):
+        # (has an open row, has a completed row): what the dashboard counters count
+        with self._lock:
+            return bool(self._open.get(employee_id)), employee_id in self._closed
+
+    @staticmethod
+    def _statuses(open_rows, closed):
+        statuses = dict.fromkeys(closed, STATUS_OUT)
+        statuses.update((employee_id, STATUS_IN) for employee_id, open_ids in open_rows.items() if open_ids)
+        return statuses
+
+    def statuses(self):
+        """(date, {employee_id: IN or OUT}) for everyone who has marked today."""
+        with self._lock:
+            return self._date, self._statuses(self._open, self._closed)
+
+    def open_record_id(self, employee_id):
+        # The most recent open row, i.e. the one mark_out closes
+        with self._lock:
+            open_ids = self._open.get(employee_id)
+            return open_ids[-1] if open_ids else None
+
+    def _after_local_write(self, version):
+        # The version was read inside the writing transaction. If it is exactly
+        # one ahead of ours, nobody else wrote in between and the local update
+        # leaves the index current; otherwise force a reload on the next sync().
+        if self._version is not None and version == self._version + 1:
+            self._version = version
+        else:
+            self._checked_at = 0.0
+
+    def record_in(self, employee_id, row_id, version):
+        with self._lock:
+            self._open.setdefault(employee_id, []).append(row_id)
+            self._after_local_write(version)
+
+    @staticmethod
+    def _apply_pending(open_rows, closed, employee_id, action):
+        if action == 'in':
+            open_rows.setdefault(employee_id, []).append(None)
+        else:
+            open_ids = open_rows.get(employee_id)
+            if open_ids:
+                open_ids.pop()
+                if not open_ids:
+                    del open_rows[employee_id]
+            closed.add(employee_id)
+
+    def record_pending(self, employee_id, action):
+        # An event queued for write-behind: update state, leave the version alone
+        with self._lock:
+            self._apply_pending(self._open, self._closed, employee_id, action)
+
+    def record_out(self, employee_id, row_id, version):
+        with self._lock:
+            open_ids = self._open.get(employee_id, [])
+            if row_id in open_ids:
+                open_ids.remove(row_id)
+            if not open_ids:
+                self._open.pop(employee_id, None)
+            self._closed.add(employee_id)
+            self._after_local_write(version)
@@ -0,0 +1,112 @@
+from datetime import datetime
+
+from db import ATTENDANCE_READ_SQL, SESSION_SECONDS_SQL, attendance_storage
+
+# SQL expression giving the reporting period an attendance date falls into
+PERIODS = {
+    'day': "daily.date",
+    'week': "date(daily.date, 'weekday 0', '-6 days')",  # Monday starting the week
+    'month': "substr(daily.date, 1, 7)",
+}
+
+# An employee's department for reporting: NULL and '' are both "Unassigned"
+DEPARTMENT_SQL = "COALESCE(NULLIF(e.department, ''), 'Unassigned')"
+
+# Per grouping: (columns identifying a summary row, GROUP BY key, ORDER BY within a period).
+# The department key is the whole expression: a bare "department" in GROUP BY would
+# resolve to the e.department column, splitting NULL and '' into two rows.
+GROUPINGS = {
+    'employee': ("e.id AS employee_id, e.employee_id_text, e.name, e.department", "e.id", "e.name"),
+    'department': (f"{DEPARTMENT_SQL} AS department", DEPARTMENT_SQL, DEPARTMENT_SQL),
+}
+
+
+def parse_report_date(value):
+    """Validate a YYYY-MM-DD date string, raising ValueError otherwise."""
+    return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+
+
+def employee_sessions(conn, employee_id, archive=None):
+    """Every attendance row of one employee, newest first, with duration_minutes from SQL.
+
+    With an archive.AttendanceArchive, archived partitions are read too.
+    """
+    sessions = []
+    sources = archive.sources(conn) if archive else iter(['main'])
+    try:
+        # Partitions come newest first and never overlap, so this stays in date order
+        for schema in sources:
+            storage = attendance_storage(conn, schema=schema)
+            session_seconds = SESSION_SECONDS_SQL[storage]
+            sessions += [dict(row) for row in conn.execute(f"""
+                SELECT a.date, a.time_in, a.time_out, a.location,
+                       CAST(ROUND({session_seconds} / 60.0) AS INTEGER) AS duration_minutes
+                FROM {schema}.attendance a
+                WHERE a.employee_id = ?
+                ORDER BY {ATTENDANCE_READ_SQL[storage]['newest_first']}
+            """, (employee_id,))]
+    finally:
+        if archive:
+            sources.close()
+    return sessions
+
+
+def attendance_summary(conn, start_date, end_date, period='month', group_by='employee',
+                       employee_id=None, department=None,
+                       workday_seconds=8 * 3600, late_after='09:15:00'):
+    """Totals per employee or department per day/week/month between two dates (inclusive).
+
+    Reads the per-employee per-day rows of daily_attendance_summary (which
+    also cover archived months) rather than every attendance row; a day
+    counts towards overtime for whatever it exceeds ``workday_seconds``, and
+    as a late arrival when its first time_in is after ``late_after``.
+    Everything is aggregated inside SQLite, so only the summary rows reach
+    Python.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    if group_by not in GROUPINGS:
+        raise ValueError(f"group_by must be one of {', '.join(GROUPINGS)}")
+
+    conditions = ["s.date BETWEEN ? AND ?"]
+    params = [start_date, end_date]
+    if employee_id is not None:
+        conditions.append("s.employee_id = ?")
+        params.append(employee_id)
+    department_filter = ""
+    if department:
+        department_filter = f"WHERE {DEPARTMENT_SQL} = ?"
+
+    group_columns, group_key, order_key = GROUPINGS[group_by]
+    query = f"""
+        WITH daily AS (
+            SELECT s.employee_id, s.date, s.sessions, s.worked_seconds, s.first_in
+            FROM daily_attendance_summary s
+            WHERE {' AND '.join(conditions)}
+        )
+        SELECT {group_columns},
+               {PERIODS[period]} AS period,
+               COUNT(DISTINCT daily.employee_id) AS employees,
+               COUNT(*) AS days_present,
+               SUM(daily.sessions) AS sessions,
+               COALESCE(SUM(daily.worked_seconds), 0) AS worked_seconds,
+               COALESCE(SUM(MAX(daily.worked_seconds - ?, 0)), 0) AS overtime_seconds,
+               SUM(daily.first_in > ?) AS late_arrivals
+        FROM daily
+        JOIN employees e ON e.id = daily.employee_id
+        {department_filter}
+        GROUP BY {group_key}, period
+        ORDER BY period, {order_key}
+    """
+    # Placeholders in statement order: CTE filters, SELECT list, department filter
+    params += [workday_seconds, late_after]
+    if department:
+        params.append(department)
+
+    summary = []
+    for row in conn.execute(query, params):
+        item = dict(row)
+        item['worked_hours'] = round(item['worked_seconds'] / 3600, 2)
+        item['overtime_hours'] = round(item['overtime_seconds'] / 3600, 2)
+        summary.append(item)
+    return summary
@@ -0,0 +1,86 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app's modules live at the repository root, not in a package
+sys.path.insert(0, ROOT)
+
+import app  # noqa: E402
+from db import attendance_write_sql, migrate_to_integer_timestamps  # noqa: E402
+
+# ...and so do its templates, which a deployment copies into templates/
+app.app.template_folder = ROOT
+
+
+@pytest.fixture
+def storage():
+    """Attendance storage format of the test database; parametrize to use 'integer'."""
+    return 'text'
+
+
+@pytest.fixture
+def database(tmp_path, storage):
+    """The app re-pointed at a new, empty database in tmp_path; returns its path."""
+    path = str(tmp_path / 'attendance.db')
+    app.create_app(path)
+    if storage == 'integer':
+        conn = app.db_pool.acquire()
+        try:
+            migrate_to_integer_timestamps(conn)
+        finally:
+            app.db_pool.release(conn)
+    return path
+
+
+@pytest.fixture
+def conn(database):
+    conn = app.db_pool.acquire()
+    yield conn
+    if conn.in_transaction:
+        conn.rollback()
+    app.db_pool.release(conn)
+
+
+@pytest.fixture
+def client(database):
+    return app.app.test_client()
+
+
+@pytest.fixture
+def admin_client(client):
+    with client.session_transaction() as session:
+        session['admin'] = True
+    return client
+
+
+@pytest.fixture
+def add_employees(conn):
+    """add_employees(count) inserts employees E001, E002, ... and returns their ids."""
+    def add_employees(count, department='Sales'):
+        start = conn.execute("SELECT COUNT(*) FROM employees").fetchone()[0]
+        with conn:
+            conn.executemany("INSERT INTO employees (employee_id_text, name, department, job_title) "
+                             "VALUES (?, ?, ?, 'Clerk')",
+                             [(f'E{n:03d}', f'Employee {n}', department) for n in range(start + 1, start + count + 1)])
+        # The employee directory only checks for changes every few seconds
+        app.employee_directory.invalidate()
+        return [row[0] for row in conn.execute("SELECT id FROM employees ORDER BY id")][start:]
+    return add_employees
+
+
+@pytest.fixture
+def add_attendance(conn):
+    """add_attendance(employee_ids, days, ...) writes one session per employee per day,
+    for the ``days`` days up to and including today, in the database's storage format."""
+    def add_attendance(employee_ids, days=1, time_in='09:00:00', time_out='17:00:00', location='Onsite'):
+        with conn:
+            conn.executemany(attendance_write_sql(conn)['insert'], [
+                (employee_id, (date.today() - timedelta(days=day)).isoformat(), time_in, time_out, location)
+                for employee_id in employee_ids for day in range(days)])
+        # The presence index only re-reads SQLite once its check interval has passed
+        app.presence_index.load(conn)
+    return add_attendance
@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+from datetime import date
+
+import app
+from conftest import ROOT
+
+
+def run_python(code, tmp_path):
+    env = dict(os.environ, ATTENDANCE_DB_PATH=str(tmp_path / 'db' / 'attendance.db'))
+    env.pop('ATTENDANCE_WRITE_BEHIND', None)
+    return subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+
+
+def test_import_does_not_touch_the_database(tmp_path):
+    run_python("import app", tmp_path)
+    assert not (tmp_path / 'db').exists()
+
+
+def test_first_request_starts_the_app(tmp_path):
+    result = run_python("import app\n"
+                        "print(app.app.test_client().get('/get_attendance_status/1').json['status'])", tmp_path)
+    assert result.stdout.strip() == 'NONE'
+    assert (tmp_path / 'db' / 'attendance.db').exists()
+
+
+def test_create_app_repoints_everything(tmp_path, conn, add_employees, add_attendance, client):
+    employee_id, = add_employees(1)
+    add_attendance([employee_id], days=3, time_out=None)
+    with client.session_transaction() as session:
+        session['admin'] = True
+    assert client.get('/dashboard').status_code == 200
+    assert app._dashboard_trend['trend']  # Cached from this database
+    assert client.get(f'/get_attendance_status/{employee_id}').json['status'] == 'IN'
+
+    other = tmp_path / 'other' / 'attendance.db'
+    assert app.create_app(str(other), pool_size=2) is app.app
+    assert (app.DB_PATH, app.db_pool.max_size) == (str(other), 2)
+    assert app.attendance_archive.directory == str(tmp_path / 'other' / 'archive')
+
+    # Nothing read from the first database survives the switch
+    assert client.get(f'/get_attendance_status/{employee_id}').json['status'] == 'NONE'
+    assert app.get_employees()[0] == []
+    pool_conn = app.db_pool.acquire()
+    try:
+        assert app.get_dashboard_trend(pool_conn, date.today().isoformat()) == []
+        assert pool_conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0] == 0
+    finally:
+        app.db_pool.release(pool_conn)
@@ -0,0 +1,94 @@
+import csv
+import io
+import os
+import sqlite3
+
+import pytest
+
+import app
+from archive import AttendanceArchive
+from reports import attendance_summary, employee_sessions
+
+
+@pytest.fixture
+def history(conn, add_employees, add_attendance):
+    """Two employees with sessions in April, May and June 2025, and today."""
+    employee_ids = add_employees(2)
+    with conn:
+        conn.executemany(app.attendance_write_sql(conn)['insert'], [
+            (employee_id, day, '09:00:00', '17:00:00', 'Onsite')
+            for employee_id in employee_ids for day in ('2025-04-30', '2025-05-01', '2025-05-31', '2025-06-02')])
+    add_attendance(employee_ids[:1], time_out=None)
+    return employee_ids
+
+
+def everything(conn, employee_ids):
+    # Every row, in any archive or the hot table, newest first
+    return [row for employee_id in employee_ids for row in employee_sessions(conn, employee_id, app.attendance_archive)]
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_compact_moves_closed_months(conn, history, storage):
+    before = everything(conn, history)
+    summary = [tuple(row) for row in conn.execute("SELECT * FROM daily_attendance_summary ORDER BY 1, 2")]
+
+    moved = app.attendance_archive.compact(conn, '2025-06-15')
+    assert moved == [('2025-04', 2), ('2025-05', 4)]
+    assert sorted(os.listdir(app.attendance_archive.directory)) == ['attendance-2025-04.db', 'attendance-2025-05.db']
+    assert conn.execute("SELECT MIN(date) FROM attendance").fetchone()[0] == '2025-06-02'
+    assert app.attendance_archive.archived_through(conn) == '2025-05-31'
+
+    # Nothing is lost, nor counted twice
+    assert everything(conn, history) == before
+    assert [tuple(row) for row in conn.execute("SELECT * FROM daily_attendance_summary ORDER BY 1, 2")] == summary
+    assert conn.execute("SELECT row_count FROM table_row_counts WHERE table_name = 'attendance'").fetchone()[0] == 9
+    assert app.attendance_archive.compact(conn, '2025-06-15') == []
+
+    app.attendance_archive.rebuild_daily_summary(conn)
+    assert [tuple(row) for row in conn.execute("SELECT * FROM daily_attendance_summary ORDER BY 1, 2")] == summary
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_reads_span_the_archive(admin_client, conn, history, storage):
+    app.attendance_archive.compact(conn, '2025-06-01')
+    # Records, a page at a time across partitions
+    records, cursor = [], None
+    while True:
+        page = admin_client.get('/api/records', query_string={'page_size': 3, **({'cursor': cursor} if cursor else {})}).json
+        records += page['records']
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert len(records) == 9 and records[-1]['date'] == '2025-04-30'
+
+    rows = list(csv.reader(io.StringIO(admin_client.get('/export_csv', query_string={
+        'start_date': '2025-05-01', 'end_date': '2025-06-30'}).get_data(as_text=True))))
+    assert [row[2] for row in rows[1:]] == ['2025-06-02'] * 2 + ['2025-05-31'] * 2 + ['2025-05-01'] * 2
+
+    summary = attendance_summary(conn, '2025-04-01', '2025-06-30', group_by='department')
+    assert [(row['period'], row['days_present']) for row in summary] == [('2025-04', 2), ('2025-05', 4), ('2025-06', 2)]
+
+
+def test_archived_dates_are_read_only(client, conn, history):
+    app.attendance_archive.compact(conn, '2025-06-01')
+    results = client.post('/api/attendance/batch', json={'events': [
+        {'employee_id': history[1], 'action': 'in', 'timestamp': '2025-05-20T09:00:00'},
+        {'employee_id': history[1], 'action': 'in', 'timestamp': '2025-06-20T09:00:00'},
+    ]}).json['results']
+    assert results[0]['message'] == "Attendance up to 2025-05-31 has been archived and can't be changed."
+    assert results[1]['status'] == 'ok'
+
+
+def test_missing_archive_file_is_an_error(conn, history):
+    app.attendance_archive.compact(conn, '2025-05-01')
+    os.remove(os.path.join(app.attendance_archive.directory, 'attendance-2025-04.db'))
+    with pytest.raises(sqlite3.OperationalError, match='is missing'):
+        everything(conn, history)
+
+
+def test_partition_periods_cannot_be_mixed(conn, history, tmp_path):
+    app.attendance_archive.compact(conn, '2025-05-01')
+    with pytest.raises(ValueError, match="isn't a yearly partition"):
+        AttendanceArchive(app.attendance_archive.directory, period='year').compact(conn, '2026-01-01')
+    with pytest.raises(ValueError):
+        AttendanceArchive(str(tmp_path), period='week')
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def asgi(database, monkeypatch):
+    # Importing asgi turns the live event stream on and calls create_app(), which
+    # leaves the app on the test database it has already started on
+    monkeypatch.setattr(app, 'LIVE_EVENTS', app.LIVE_EVENTS)
+    import asgi
+    return asgi
+
+
+def call(asgi, method, path, query=b'', headers=(), body_chunks=(b'',), disconnect_after=None):
+    """Run one request through asgi.application; returns (status, headers, body)."""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'http_version': '1.1',
+             'headers': [(name.encode(), value.encode()) for name, value in headers]}
+    messages = [{'type': 'http.request', 'body': chunk, 'more_body': n < len(body_chunks) - 1}
+                for n, chunk in enumerate(body_chunks)]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        if disconnect_after is not None:
+            await asyncio.sleep(disconnect_after)
+        else:
+            await asyncio.Event().wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.application(scope, receive, send))
+    start = sent[0]
+    return (start['status'], {name.decode(): value.decode() for name, value in start['headers']},
+            b''.join(message.get('body', b'') for message in sent[1:]))
+
+
+def test_status_is_answered_from_the_presence_index(asgi, add_employees, add_attendance):
+    employee_id, = add_employees(1)
+    add_attendance([employee_id], time_out=None)
+    status, headers, body = call(asgi, 'GET', f'/get_attendance_status/{employee_id}')
+    assert (status, headers['content-type'], json.loads(body)) == (200, 'application/json', {'status': 'IN'})
+
+
+def test_other_requests_go_to_flask(asgi, conn, add_employees):
+    employee_id, = add_employees(1)
+    # A chunked upload: no Content-Length, the body arrives in pieces
+    status, headers, _ = call(asgi, 'POST', '/mark_in', headers=[('content-type', 'application/x-www-form-urlencoded')],
+                              body_chunks=[f'employee_id={employee_id}'.encode(), b'&location=Remote'])
+    assert (status, headers['location']) == (302, '/')
+    assert conn.execute("SELECT location FROM attendance").fetchone()[0] == 'Remote'
+
+    status, headers, _ = call(asgi, 'GET', '/records')
+    assert (status, headers['location']) == (302, '/login')
+
+
+def test_event_stream(asgi, add_employees, add_attendance):
+    employee_id, = add_employees(1)
+    add_attendance([employee_id], time_out=None)
+    status, headers, body = call(asgi, 'GET', '/events', query=b'topics=presence', disconnect_after=0.05)
+    assert (status, headers['content-type']) == (200, 'text/event-stream')
+    assert body.startswith(b'retry: 3000\n\n')
+    assert b'"type":"snapshot"' in body and f'"{employee_id}":"IN"'.encode() in body
+    assert app.event_broadcaster.stats()['subscribers'] == 0  # Unsubscribed on disconnect
+
+    assert call(asgi, 'GET', '/events', query=b'topics=weather')[0] == 400
+    assert call(asgi, 'GET', '/events', query=b'topics=dashboard')[0] == 403
+
+
+def test_unsupported_scopes(asgi):
+    with pytest.raises(ValueError):
+        asyncio.run(asgi.application({'type': 'websocket'}, None, None))
@@ -0,0 +1,77 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import app
+
+
+def batch(client, *events):
+    response = client.post('/api/attendance/batch', json={'events': list(events)})
+    assert response.status_code == 200
+    return response.json
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_events_apply_in_order(client, conn, add_employees, storage):
+    first, second = add_employees(2)
+    today = date.today().isoformat()
+    result = batch(client,
+                   {'employee_id': first, 'action': 'in', 'timestamp': f'{today}T08:00:00'},
+                   {'employee_id': first, 'action': 'in', 'timestamp': f'{today}T08:05:00'},
+                   {'employee_id': second, 'action': 'out', 'timestamp': f'{today}T08:10:00'},
+                   {'employee_id': first, 'action': 'out', 'timestamp': f'{today}T12:00:00'},
+                   {'employee_id': first, 'action': 'in', 'timestamp': f'{today}T13:00:00', 'location': 'Remote'})
+    assert [event['status'] for event in result['results']] == ['ok', 'error', 'error', 'ok', 'ok']
+    assert (result['applied'], result['rejected']) == (3, 2)
+
+    rows = conn.execute("SELECT time_in, time_out, location FROM attendance ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [('08:00:00', '12:00:00', 'Onsite'), ('13:00:00', None, 'Remote')]
+    assert client.get(f'/get_attendance_status/{first}').json['status'] == 'IN'
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_late_out_closes_an_earlier_day(client, conn, add_employees, add_attendance, storage):
+    employee_id, = add_employees(1)
+    add_attendance([employee_id], days=2, time_out=None)
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+
+    result = batch(client,
+                   {'employee_id': employee_id, 'action': 'out', 'timestamp': f'{yesterday}T08:00:00'},
+                   {'employee_id': employee_id, 'action': 'out', 'timestamp': f'{yesterday}T18:00:00'})
+    assert result['results'][0]['message'].startswith('Mark out at 08:00:00 is before')
+    assert result['results'][1]['status'] == 'ok'
+    assert conn.execute("SELECT time_out FROM attendance WHERE date = ?", (yesterday,)).fetchone()[0] == '18:00:00'
+    # Today's session is still open
+    assert client.get(f'/get_attendance_status/{employee_id}').json['status'] == 'IN'
+
+
+def test_offset_timestamps_are_stored_in_local_time(client, conn, add_employees):
+    employee_id, = add_employees(1)
+    moment = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(minutes=5)
+    batch(client, {'employee_id': employee_id, 'action': 'in', 'timestamp': moment.isoformat()})
+    local = moment.astimezone()
+    row = conn.execute("SELECT date, time_in FROM attendance").fetchone()
+    assert tuple(row) == (local.strftime('%Y-%m-%d'), local.strftime('%H:%M:%S'))
+
+
+@pytest.mark.parametrize('event, message', [
+    ('not an object', 'Event must be an object.'),
+    ({'employee_id': 'x', 'action': 'in'}, 'Invalid employee_id.'),
+    ({'employee_id': 1, 'action': 'sideways'}, "action must be 'in' or 'out'."),
+    ({'employee_id': 1, 'action': 'in', 'timestamp': 'yesterday'}, 'Invalid timestamp'),
+    ({'employee_id': 99, 'action': 'in'}, 'Employee not found.'),
+])
+def test_invalid_events_are_rejected(client, conn, add_employees, event, message):
+    add_employees(1)
+    result = batch(client, event)
+    assert result['results'][0]['status'] == 'error'
+    assert result['results'][0]['message'].startswith(message)
+    assert conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0] == 0
+
+
+def test_bad_requests(client, database, monkeypatch):
+    assert client.post('/api/attendance/batch', json=[]).status_code == 400
+    assert client.post('/api/attendance/batch', data='{').status_code == 400
+    monkeypatch.setattr(app, 'BATCH_MAX_EVENTS', 2)
+    events = [{'employee_id': 1, 'action': 'in'}] * 3
+    assert client.post('/api/attendance/batch', json={'events': events}).status_code == 413
@@ -0,0 +1,60 @@
+import argparse
+import sqlite3
+from datetime import date
+
+import pytest
+
+from benchmarks import percentile
+from benchmarks.bench_suite import ROUTES, run_test_client, summarise
+from benchmarks.data import DEFAULT_LOCATIONS, create_synthetic_database, database_path, parse_locations
+
+
+def test_percentile():
+    samples = list(range(1, 101))
+    assert [percentile(samples, fraction) for fraction in (0.01, 0.5, 0.95, 1.0)] == [1, 50, 95, 100]
+    assert percentile([7], 0.99) == 7
+    assert percentile([], 0.5) is None
+    assert summarise([], 0, 1.0)['p50_ms'] is None
+
+
+def test_locations_and_file_names():
+    assert parse_locations('Onsite=3, Remote=1') == {'Onsite': 0.75, 'Remote': 0.25}
+    with pytest.raises(ValueError):
+        parse_locations('Onsite=0')
+    assert database_path(10, 5, locations=DEFAULT_LOCATIONS).endswith('bench-10e-5d-1p.db')
+    assert database_path(10, 5, locations={'Onsite': 0.5, 'Remote': 0.5}, presence_ratio=1.0).endswith(
+        'bench-10e-5d-1p-onsite50-remote50-present100.db')
+
+
+def test_synthetic_database(tmp_path):
+    path = str(tmp_path / 'bench.db')
+    rows = create_synthetic_database(path, employees=20, days=3, punches_per_day=2,
+                                     locations={'Remote': 1.0}, presence_ratio=1.0)
+    assert rows == 20 * 3 * 2
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT DISTINCT location FROM attendance").fetchall() == [('Remote',)]
+        # Half the employees are still in today, in their last session
+        assert conn.execute("SELECT COUNT(*) FROM attendance WHERE time_out IS NULL AND date = ?",
+                            (date.today().isoformat(),)).fetchone()[0] == 10
+        first = conn.execute("SELECT * FROM attendance ORDER BY id").fetchall()
+    conn.close()
+
+    # The same arguments and seed give the same rows; an existing file is reused
+    again = str(tmp_path / 'again.db')
+    create_synthetic_database(again, employees=20, days=3, punches_per_day=2,
+                              locations={'Remote': 1.0}, presence_ratio=1.0)
+    with sqlite3.connect(again) as conn:
+        assert conn.execute("SELECT * FROM attendance ORDER BY id").fetchall() == first
+    conn.close()
+    assert create_synthetic_database(path, employees=1) == rows
+
+
+def test_suite_scenarios_run_without_errors(tmp_path):
+    path = str(tmp_path / 'suite.db')
+    create_synthetic_database(path, employees=30, days=5)
+    args = argparse.Namespace(employees=30, locations=DEFAULT_LOCATIONS, export_days=3, routes=list(ROUTES),
+                              requests=3)
+    routes = run_test_client(path, args)['routes']
+    assert set(routes) == set(ROUTES)
+    assert {route: result['errors'] for route, result in routes.items()} == dict.fromkeys(ROUTES, 0)
+    assert all(result['requests'] == 3 and result['p50_ms'] > 0 for result in routes.values())
@@ -0,0 +1,72 @@
+import pytest
+
+import app
+from db import rebuild_daily_summary
+
+SUMMARY_SQL = "SELECT * FROM daily_attendance_summary ORDER BY date, employee_id"
+
+
+def summary(conn):
+    return [tuple(row) for row in conn.execute(SUMMARY_SQL)]
+
+
+def rebuilt(conn):
+    # What a rebuild from scratch makes of the attendance table, leaving the triggers' work alone
+    conn.execute("SAVEPOINT rebuild")
+    rebuild_daily_summary(conn)
+    rows = summary(conn)
+    conn.execute("ROLLBACK TO rebuild")
+    conn.execute("RELEASE rebuild")
+    return rows
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_triggers_keep_each_day_current(conn, add_employees, storage):
+    first, second = add_employees(2)
+    write_sql = app.attendance_write_sql(conn)
+    with conn:
+        conn.executemany(write_sql['insert'], [
+            (first, '2025-06-09', '09:00:00', '12:00:00', 'Onsite'),
+            (first, '2025-06-09', '13:00:00', None, 'Remote'),
+            (second, '2025-06-10', '08:30:00', '16:30:00', 'Onsite'),
+        ])
+    assert summary(conn) == [
+        ('2025-06-09', first, 2, 1, '09:00:00', '12:00:00', 3 * 3600, 1, 1),
+        ('2025-06-10', second, 1, 0, '08:30:00', '16:30:00', 8 * 3600, 1, 0),
+    ]
+
+    with conn:
+        conn.execute(write_sql['close'], ('18:00:00', 2))
+    assert summary(conn)[0] == ('2025-06-09', first, 2, 0, '09:00:00', '18:00:00', 8 * 3600, 1, 1)
+
+    with conn:
+        conn.execute("DELETE FROM attendance WHERE id = 1")
+    assert summary(conn)[0] == ('2025-06-09', first, 1, 0, '13:00:00', '18:00:00', 5 * 3600, 0, 1)
+    assert summary(conn) == rebuilt(conn)
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_moving_a_row_updates_both_days(conn, add_employees, storage):
+    first, second = add_employees(2)
+    with conn:
+        conn.executemany(app.attendance_write_sql(conn)['insert'], [
+            (first, '2025-06-09', '09:00:00', '17:00:00', 'Onsite'),
+            (first, '2025-06-10', '09:00:00', '17:00:00', 'Onsite'),
+        ])
+        conn.execute("UPDATE attendance SET employee_id = ? WHERE id = 1", (second,))
+        if storage == 'text':
+            conn.execute("UPDATE attendance SET date = '2025-06-11' WHERE id = 2")
+        else:
+            conn.execute("UPDATE attendance SET ts_in = ts_in + 86400, ts_out = ts_out + 86400 WHERE id = 2")
+    assert [(row[0], row[1]) for row in summary(conn)] == [('2025-06-09', second), ('2025-06-11', first)]
+    assert summary(conn) == rebuilt(conn)
+
+
+def test_rebuild_between_dates(conn, add_employees):
+    employee_id, = add_employees(1)
+    with conn:
+        conn.executemany(app.attendance_write_sql(conn)['insert'], [
+            (employee_id, day, '09:00:00', '17:00:00', 'Onsite') for day in ('2025-06-09', '2025-06-10', '2025-06-11')])
+        conn.execute("UPDATE daily_attendance_summary SET sessions = 99")
+        rebuild_daily_summary(conn, '2025-06-10', '2025-06-10')
+    assert [(row[0], row[2]) for row in summary(conn)] == [('2025-06-09', 99), ('2025-06-10', 1), ('2025-06-11', 99)]
@@ -0,0 +1,50 @@
+from datetime import date
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def today(conn, add_employees, add_attendance):
+    # Five employees: two out, one still in (remote), two not marked today
+    employee_ids = add_employees(5)
+    add_attendance(employee_ids[:2], days=3)
+    add_attendance(employee_ids[2:3], time_out=None, location='Remote')
+    return date.today().isoformat()
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_counters(conn, today, storage):
+    stats = app.query_dashboard_stats(conn, today)
+    assert {name: stats[name] for name in app.DASHBOARD_COUNTERS} == {
+        'total_employees': 5,
+        'employees_in_today': 1,
+        'employees_out_today': 2,
+        'employees_not_marked_today': 2,
+        'total_attendance_records': 7,
+        'onsite_count': 2,
+        'remote_count': 1,
+    }
+    recent = stats['recent_activities']
+    assert len(recent) == 7
+    assert (recent[0]['date'], recent[0]['location']) == (today, 'Remote')  # Latest id on a time_in tie
+    assert [(row['date'], row['time_in']) for row in recent] == sorted(
+        ((row['date'], row['time_in']) for row in recent), reverse=True)
+
+
+def test_cached_until_a_mark(client, conn, today):
+    assert app.get_dashboard_stats(conn, today)['employees_in_today'] == 1
+    with conn:
+        conn.execute(app.attendance_write_sql(conn)['insert'], (4, today, '10:00:00', None, 'Onsite'))
+    # Written behind the app's back: still the cached figure
+    assert app.get_dashboard_stats(conn, today)['employees_in_today'] == 1
+
+    client.post('/mark_in', data={'employee_id': '5', 'location': 'Onsite'})
+    assert app.get_dashboard_stats(conn, today)['employees_in_today'] == 3
+
+
+def test_dashboard_page(admin_client, today):
+    response = admin_client.get('/dashboard')
+    assert response.status_code == 200
+    assert b'data-counter="employees_in_today"' in response.data
@@ -0,0 +1,62 @@
+import pytest
+
+import app
+from directory import EmployeeDirectory
+
+
+def test_reloads_only_when_employees_change(conn, add_employees):
+    add_employees(2)
+    directory = EmployeeDirectory(check_interval=3600)
+    employees, etag = directory.snapshot(lambda: conn)
+    assert [employee['employee_id_text'] for employee in employees] == ['E001', 'E002']
+
+    add_employees(1)
+    assert directory.snapshot(lambda: conn)[1] == etag  # Not due for a check yet
+    directory.invalidate()
+    employees, new_etag = directory.snapshot(lambda: conn)
+    assert len(employees) == 3 and new_etag != etag
+
+    # A check that finds nothing changed doesn't reload
+    directory.invalidate()
+    assert directory.snapshot(lambda: conn)[1] == new_etag
+    assert directory.stats()['loads'] == 2
+
+
+@pytest.mark.parametrize('page', ['/', '/admin_dashboard'])
+def test_pages_revalidate_with_etags(admin_client, add_employees, page):
+    add_employees(2)
+    first = admin_client.get(page)
+    assert first.status_code == 200 and first.headers['ETag']
+
+    again = admin_client.get(page, headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == first.headers['ETag'] and not again.data
+
+    admin_client.post('/add_employee', data={'employee_id_text': 'E100', 'name': 'New Hire'}, follow_redirects=True)
+    changed = admin_client.get(page, headers={'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != first.headers['ETag']
+
+
+def test_kiosk_etag_ignores_check_ins_but_not_logging_in(client, add_employees):
+    employee_id, = add_employees(1)
+    page = client.get('/')
+    assert b'Employee 1 (E001)' in page.data
+    etag = page.headers['ETag']
+    client.post('/mark_in', data={'employee_id': employee_id, 'location': 'Onsite'})
+    client.get('/')  # Shows, and so clears, the flash message
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 304
+
+    with client.session_transaction() as session:
+        session['admin'] = True
+    assert client.get('/', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_changes_with_the_settings(client, add_employees, monkeypatch):
+    add_employees(1)
+    etag = client.get('/').headers['ETag']
+    monkeypatch.setattr(app, '_page_build_token', None)
+    monkeypatch.setattr(app, 'KIOSK_SELECT_MAX_EMPLOYEES', 0)
+    response = client.get('/', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert b'employee_search' in response.data
@@ -0,0 +1,79 @@
+import io
+import re
+
+import pytest
+
+from employee_import import ImportFileError, import_employees_csv
+
+
+def employees(conn):
+    return {row['employee_id_text']: tuple(row)[1:] for row in conn.execute(
+        "SELECT employee_id_text, name, department, job_title FROM employees")}
+
+
+def test_upserts_and_reports_bad_rows(conn, add_employees):
+    add_employees(2)  # E001 and E002
+    lines = io.StringIO(
+        "Employee ID,Name,Department,Job Title\n"
+        "E001,Employee 1,Sales,Clerk\n"       # Unchanged
+        "E002,Renamed,Sales,Manager\n"        # Updated
+        "\n"
+        "E003,New Starter,,\n"                # Inserted
+        ",No ID,Sales,Clerk\n"
+        "E004\n"
+        "E003,New Starter,Support,Agent\n"    # A repeat updates the earlier row
+    )
+    version = conn.execute("SELECT version FROM employees_version").fetchone()[0]
+    report = import_employees_csv(conn, lines, chunk_size=2)
+
+    assert {key: report[key] for key in ('rows', 'inserted', 'updated', 'unchanged', 'skipped')} == {
+        'rows': 6, 'inserted': 1, 'updated': 2, 'unchanged': 1, 'skipped': 2}
+    assert [(error['line'], error['employee_id_text']) for error in report['errors']] == [(6, None), (7, 'E004')]
+    assert employees(conn) == {'E001': ('Employee 1', 'Sales', 'Clerk'), 'E002': ('Renamed', 'Sales', 'Manager'),
+                               'E003': ('New Starter', 'Support', 'Agent')}
+    assert conn.execute("SELECT version FROM employees_version").fetchone()[0] == version + 3
+
+
+def test_header_aliases_and_precedence(conn, database):
+    # A column named exactly wins over an alias; "id" is not an alias
+    lines = io.StringIO("id,employee_id,employee_name,EMPLOYEE_ID_TEXT\n7,X1,Alias Name,E010\n")
+    import_employees_csv(conn, lines)
+    assert employees(conn) == {'E010': ('Alias Name', '', '')}
+
+
+@pytest.mark.parametrize('text, message', [
+    ('', 'The file is empty.'),
+    ('id,name\n1,Someone\n', 'Missing required column(s): employee_id_text'),
+])
+def test_unusable_files(conn, database, text, message):
+    with pytest.raises(ImportFileError, match=re.escape(message)):
+        import_employees_csv(conn, io.StringIO(text))
+
+
+def test_errors_are_truncated(conn, database):
+    lines = io.StringIO("employee_id,name\n" + ",Nobody\n" * 5)
+    report = import_employees_csv(conn, lines, max_errors=3)
+    assert (report['skipped'], len(report['errors']), report['errors_truncated']) == (5, 3, True)
+
+
+def test_import_api(admin_client, conn, database):
+    body = "\ufeffemployee_id,name\nE001,Streamed\n"  # Excel's byte-order mark is dropped
+    response = admin_client.post('/api/employees/import', data=body.encode('utf-8'), content_type='text/csv')
+    assert response.status_code == 200 and response.json['inserted'] == 1
+
+    upload = {'file': (io.BytesIO(b"employee_id,name\nE001,Uploaded\n"), 'staff.csv')}
+    response = admin_client.post('/api/employees/import', data=upload, content_type='multipart/form-data')
+    assert response.json['updated'] == 1
+    assert employees(conn)['E001'][0] == 'Uploaded'
+    assert b'Uploaded' in admin_client.get('/admin_dashboard').data
+
+    for data, content_type in [(b"name\nNo IDs\n", 'text/csv'), (b'{}', 'application/json')]:
+        response = admin_client.post('/api/employees/import', data=data, content_type=content_type)
+        assert response.status_code == 400 and 'error' in response.json
+
+
+def test_import_form(admin_client, database):
+    upload = {'file': (io.BytesIO(b"employee_id,name\nE001,Someone\n,Nobody\n"), 'staff.csv')}
+    response = admin_client.post('/import_employees', data=upload, follow_redirects=True)
+    assert b'Imported 2 rows: 1 added, 0 updated, 0 unchanged, 1 skipped.' in response.data
+    assert b'Line 3: Employee ID and Name are required.' in response.data
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+import app
+from events import EventBroadcaster, format_event
+
+
+def decode(frames):
+    """(id, topic, data) of each frame."""
+    events = []
+    for frame in frames:
+        fields = dict(line.split(': ', 1) for line in frame.decode('utf-8').strip().split('\n'))
+        events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@pytest.fixture
+def listen():
+    """listen(topics) subscribes to the app's broadcaster until the test ends."""
+    subscriptions = []
+    def listen(*topics):
+        subscription, _ = app.event_broadcaster.subscribe(topics)
+        subscriptions.append(subscription)
+        return subscription
+    yield listen
+    for subscription in subscriptions:
+        app.event_broadcaster.unsubscribe(subscription)
+
+
+def test_format_event():
+    assert format_event(7, 'presence', {'status': 'IN'}) == b'id: 7\nevent: presence\ndata: {"status":"IN"}\n\n'
+
+
+def test_publish_fans_out_by_topic():
+    broadcaster = EventBroadcaster()
+    presence, _ = broadcaster.subscribe({'presence'})
+    both, _ = broadcaster.subscribe({'presence', 'dashboard'})
+    broadcaster.publish('presence', {'n': 1})
+    broadcaster.publish('dashboard', {'n': 2})
+    assert decode(presence.wait(0)) == [(1, 'presence', {'n': 1})]
+    assert decode(both.drain()) == [(1, 'presence', {'n': 1}), (2, 'dashboard', {'n': 2})]
+    assert presence.wait(0) == []
+
+    broadcaster.unsubscribe(presence)
+    assert broadcaster.has_subscribers('dashboard')
+    assert broadcaster.stats()['subscribers'] == 1
+
+
+def test_slow_subscribers_are_dropped():
+    broadcaster = EventBroadcaster(max_pending=2)
+    slow, _ = broadcaster.subscribe({'presence'})
+    for n in range(3):
+        broadcaster.publish('presence', {'n': n})
+    assert slow.closed and slow.overflowed
+    assert broadcaster.stats()['dropped_slow_subscribers'] == 1
+
+
+def test_reconnects_resume_from_history():
+    broadcaster = EventBroadcaster(history=3)
+    for n in range(5):
+        broadcaster.publish('presence', {'n': n})
+    resumed, ok = broadcaster.subscribe({'presence'}, last_event_id=3)
+    assert ok and [event[0] for event in decode(resumed.drain())] == [4, 5]
+    # Event 2 has dropped out of the history: start from a snapshot instead
+    fresh, ok = broadcaster.subscribe({'presence'}, last_event_id=1)
+    assert not ok and fresh.drain() == []
+
+
+def test_connection_limit():
+    broadcaster = EventBroadcaster(max_subscribers=1)
+    broadcaster.subscribe({'presence'})
+    assert broadcaster.subscribe({'presence'}) == (None, False)
+    assert broadcaster.stats()['rejected_subscribers'] == 1
+
+
+def test_marks_publish_status_and_counter_changes(client, add_employees, listen):
+    employee_id = add_employees(2)[0]
+    presence, dashboard = listen('presence'), listen('dashboard')
+    app.dashboard_counters_snapshot(app.presence_index.today())
+
+    client.post('/mark_in', data={'employee_id': employee_id, 'location': 'Remote'})
+    assert [data for _, _, data in decode(presence.drain())] == [
+        {'type': 'status', 'employee_id': employee_id, 'status': 'IN'}]
+    (_, _, update), = decode(dashboard.drain())
+    assert update['delta'] == {'employees_in_today': 1, 'total_attendance_records': 1, 'remote_count': 1}
+    assert (update['counters']['employees_in_today'], update['counters']['employees_not_marked_today']) == (1, 1)
+
+
+def test_deltas_already_counted_by_a_rebuild_are_dropped(conn, add_employees, add_attendance, listen):
+    employee_ids = add_employees(2)
+    dashboard = listen('dashboard')
+    add_attendance(employee_ids[:1], time_out=None)
+    today = app.presence_index.today()
+    app.publish_dashboard_counters(conn, today)  # Rebuilt with the mark already in it
+    version = app._live_counters_versions['attendance']
+    dashboard.drain()
+
+    app.publish_dashboard_counters(delta={'employees_in_today': 1}, version=('attendance', version))
+    assert dashboard.drain() == []
+    app.publish_dashboard_counters(delta={'employees_in_today': 1}, version=('attendance', version + 1))
+    (_, _, update), = decode(dashboard.drain())
+    assert update['counters']['employees_in_today'] == 2
+
+
+def test_stream_starts_with_a_snapshot(client, add_employees, add_attendance):
+    employee_id, = add_employees(1)
+    add_attendance([employee_id], time_out=None)
+    response = client.get('/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    first = next(response.response)
+    response.close()
+    assert first.startswith(b'retry: 3000\n\n')
+    (_, topic, data), = decode([first[len(b'retry: 3000\n\n'):]])
+    assert (topic, data['type'], data['statuses']) == ('presence', 'snapshot', {str(employee_id): 'IN'})
+
+
+@pytest.mark.parametrize('query, status', [('topics=weather', 400), ('topics=dashboard', 403)])
+def test_stream_arguments(client, database, query, status):
+    assert client.get(f'/events?{query}').status_code == status
+
+
+@pytest.mark.parametrize('live_events', [True, False])
+def test_pages_open_the_stream_only_when_enabled(admin_client, monkeypatch, live_events):
+    monkeypatch.setattr(app, 'LIVE_EVENTS', live_events)
+    monkeypatch.setattr(app, '_page_build_token', None)
+    dashboard = admin_client.get('/dashboard').data
+    assert (b"new EventSource('/events?topics=dashboard')" in dashboard) == live_events
+    with admin_client.session_transaction() as session:
+        del session['admin']
+    kiosk = admin_client.get('/').data
+    assert f'if ({str(live_events).lower()} && window.EventSource)'.encode() in kiosk
@@ -0,0 +1,65 @@
+import csv
+import gzip
+import io
+from datetime import date, timedelta
+
+import pytest
+
+HEADER = ["Employee ID", "Employee Name", "Date", "Time In", "Time Out", "Location"]
+
+
+def exported_rows(response):
+    assert response.status_code == 200
+    return list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+
+
+@pytest.fixture
+def history(conn, add_employees, add_attendance):
+    employee_ids = add_employees(2)
+    conn.execute("UPDATE employees SET name = 'Doe, \"JJ\"' WHERE id = ?", (employee_ids[1],))
+    conn.commit()
+    add_attendance(employee_ids, days=3)
+    add_attendance(employee_ids[:1], time_in='18:00:00', time_out=None)
+    return employee_ids
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_exports_every_row_newest_first(admin_client, history, storage):
+    rows = exported_rows(admin_client.get('/export_csv'))
+    assert rows[0] == HEADER
+    assert len(rows) == 1 + 2 * 3 + 1
+    assert rows[1][2:5] == [date.today().isoformat(), '18:00:00', 'N/A']
+    assert [row[2] for row in rows[1:]] == sorted((row[2] for row in rows[1:]), reverse=True)
+    assert ['E002', 'Doe, "JJ"'] in [row[:2] for row in rows]
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_filters(admin_client, history, storage):
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    rows = exported_rows(admin_client.get('/export_csv', query_string={
+        'start_date': yesterday, 'end_date': yesterday, 'employee_id_filter': history[1]}))
+    assert rows[1:] == [['E002', 'Doe, "JJ"', yesterday, '09:00:00', '17:00:00', 'Onsite']]
+
+
+def test_gzip_flag(admin_client, history):
+    plain = admin_client.get('/export_csv').get_data()
+    compressed = admin_client.get('/export_csv?gzip=1')
+    assert compressed.mimetype == 'application/gzip'
+    assert gzip.decompress(compressed.get_data()) == plain
+    for value in ('0', 'false', 'no'):
+        response = admin_client.get(f'/export_csv?gzip={value}')
+        assert response.mimetype == 'text/csv'
+        assert response.get_data() == plain
+
+
+@pytest.mark.parametrize('query', ['gzip=maybe', 'employee_id_filter=abc'])
+def test_invalid_arguments_go_back_to_records(admin_client, history, query):
+    response = admin_client.get(f'/export_csv?{query}')
+    assert response.status_code == 302
+    assert response.headers['Location'].startswith('/records')
+
+
+def test_needs_admin(client):
+    response = client.get('/export_csv')
+    assert response.status_code == 302
+    assert response.headers['Location'].startswith('/login')
@@ -0,0 +1,85 @@
+import os
+import zlib
+from functools import partial
+
+import pytest
+
+import app
+from db import ConnectionPool
+from instrumentation import InstrumentedConnection, Metrics, RequestProfiler, fingerprint
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = Metrics()
+    monkeypatch.setattr(app, 'request_metrics', metrics)
+    return metrics
+
+
+def test_fingerprint():
+    assert fingerprint("""
+        SELECT * FROM attendance  -- today's rows
+        WHERE date = '2025-06-09' AND employee_id IN (?, ?, ?) LIMIT 50;
+    """) == "SELECT * FROM attendance WHERE date = ? AND employee_id IN (...) LIMIT ?"
+    assert fingerprint("SELECT 'it''s' /* quoted */, x1 FROM t") == "SELECT ? , x1 FROM t"
+
+
+def test_queries_are_timed_by_fingerprint(database, add_employees):
+    add_employees(3)
+    metrics = Metrics()
+    pool = ConnectionPool(database, factory=partial(InstrumentedConnection, metrics=metrics))
+    conn = pool.acquire()
+    try:
+        for employee_id in (1, 2):
+            conn.execute(f"SELECT name FROM employees WHERE id = {employee_id}").fetchall()
+        assert len(list(conn.execute("SELECT * FROM employees"))) == 3
+    finally:
+        pool.release(conn)
+        pool.close_all()
+
+    lines = metrics.render().splitlines()
+    counts = {line.split('query="', 1)[1].split('"', 1)[0]: line.rsplit(' ', 1)[1]
+              for line in lines if line.startswith('attendance_db_query_rows_total{')}
+    assert (counts['SELECT name FROM employees WHERE id = ?'], counts['SELECT * FROM employees']) == ('2', '3')
+    assert 'attendance_db_query_duration_seconds_count{query_id="%08x",query="SELECT * FROM employees"} 1' % (
+        zlib.crc32(b'SELECT * FROM employees')) in lines
+
+
+def test_distinct_queries_are_capped():
+    metrics = Metrics(max_queries=2)
+    for n in range(4):
+        metrics.observe_query(f"SELECT * FROM table_{n}", 0.001, 1)
+    assert metrics.render().count('attendance_db_query_rows_total{') == 3
+    assert 'attendance_db_query_rows_total{query_id="other",query="other"} 2' in metrics.render()
+
+
+def test_requests_and_templates_are_timed(admin_client, metrics, add_employees):
+    add_employees(1)
+    # Requests are recorded once their response has been sent and closed
+    admin_client.get('/admin_dashboard').close()
+    admin_client.get('/no-such-page').close()
+    text = metrics.render()
+    assert 'attendance_http_request_duration_seconds_count{endpoint="admin_dashboard",method="GET",status="200"} 1' in text
+    assert 'endpoint="unmatched",method="GET",status="404"' in text
+    assert 'attendance_template_render_duration_seconds_count{template="admin_dashboard.html"} 1' in text
+
+
+def test_metrics_endpoint_access(client, database, metrics, monkeypatch):
+    monkeypatch.setattr(app, 'METRICS_TOKEN', 'secret')
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    assert '# TYPE attendance_http_request_duration_seconds histogram' in response.get_data(as_text=True)
+
+    monkeypatch.setattr(app, 'request_metrics', None)
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 404
+
+
+def test_sampled_requests_are_profiled(client, database, tmp_path, monkeypatch):
+    profiler = RequestProfiler(str(tmp_path / 'profiles'), sample_rate=1.0)
+    monkeypatch.setattr(app, 'request_profiler', profiler)
+    client.get('/get_attendance_status/1').close()
+    assert profiler.profiled == 1
+    name, = os.listdir(tmp_path / 'profiles')
+    assert '-get_attendance_status-' in name and name.endswith('ms.prof')
@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+import app
+from db import attendance_storage, migrate_to_integer_timestamps
+
+ROWS_SQL = "SELECT id, employee_id, date, time_in, time_out, location FROM attendance ORDER BY id"
+SUMMARY_SQL = "SELECT * FROM daily_attendance_summary ORDER BY employee_id, date"
+
+
+def snapshot(conn):
+    return [tuple(row) for row in conn.execute(ROWS_SQL)], [tuple(row) for row in conn.execute(SUMMARY_SQL)]
+
+
+def test_converts_every_row_exactly(conn, add_employees, add_attendance):
+    employee_ids = add_employees(3)
+    add_attendance(employee_ids, days=5)
+    add_attendance(employee_ids[:1], time_in='23:59:59', time_out=None, location='Remote')
+    with conn:
+        conn.execute("DELETE FROM attendance WHERE id = 2")
+    before = snapshot(conn)
+
+    progress = []
+    assert migrate_to_integer_timestamps(conn, batch_size=4, progress=progress.append) == 15
+    assert progress == [4, 8, 12, 15]
+    assert attendance_storage(conn) == 'integer'
+    assert snapshot(conn) == before
+    assert migrate_to_integer_timestamps(conn) == 0  # Already done
+
+
+def test_writes_during_the_copy_are_kept(conn, add_employees, add_attendance):
+    employee_ids = add_employees(2)
+    add_attendance(employee_ids, days=3)
+    other = app.db_pool.acquire()
+    today = date.today().isoformat()
+
+    def write_meanwhile(copied):
+        # Another worker changes rows on both sides of the copy's progress
+        with other:
+            if copied == 2:
+                other.execute("UPDATE attendance SET location = 'Remote' WHERE id IN (1, 6)")
+                other.execute("DELETE FROM attendance WHERE id = 5")
+                other.execute("INSERT INTO attendance (employee_id, date, time_in, location) "
+                              "VALUES (?, ?, '18:00:00', 'Onsite')", (employee_ids[0], today))
+    try:
+        migrate_to_integer_timestamps(conn, batch_size=2, progress=write_meanwhile)
+    finally:
+        app.db_pool.release(other)
+
+    rows = {row['id']: row for row in conn.execute(ROWS_SQL)}
+    assert sorted(rows) == [1, 2, 3, 4, 6, 7]
+    assert (rows[1]['location'], rows[6]['location']) == ('Remote', 'Remote')
+    assert (rows[7]['date'], rows[7]['time_in'], rows[7]['time_out']) == (today, '18:00:00', None)
+
+
+def test_refuses_rows_it_cannot_convert(conn, add_employees, add_attendance):
+    employee_id, = add_employees(1)
+    add_attendance([employee_id])
+    with conn:
+        conn.execute("INSERT INTO attendance (employee_id, date, time_in, location) "
+                     "VALUES (?, '9/6/2025', '9am', 'Onsite')", (employee_id,))
+    with pytest.raises(ValueError, match='1 attendance rows'):
+        migrate_to_integer_timestamps(conn)
+    assert attendance_storage(conn) == 'text'
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'attendance_int'").fetchone()
+
+
+@pytest.mark.parametrize('storage', ['integer'])
+def test_app_keeps_working_after_migrating(client, conn, add_employees, storage):
+    employee_id, = add_employees(1)
+    client.post('/mark_in', data={'employee_id': employee_id, 'location': 'Onsite'})
+    client.post('/mark_out', data={'employee_id': employee_id})
+    row = conn.execute("SELECT date, time_in, time_out, ts_in, ts_out FROM attendance").fetchone()
+    assert row['date'] == date.today().isoformat()
+    assert row['ts_out'] >= row['ts_in'] and row['time_out'] >= row['time_in']
+    assert client.get(f'/get_attendance_status/{employee_id}').json['status'] == 'OUT'
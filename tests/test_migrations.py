@@ -0,0 +1,64 @@
+import sqlite3
+
+import pytest
+
+from db import (ATTENDANCE_INDEXES, MIGRATIONS, SCHEMA_VERSION, daily_summary_triggers, migrate,
+                schema_version)
+
+
+def attendance_indexes(conn):
+    return {row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'attendance' AND sql IS NOT NULL")}
+
+
+def test_new_database_is_fully_migrated(conn):
+    assert schema_version(conn) == SCHEMA_VERSION
+    assert migrate(conn) == []
+    assert attendance_indexes(conn) == {
+        'idx_attendance_employee_date_out', 'idx_attendance_date_location', 'idx_attendance_date_time_in'}
+
+
+def test_migrations_rerun_from_version_zero(conn, add_employees):
+    employee_id, = add_employees(1)
+    with conn:
+        conn.execute("INSERT INTO attendance (employee_id, date, time_in, time_out, location) "
+                     "VALUES (?, '2024-01-02', '09:00:00', '', 'Onsite')", (employee_id,))
+        conn.execute("PRAGMA user_version = 0")
+
+    assert migrate(conn) == [version for version, _, _ in MIGRATIONS]
+    assert conn.execute("SELECT time_out FROM attendance").fetchone()[0] is None
+    assert dict(conn.execute("SELECT table_name, row_count FROM table_row_counts").fetchall()) == {
+        'employees': 1, 'attendance': 1}
+    assert tuple(conn.execute("SELECT sessions, open_sessions FROM daily_attendance_summary").fetchone()) == (1, 1)
+
+
+def test_failed_migration_is_rolled_back(conn):
+    broken = MIGRATIONS + [(SCHEMA_VERSION + 1, "Broken", [
+        "CREATE TABLE half_done (id INTEGER)",
+        "CREATE TABLE half_done (id INTEGER)",
+    ])]
+    with pytest.raises(sqlite3.OperationalError):
+        migrate(conn, broken)
+    assert schema_version(conn) == SCHEMA_VERSION
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone()
+
+
+@pytest.mark.parametrize('storage', ['integer'])
+def test_integer_table_indexed_on_timestamps_after_upgrade(conn, storage):
+    # What an older migrate_to_integer_timestamps() left behind: indexes over the
+    # virtual date/time columns, and summary triggers keyed on the virtual date
+    with conn:
+        for name in attendance_indexes(conn):
+            conn.execute(f"DROP INDEX {name}")
+        for statement in ATTENDANCE_INDEXES:
+            conn.execute(statement)
+        for trigger in ('insert', 'update', 'delete'):
+            conn.execute(f"DROP TRIGGER trg_daily_summary_{trigger}")
+        for statement in daily_summary_triggers('text'):
+            conn.execute(statement)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION - 1}")
+
+    assert migrate(conn) == [SCHEMA_VERSION]
+    assert attendance_indexes(conn) == {'idx_attendance_employee_ts_in', 'idx_attendance_ts_in'}
+    trigger = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'trg_daily_summary_insert'").fetchone()[0]
+    assert 'a.ts_in >=' in trigger
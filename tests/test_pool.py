@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+import app
+from db import DEFAULT_PRAGMAS, ConnectionPool, parse_pragmas
+
+
+@pytest.fixture
+def pool(database):
+    pool = ConnectionPool(database, max_size=2, timeout=0.05)
+    yield pool
+    pool.close_all()
+
+
+def test_connections_are_configured_and_reused(pool):
+    conn = pool.acquire()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == DEFAULT_PRAGMAS['busy_timeout']
+    pool.release(conn)
+
+    assert pool.acquire() is conn
+    stats = pool.stats()
+    assert (stats['hits'], stats['misses'], stats['open_connections']) == (1, 1, 1)
+
+
+def test_release_rolls_back_an_open_transaction(pool):
+    conn = pool.acquire()
+    conn.execute("BEGIN")
+    conn.execute("INSERT INTO employees (employee_id_text, name) VALUES ('E1', 'Left open')")
+    pool.release(conn)
+
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM employees").fetchone()[0] == 0
+
+
+def test_exhausted_pool_times_out(pool):
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(sqlite3.OperationalError, match='Timed out'):
+        pool.acquire()
+    assert pool.stats()['waits'] == 1
+    pool.release(held.pop())
+    assert pool.acquire() is not None
+
+
+def test_parse_pragmas():
+    pragmas = parse_pragmas(' cache_size=-64000, synchronous = FULL ')
+    assert pragmas == dict(DEFAULT_PRAGMAS, cache_size=-64000, synchronous='FULL')
+    with pytest.raises(ValueError):
+        parse_pragmas('cache_size')
+
+
+def test_requests_return_their_connection(client):
+    for _ in range(3):
+        assert client.get('/get_attendance_status/1').status_code == 200
+    stats = app.db_pool.stats()
+    assert stats['idle_connections'] == stats['open_connections']
+    assert stats['hits'] >= 2
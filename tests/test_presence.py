@@ -0,0 +1,52 @@
+from datetime import date
+
+import pytest
+
+import app
+from presence import STATUS_IN, STATUS_NONE, STATUS_OUT, PresenceIndex
+
+
+def status(client, employee_id):
+    response = client.get(f'/get_attendance_status/{employee_id}')
+    assert response.status_code == 200
+    return response.json['status']
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_mark_in_and_out(client, conn, add_employees, storage):
+    employee_id, = add_employees(1)
+    assert status(client, employee_id) == STATUS_NONE
+
+    client.post('/mark_in', data={'employee_id': employee_id, 'location': 'Onsite'})
+    assert status(client, employee_id) == STATUS_IN
+    client.post('/mark_in', data={'employee_id': employee_id, 'location': 'Onsite'})  # Refused
+    client.post('/mark_out', data={'employee_id': employee_id})
+    assert status(client, employee_id) == STATUS_OUT
+
+    rows = conn.execute("SELECT time_out FROM attendance WHERE employee_id = ?", (employee_id,)).fetchall()
+    assert len(rows) == 1 and rows[0]['time_out'] is not None
+
+
+def test_picks_up_other_processes_writes(conn, add_employees):
+    employee_id, = add_employees(1)
+    index = PresenceIndex(check_interval=3600)
+    index.load(conn)
+    with conn:
+        conn.execute(app.attendance_write_sql(conn)['insert'],
+                     (employee_id, date.today().isoformat(), '09:00:00', None, 'Onsite'))
+
+    index.sync(lambda: conn)  # Not due yet: SQLite isn't consulted
+    assert index.status(employee_id) == STATUS_NONE
+    index.sync(lambda: conn, force=True)
+    assert index.status(employee_id) == STATUS_IN
+    assert index.open_record_id(employee_id) == conn.execute("SELECT MAX(id) FROM attendance").fetchone()[0]
+
+
+def test_ignores_other_days(conn, add_employees, add_attendance):
+    employee_ids = add_employees(2)
+    add_attendance(employee_ids[:1], days=2, time_out=None)
+    with conn:
+        conn.execute("DELETE FROM attendance WHERE date = ?", (date.today().isoformat(),))
+    index = PresenceIndex()
+    index.load(conn)
+    assert index.statuses() == (date.today().isoformat(), {})
@@ -0,0 +1,100 @@
+"""EXPLAIN QUERY PLAN for the hot-path SQL the app actually runs.
+
+Each query must reach attendance (and daily_attendance_summary) through an
+index, never by a full table scan, with both timestamp storages. The SQL is
+taken from the app's own constants, or captured from the function that
+builds it, so a change to a query is checked as it ships.
+"""
+import re
+from datetime import date, timedelta
+
+import pytest
+
+import app
+from db import attendance_storage, attendance_write_sql
+from presence import LOAD_QUERY
+from reports import employee_sessions
+
+EMPLOYEES = 20
+DAYS = 10
+
+# "SCAN <table or alias>" without "USING ... INDEX" reads every row
+FULL_SCAN = re.compile(r"^SCAN (attendance|a|daily_attendance_summary|s)$", re.I)
+# An attendance index on the virtual date/time columns
+VIRTUAL_COLUMN_SEARCH = re.compile(r"^(SEARCH|SCAN) (attendance|a) .*\((date|time_in|time_out)\b", re.I)
+
+
+pytestmark = pytest.mark.parametrize('storage', ['text', 'integer'])
+
+
+@pytest.fixture(autouse=True)
+def history(conn, storage, add_employees, add_attendance):
+    add_attendance(add_employees(EMPLOYEES), days=DAYS)
+    assert attendance_storage(conn) == storage
+
+
+def query_plan(conn, sql, params=()):
+    return [row['detail'] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def assert_indexed(conn, sql, params=(), sorted_by_index=False):
+    plan = query_plan(conn, sql, params)
+    assert not [step for step in plan if FULL_SCAN.match(step)], plan
+    if attendance_storage(conn) == 'integer':
+        # Only the stored timestamps of attendance are indexed in the integer format
+        assert not [step for step in plan if VIRTUAL_COLUMN_SEARCH.match(step)], plan
+    if sorted_by_index:
+        # A LIMITed newest-first read must walk an index, not sort the whole table
+        assert not [step for step in plan if step.startswith('USE TEMP B-TREE FOR ORDER BY')], plan
+
+
+def traced(conn, func):
+    # The statements func() runs, with their parameters filled in
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        func()
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in statements if re.search(r'\battendance\b', sql)]
+
+
+def test_presence_load(conn):
+    assert_indexed(conn, LOAD_QUERY[attendance_storage(conn)], {'date': date.today().isoformat()},
+                   sorted_by_index=True)
+
+
+def test_dashboard_stats(conn):
+    assert_indexed(conn, app.DASHBOARD_STATS_QUERY[attendance_storage(conn)], {'date': date.today().isoformat()})
+
+
+def test_dashboard_recent_activity(conn):
+    assert_indexed(conn, app.DASHBOARD_RECENT_QUERY[attendance_storage(conn)], sorted_by_index=True)
+
+
+def test_dashboard_trend(conn):
+    today = date.today().isoformat()
+    assert_indexed(conn, app.DASHBOARD_TREND_QUERY, (today, '-29 days', today))
+
+
+def test_mark_out_close(conn):
+    # mark_out finds the open row in the presence index and closes it by id
+    assert_indexed(conn, attendance_write_sql(conn)['close'], ('17:00:00', 1))
+
+
+def test_employee_sessions(conn):
+    statements = traced(conn, lambda: employee_sessions(conn, 1, app.attendance_archive))
+    assert statements
+    for sql in statements:
+        assert_indexed(conn, sql)
+
+
+def test_records_pages(conn):
+    first_page, cursor, _ = app.fetch_records_page(conn, {'page_size': '5'})
+    assert cursor
+    statements = traced(conn, lambda: app.fetch_records_page(conn, {'page_size': '5', 'cursor': cursor}))
+    statements += traced(conn, lambda: app.fetch_records_page(
+        conn, {'page_size': '5', 'start_date': (date.today() - timedelta(days=3)).isoformat()}))
+    assert statements
+    for sql in statements:
+        assert_indexed(conn, sql, sorted_by_index=True)
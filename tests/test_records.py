@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def history(add_employees, add_attendance):
+    employee_ids = add_employees(3)
+    add_attendance(employee_ids, days=4)
+    add_attendance(employee_ids[:2], time_in='18:00:00', time_out='19:00:00')
+    return employee_ids
+
+
+def all_pages(client, **args):
+    records, cursor, pages = [], None, 0
+    while True:
+        response = client.get('/api/records', query_string=dict(args, **({'cursor': cursor} if cursor else {})))
+        assert response.status_code == 200
+        records += response.json['records']
+        cursor = response.json['next_cursor']
+        pages += 1
+        if not cursor:
+            return records, pages
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_pages_cover_every_row_once_newest_first(admin_client, history, storage):
+    records, pages = all_pages(admin_client, page_size=5)
+    assert len(records) == 3 * 4 + 2
+    assert pages == 3
+    assert len({record['id'] for record in records}) == len(records)
+    keys = [(record['date'], record['time_in'], record['id']) for record in records]
+    assert keys == sorted(keys, reverse=True)
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_filters_apply_on_every_page(admin_client, history, storage):
+    start = (date.today() - timedelta(days=2)).isoformat()
+    end = (date.today() - timedelta(days=1)).isoformat()
+    records, _ = all_pages(admin_client, page_size=1, start_date=start, end_date=end,
+                           employee_id_filter=history[0])
+    assert [record['date'] for record in records] == [end, start]
+    assert {record['employee_id_text'] for record in records} == {'E001'}
+
+
+def test_page_size_is_clamped(admin_client, history, monkeypatch):
+    monkeypatch.setattr(app, 'RECORDS_MAX_PAGE_SIZE', 4)
+    sizes = {size: len(admin_client.get('/api/records', query_string={'page_size': size}).json['records'])
+             for size in ('0', '3', '100', 'lots')}
+    assert sizes == {'0': 1, '3': 3, '100': 4, 'lots': 4}
+
+
+@pytest.mark.parametrize('query', [{'cursor': 'not-a-cursor'}, {'employee_id_filter': 'abc'}])
+def test_bad_arguments_are_rejected(admin_client, history, query):
+    response = admin_client.get('/api/records', query_string=query)
+    assert response.status_code == 400
+    assert 'error' in response.json
+
+
+def test_records_page(admin_client, history):
+    response = admin_client.get('/records', query_string={'page_size': 2})
+    assert response.status_code == 200
+    assert b'cursor=' in response.data
+    response = admin_client.get('/records', query_string={'cursor': 'not-a-cursor'})
+    assert response.status_code == 302
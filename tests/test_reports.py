@@ -0,0 +1,76 @@
+import pytest
+
+import app
+from reports import attendance_summary, employee_sessions
+
+
+@pytest.fixture
+def week(conn, add_employees):
+    """Three employees over Mon 9 - Tue 10 June 2025; the third has no department."""
+    alice, bob = add_employees(2)
+    carol, = add_employees(1, department=None)
+    rows = [
+        (alice, '2025-06-09', '09:00:00', '12:00:00', 'Onsite'),
+        (alice, '2025-06-09', '13:00:00', '18:30:00', 'Onsite'),  # 8.5 hours that day
+        (alice, '2025-06-10', '09:30:00', '17:30:00', 'Remote'),  # Late
+        (bob, '2025-06-10', '08:00:00', '16:00:00', 'Onsite'),
+        (bob, '2025-06-11', '08:00:00', None, 'Onsite'),           # Still open
+        (carol, '2025-06-09', '10:00:00', '11:00:00', 'Onsite'),
+    ]
+    with conn:
+        conn.executemany(app.attendance_write_sql(conn)['insert'], rows)
+        # '' and NULL are the same "Unassigned" department
+        conn.execute("UPDATE employees SET department = '' WHERE id = ?", (bob,))
+    return alice, bob, carol
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_employee_sessions(conn, week, storage):
+    alice, bob, _ = week
+    sessions = employee_sessions(conn, alice)
+    assert [(s['date'], s['time_in'], s['duration_minutes']) for s in sessions] == [
+        ('2025-06-10', '09:30:00', 480), ('2025-06-09', '13:00:00', 330), ('2025-06-09', '09:00:00', 180)]
+    assert employee_sessions(conn, bob)[0]['duration_minutes'] is None
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_summary_per_employee_and_day(conn, week, storage):
+    alice, bob, carol = week
+    summary = attendance_summary(conn, '2025-06-09', '2025-06-10', period='day',
+                                 workday_seconds=8 * 3600, late_after='09:15:00')
+    rows = {(row['employee_id'], row['period']): row for row in summary}
+    assert set(rows) == {(alice, '2025-06-09'), (alice, '2025-06-10'), (bob, '2025-06-10'), (carol, '2025-06-09')}
+    monday = rows[(alice, '2025-06-09')]
+    assert (monday['sessions'], monday['worked_hours'], monday['overtime_hours'], monday['late_arrivals']) == (2, 8.5, 0.5, 0)
+    assert rows[(alice, '2025-06-10')]['late_arrivals'] == 1
+    assert [row['period'] for row in summary] == sorted(row['period'] for row in summary)
+
+
+def test_summary_per_department_and_week(conn, week):
+    summary = attendance_summary(conn, '2025-06-01', '2025-06-30', period='week', group_by='department')
+    assert [(row['department'], row['period'], row['employees'], row['days_present']) for row in summary] == [
+        ('Sales', '2025-06-09', 1, 2), ('Unassigned', '2025-06-09', 2, 3)]
+    unassigned = attendance_summary(conn, '2025-06-01', '2025-06-30', department='Unassigned')
+    assert {row['employee_id'] for row in unassigned} == set(week[1:])
+
+
+def test_reports_api(admin_client, week):
+    response = admin_client.get('/api/reports/attendance', query_string={
+        'start_date': '2025-06-01', 'end_date': '2025-06-30', 'employee_id': week[0]})
+    assert response.status_code == 200
+    assert [(row['period'], row['days_present'], row['worked_hours']) for row in response.json['summary']] == [
+        ('2025-06', 2, 16.5)]
+
+    for query in ({'start_date': '9 June'}, {'period': 'year'}, {'group_by': 'team'}, {'employee_id': 'x'}):
+        response = admin_client.get('/api/reports/attendance', query_string=query)
+        assert response.status_code == 400
+        assert 'error' in response.json
+
+
+def test_reports_pages(admin_client, week):
+    response = admin_client.get('/reports', query_string={'start_date': '2025-06-01', 'end_date': '2025-06-30',
+                                                          'group_by': 'department'})
+    assert response.status_code == 200
+    assert b'Unassigned' in response.data
+    assert admin_client.get('/reports?period=year').status_code == 302
+    assert admin_client.get(f'/employee_report/{week[0]}').status_code == 200
@@ -0,0 +1,66 @@
+import pytest
+
+from directory import search_employees, search_query
+
+
+@pytest.fixture
+def staff(conn, database):
+    with conn:
+        conn.executemany("INSERT INTO employees (employee_id_text, name, department, job_title) VALUES (?, ?, ?, ?)", [
+            ('E100', 'Zoë Martin', 'Engineering', 'Developer'),
+            ('E101', 'Martina Lopez', 'Sales', 'Account Manager'),
+            ('E102', 'Sam Engel', 'Support', 'Agent'),
+            ('E10', 'Ann Other', 'Finance', 'Controller'),
+        ])
+    return {row['employee_id_text']: row['id'] for row in conn.execute("SELECT id, employee_id_text FROM employees")}
+
+
+def names(matches):
+    return [match['name'] for match in matches]
+
+
+def test_search_query():
+    assert search_query('  mar  "lo*"') == '"mar"* "lo"*'
+    assert search_query('-- * --') is None
+
+
+def test_every_word_is_a_prefix(conn, staff):
+    assert names(search_employees(conn, 'mart')) == ['Zoë Martin', 'Martina Lopez']  # Surname match ranks first
+    assert names(search_employees(conn, 'mart lo')) == ['Martina Lopez']
+    assert names(search_employees(conn, 'zoe')) == ['Zoë Martin']  # Diacritics are ignored
+    assert names(search_employees(conn, 'eng')) == ['Sam Engel', 'Zoë Martin']  # Name outweighs department
+    assert search_employees(conn, 'nobody') == []
+    assert search_employees(conn, '') == []
+
+
+def test_exact_employee_id_comes_first(conn, staff):
+    matches = search_employees(conn, 'e10')
+    assert [match['employee_id_text'] for match in matches][0] == 'E10'
+    assert sorted(match['employee_id_text'] for match in matches[1:]) == ['E100', 'E101', 'E102']
+    assert [match['employee_id_text'] for match in search_employees(conn, 'E10', limit=2)][0] == 'E10'
+    assert len(search_employees(conn, 'e10', limit=2)) == 2
+
+
+def test_index_follows_every_write(conn, staff):
+    with conn:
+        conn.execute("UPDATE employees SET name = 'Sam Engelbrecht', department = 'Finance' WHERE id = ?",
+                     (staff['E102'],))
+        conn.execute("DELETE FROM employees WHERE id = ?", (staff['E100'],))
+    assert names(search_employees(conn, 'engelb')) == ['Sam Engelbrecht']
+    assert names(search_employees(conn, 'finance')) == ['Ann Other', 'Sam Engelbrecht']
+    assert search_employees(conn, 'zoe') == []
+    conn.execute("INSERT INTO employees_fts (employees_fts) VALUES ('integrity-check')")  # Raises if out of step
+
+
+def test_search_api(client, staff):
+    response = client.get('/api/employees/search', query_string={'q': 'mart'})
+    assert response.status_code == 200
+    assert response.json['employees'][0] == {'id': staff['E100'], 'employee_id_text': 'E100', 'name': 'Zoë Martin'}
+
+    with client.session_transaction() as session:
+        session['admin'] = True
+    assert client.get('/api/employees/search?q=mart').json['employees'][0]['department'] == 'Engineering'
+
+    for limit in ('0', '51', 'ten'):
+        response = client.get('/api/employees/search', query_string={'q': 'mart', 'limit': limit})
+        assert response.status_code == 400 and 'error' in response.json
@@ -0,0 +1,77 @@
+import json
+from datetime import date
+
+import pytest
+
+import app
+from writebehind import JournalLocked, WriteBehindQueue
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / 'attendance.journal')
+
+
+def sessions(conn):
+    return [tuple(row) for row in conn.execute("SELECT employee_id, time_in, time_out FROM attendance ORDER BY id")]
+
+
+@pytest.mark.parametrize('storage', ['text', 'integer'])
+def test_stop_writes_everything_queued(conn, add_employees, journal, storage):
+    employee_id, = add_employees(1)
+    today = date.today().isoformat()
+    flushed = []
+    queue = WriteBehindQueue(journal, app.db_pool, flush_interval=3600, on_flush=flushed.extend)
+    queue.start()
+    queue.submit(employee_id, 'in', today, '09:00:00', 'Onsite')
+    queue.submit(employee_id, 'out', today, '12:00:00')
+    queue.submit(employee_id, 'in', today, '13:00:00', 'Onsite')
+    assert [event['seq'] for event in queue.pending_events()] == [1, 2, 3]
+    assert sessions(conn) == []
+
+    queue.stop()
+    assert sessions(conn) == [(employee_id, '09:00:00', '12:00:00'), (employee_id, '13:00:00', None)]
+    assert len(flushed) == 3
+    assert queue.stats()['queue_depth'] == 0
+    with open(journal) as journal_file:
+        assert journal_file.read() == ''
+
+
+def test_replays_only_what_was_never_written(conn, add_employees, journal):
+    employee_id, = add_employees(1)
+    today = date.today().isoformat()
+    # What a crash leaves behind: three acknowledged events, the first two committed,
+    # and a torn last line that was never acknowledged
+    events = [{'seq': seq, 'employee_id': employee_id, 'action': action, 'date': today,
+               'time': time_of_day, 'location': 'Onsite' if action == 'in' else None}
+              for seq, action, time_of_day in [(1, 'in', '09:00:00'), (2, 'out', '12:00:00'), (3, 'in', '13:00:00')]]
+    with open(journal, 'w') as journal_file:
+        journal_file.writelines(json.dumps(event) + '\n' for event in events)
+        journal_file.write('{"seq": 4, "empl')
+    with conn:
+        conn.execute(app.attendance_write_sql(conn)['insert'], (employee_id, today, '09:00:00', '12:00:00', 'Onsite'))
+        conn.execute("INSERT INTO writebehind_journal (journal, last_seq) VALUES (?, 2)", (journal,))
+
+    queue = WriteBehindQueue(journal, app.db_pool, flush_interval=3600)
+    queue.start()
+    assert [event['seq'] for event in queue.pending_events()] == [3]
+    assert queue.stats()['replayed_on_startup'] == 1
+    assert queue.submit(employee_id, 'out', today, '17:00:00') == 4  # Numbering carries on
+    queue.stop()
+
+    assert sessions(conn) == [(employee_id, '09:00:00', '12:00:00'), (employee_id, '13:00:00', '17:00:00')]
+    assert conn.execute("SELECT last_seq FROM writebehind_journal").fetchone()[0] == 4
+
+
+def test_one_writer_per_journal(database, journal):
+    queue = WriteBehindQueue(journal, app.db_pool, flush_interval=3600)
+    queue.start()
+    try:
+        with pytest.raises(JournalLocked):
+            WriteBehindQueue(journal, app.db_pool).start()
+    finally:
+        queue.stop()
+    # Released on stop
+    queue = WriteBehindQueue(journal, app.db_pool, flush_interval=3600)
+    queue.start()
+    queue.stop()
@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from db import ATTENDANCE_READ_SQL, attendance_write_sql, current_attendance_storage
+
+logger = logging.getLogger(__name__)
+
+
+class JournalLocked(RuntimeError):
+    """Another process is already writing behind through this journal file."""
+
+
+class WriteBehindQueue:
+    """Acknowledge attendance events immediately and write them to SQLite in groups.
+
+    submit() appends the event to a local journal file (fsync'd by default) and
+    returns; a background thread applies everything queued in one transaction
+    every ``flush_interval`` seconds, or sooner once ``max_batch`` events are
+    waiting. Events carry a sequence number, and the highest one written is
+    stored in the writebehind_journal table in the same transaction as the
+    attendance rows. On startup the journal is replayed and anything at or
+    below that number is skipped, so each event is applied exactly once even
+    after a crash.
+
+    The journal path must be unique per process (one writer per file):
+    start() takes an exclusive lock on ``<journal>.lock`` for as long as the
+    queue runs, and raises JournalLocked if another process holds it.
+    """
+
+    def __init__(self, journal_path, pool, flush_interval=0.05, max_batch=500,
+                 fsync=True, compact_bytes=8 * 1024 * 1024, on_flush=None):
+        self.journal_path = journal_path
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.compact_bytes = compact_bytes
+        self.on_flush = on_flush
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending = []
+        self._seq = 0
+        self._journal = None
+        self._thread = None
+        self._stopping = False
+        self._lock_file = None
+
+        self._flushes = 0
+        self._flushed_events = 0
+        self._failed_flushes = 0
+        self._flush_time = 0.0
+        self._max_flush_time = 0.0
+        self._last_flush_ms = 0.0
+        self._replayed = 0
+
+    # --- Startup and recovery ---
+
+    def start(self):
+        """Replay any events left in the journal by a previous run, then start the writer.
+
+        Raises JournalLocked, before touching the journal, if another process is using it.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        self._acquire_journal_lock()
+        try:
+            self._replay()
+        except Exception:
+            self._release_journal_lock()
+            raise
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='attendance-write-behind', daemon=True)
+        self._thread.start()
+
+    def _replay(self):
+        last_flushed = self._last_flushed_seq()
+        recovered = []
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, encoding='utf-8') as journal:
+                for line_number, line in enumerate(journal, 1):
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # A torn final line from a crash mid-write was never acknowledged
+                        logger.warning("Skipping unreadable journal line %d in %s", line_number, self.journal_path)
+                        continue
+                    self._seq = max(self._seq, event['seq'])
+                    if event['seq'] > last_flushed:
+                        recovered.append(event)
+        self._seq = max(self._seq, last_flushed)
+
+        with self._lock:
+            self._pending = recovered
+            self._replayed = len(recovered)
+            self._rewrite_journal()
+        if recovered:
+            logger.info("Replaying %d unflushed attendance events from %s", len(recovered), self.journal_path)
+
+    def _acquire_journal_lock(self):
+        # A separate lock file: the journal itself is replaced by _rewrite_journal()
+        lock_file = open(self.journal_path + '.lock', 'a+b')
+        try:
+            if fcntl:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            raise JournalLocked(f"{self.journal_path} is in use by another process")
+        self._lock_file = lock_file
+
+    def _release_journal_lock(self):
+        if self._lock_file:
+            self._lock_file.close()  # Closing the file releases the lock
+            self._lock_file = None
+
+    def _last_flushed_seq(self):
+        conn = self.pool.acquire()
+        try:
+            row = conn.execute("SELECT last_seq FROM writebehind_journal WHERE journal = ?",
+                               (self.journal_path,)).fetchone()
+            return row['last_seq'] if row else 0
+        finally:
+            self.pool.release(conn)
+
+    def _rewrite_journal(self):
+        # Replace the journal with just the pending events (caller holds the lock)
+        if self._journal:
+            self._journal.close()
+        tmp_path = self.journal_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as journal:
+            for event in self._pending:
+                journal.write(json.dumps(event, separators=(',', ':')) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    # --- Producer side ---
+
+    def submit(self, employee_id, action, date, time_of_day, location=None):
+        """Journal one 'in' or 'out' event and queue it for the writer. Returns its sequence number."""
+        with self._lock:
+            self._seq += 1
+            event = {'seq': self._seq, 'employee_id': employee_id, 'action': action,
+                     'date': date, 'time': time_of_day, 'location': location}
+            self._journal.write(json.dumps(event, separators=(',', ':')) + '\n')
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending.append(event)
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+            return event['seq']
+
+    def pending_events(self):
+        """Events acknowledged but not yet committed to SQLite, oldest first."""
+        with self._lock:
+            return list(self._pending)
+
+    # --- Writer side ---
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._stopping and len(self._pending) < self.max_batch:
+                    self._wakeup.wait(self.flush_interval)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def flush(self):
+        """Write up to max_batch pending events in one transaction. Returns how many were written."""
+        with self._lock:
+            batch = self._pending[:self.max_batch]
+        if not batch:
+            return 0
+
+        started = time.perf_counter()
+        conn = self.pool.acquire()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            write_sql = attendance_write_sql(conn)
+            read_sql = ATTENDANCE_READ_SQL[current_attendance_storage(conn)]
+            for event in batch:
+                if event['action'] == 'in':
+                    conn.execute(write_sql['insert'],
+                                 (event['employee_id'], event['date'], event['time'], None, event['location']))
+                else:
+                    # Close the latest open row, which may have been inserted earlier in this batch
+                    open_row = conn.execute(f"""
+                        SELECT a.id FROM attendance a
+                        WHERE a.employee_id = :employee_id AND {read_sql['on_date']} AND a.time_out IS NULL
+                        ORDER BY {read_sql['newest_first']} LIMIT 1
+                    """, {'employee_id': event['employee_id'], 'date': event['date']}).fetchone()
+                    if open_row:
+                        conn.execute(write_sql['close'], (event['time'], open_row['id']))
+            conn.execute("""
+                INSERT INTO writebehind_journal (journal, last_seq) VALUES (?, ?)
+                ON CONFLICT (journal) DO UPDATE SET last_seq = excluded.last_seq
+            """, (self.journal_path, batch[-1]['seq']))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            with self._lock:
+                self._failed_flushes += 1
+            logger.exception("Write-behind flush of %d events failed; will retry", len(batch))
+            return 0
+        finally:
+            self.pool.release(conn)
+
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            del self._pending[:len(batch)]
+            self._flushes += 1
+            self._flushed_events += len(batch)
+            self._flush_time += elapsed
+            self._max_flush_time = max(self._max_flush_time, elapsed)
+            self._last_flush_ms = elapsed * 1000
+            # Keep the journal from growing without bound: empty it once
+            # everything is in SQLite, or compact it to the pending tail.
+            if not self._pending:
+                self._journal.truncate(0)
+                self._journal.seek(0)
+            elif self._journal.tell() > self.compact_bytes:
+                self._rewrite_journal()
+
+        if self.on_flush:
+            self.on_flush(batch)
+        return len(batch)
+
+    def stop(self, timeout=10.0):
+        """Flush what is queued and stop the writer thread."""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread:
+            self._thread.join(timeout)
+        while self.flush():
+            pass
+        with self._lock:
+            if self._journal:
+                self._journal.close()
+                self._journal = None
+        self._release_journal_lock()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': len(self._pending),
+                'flushes': self._flushes,
+                'flushed_events': self._flushed_events,
+                'failed_flushes': self._failed_flushes,
+                'replayed_on_startup': self._replayed,
+                'avg_flush_ms': round(self._flush_time * 1000 / self._flushes, 3) if self._flushes else 0.0,
+                'max_flush_ms': round(self._max_flush_time * 1000, 3),
+                'last_flush_ms': round(self._last_flush_ms, 3),
+                'journal_bytes': self._journal.tell() if self._journal else 0,
+            }